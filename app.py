@@ -4,7 +4,8 @@ This file initializes all components and starts the Flask server.
 """
 
 import os
-from flask import Flask, render_template, request
+import threading
+from flask import Flask, Response, render_template, request
 from flask_cors import CORS
 from dotenv import load_dotenv
 
@@ -16,7 +17,13 @@ from src.whatsapp.webhook import configure_whatsapp_routes
 from src.speech_processing.processor import configure_speech_processing
 from src.llm.sarvam import configure_llm
 from src.data.sample_products import products as sample_products
-from src.utils.vector_store import get_vector_store
+from src.utils.vector_store import get_vector_store, warm_up_vector_store, is_vector_store_ready
+from src.utils.result_cache import get_search_cache
+from src.utils.embedding_cache import normalize_query
+from src.data.catalog import normalize_filters
+from src.utils.metrics import render_prometheus
+from src.utils.profiling import get_job_profiler
+from src.utils.http_cache import MAX_PAGE_SIZE, cached_response, catalog_version, parse_fields, select_page
 
 # Create Flask app
 app = Flask(__name__)
@@ -36,8 +43,69 @@ CORS(app, resources={
     }
 })
 
-def initialize_app():
-    """Initialize all application components."""
+# Bounds for batch searches via POST /get_products
+MAX_BATCH_QUERIES = int(os.environ.get('MAX_BATCH_QUERIES', '50'))
+MAX_BATCH_LIMIT = 50
+
+# The listing endpoints serve sample_products, which only changes on deploy
+SAMPLE_CATALOG_VERSION = catalog_version(sample_products)
+
+def catalog_page_args():
+    """
+    Parse the cursor, limit and fields query parameters of the catalog listings.
+
+    Raises:
+        ValueError: If limit is not between 1 and MAX_PAGE_SIZE
+    """
+    limit = request.args.get('limit', type=int)
+    if 'limit' in request.args and (limit is None or not 1 <= limit <= MAX_PAGE_SIZE):
+        raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    return request.args.get('cursor'), limit, parse_fields(request.args.get('fields'))
+
+def search_cache_key(query: str, limit: int, filters: dict) -> tuple:
+    """Search cache key for a query, result limit and normalised filters."""
+    return (normalize_query(query), limit, tuple((key, str(value)) for key, value in sorted(filters.items())))
+
+def preload():
+    """
+    Import the agent and its heavy dependencies and compile the graph.
+
+    Safe to run in a pre-fork master: it starts no threads and opens no
+    connections, so workers share the loaded modules copy-on-write.
+    """
+    # Imported by the vector store when it is created
+    import langchain_openai
+    from src.agents.ecom_agent import get_compiled_graph
+
+    get_compiled_graph()
+
+def warm_up():
+    """
+    Preload the agent and warm up the vector store.
+
+    Heavy dependencies (langgraph, langchain, chromadb) are imported here
+    rather than at module import, so the server starts listening first.
+    """
+    preload()
+    warm_up_vector_store()
+    if os.environ.get('CANNED_RESPONSES_BUILD', 'false').lower() == 'true':
+        from src.speech_processing.canned_responses import get_canned_response_bank
+
+        get_canned_response_bank().build()
+
+def start_warm_up():
+    """Warm up in a background thread so the server can answer /ready meanwhile."""
+    if os.environ.get('VECTOR_STORE_WARMUP', 'true').lower() == 'true':
+        threading.Thread(target=warm_up, name="warmup", daemon=True).start()
+
+def initialize_app(warm_up_in_background: bool = True):
+    """
+    Initialize all application components.
+
+    Args:
+        warm_up_in_background: Start warming up immediately. A pre-fork server
+            passes False and calls start_warm_up() in each worker instead.
+    """
     if not os.environ.get('ENV') == 'dev' and not os.environ.get('GOOGLE_APPLICATION_CREDENTIALS'):
         raise EnvironmentError("GOOGLE_APPLICATION_CREDENTIALS environment variable must be set to run the app in dev environment.")
 
@@ -45,31 +113,146 @@ def initialize_app():
     configure_whatsapp_routes(app)
     configure_speech_processing()
     configure_llm()
+
+    if warm_up_in_background:
+        start_warm_up()
+
+    @app.route('/metrics')
+    def prometheus_metrics():
+        """Export latency histograms, error counters and queue gauges in Prometheus format."""
+        return Response(render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+    @app.route('/admin/profile', methods=['GET', 'POST'])
+    def admin_profile():
+        """
+        Profile the next N webhook jobs (POST with {"count": N}) or show the
+        profiler status and stored profiles (GET). Requires the profiling token
+        as a bearer token; answers 404 when profiling is disabled.
+        """
+        profiler = get_job_profiler()
+        if not profiler.enabled:
+            return {"error": "not found"}, 404
+        auth = request.headers.get('Authorization', '')
+        if not profiler.authorized(auth[len('Bearer '):] if auth.startswith('Bearer ') else None):
+            return {"error": "unauthorized"}, 401
+        if request.method == 'POST':
+            try:
+                count = int((request.get_json(silent=True) or {}).get("count", 1))
+            except (TypeError, ValueError):
+                return {"error": "count must be an integer"}, 400
+            profiler.arm(count)
+        return profiler.status()
+
+    @app.route('/ready')
+    def ready():
+        """Readiness probe: succeeds once the vector store has been warmed up."""
+        if is_vector_store_ready():
+            return {"status": "ready"}
+        return {"status": "warming_up"}, 503
     
     @app.route('/get_config')
     def get_config():
-        """API endpoint to retrieve configuration information."""
-        config = {
-            "whatsapp_number": os.environ.get('TWILIO_WHATSAPP_NUMBER'),
-            "join_code": os.environ.get('JOIN_CODE'),
-            "products": sample_products,
-        }
-        return {"config": config}
+        """
+        API endpoint to retrieve configuration information.
+
+        Products can be paged with cursor and limit and projected with fields.
+        """
+        try:
+            cursor, limit, fields = catalog_page_args()
+
+            def build():
+                products, next_cursor = select_page(sample_products, cursor, limit, fields)
+                config = {
+                    "whatsapp_number": os.environ.get('TWILIO_WHATSAPP_NUMBER'),
+                    "join_code": os.environ.get('JOIN_CODE'),
+                    "products": products,
+                }
+                return {"config": config, "next_cursor": next_cursor}
+
+            response = cached_response(("config", cursor, limit, fields), SAMPLE_CATALOG_VERSION, build)
+            return response.to_response(request)
+        except ValueError as e:
+            return {"error": str(e)}, 400
     
     @app.route('/get_products')
     def get_products():
-        """API endpoint to retrieve product information."""
+        """
+        API endpoint to retrieve product information.
+
+        Without a query the catalog is listed, paged with cursor and limit and
+        projected with fields.
+        """
         search_query = request.args.get('query', '').lower()
-        if search_query:
-            vector_store = get_vector_store()
-            results = vector_store.search(query=search_query, limit=10)
+        if not search_query:
+            try:
+                cursor, limit, fields = catalog_page_args()
+
+                def build():
+                    products, next_cursor = select_page(sample_products, cursor, limit, fields)
+                    return {"products": products, "next_cursor": next_cursor}
+
+                response = cached_response(("products", cursor, limit, fields), SAMPLE_CATALOG_VERSION, build)
+                return response.to_response(request)
+            except ValueError as e:
+                return {"error": str(e)}, 400
         else:
-            results = sample_products
+            vector_store = get_vector_store()
+            filters = normalize_filters({
+                "category": request.args.getlist('category'),
+                "min_price": request.args.get('min_price', type=float),
+                "max_price": request.args.get('max_price', type=float),
+            })
+            # Popular searches are served from a cache that resets on catalog changes
+            results = get_search_cache().get_or_compute(
+                search_cache_key(search_query, 10, filters),
+                vector_store.catalog_version,
+                lambda: vector_store.search(query=search_query, limit=10, filters=filters),
+                should_cache=bool,
+            )
         return {"products": results}
 
+    @app.route('/get_products', methods=['POST'])
+    def get_products_batch():
+        """
+        API endpoint to search for several queries in one request.
+
+        Expects a JSON body {"queries": [...], "limit": 10, "filters": {...}} and
+        returns one product list per query.
+        """
+        body = request.get_json(silent=True) or {}
+        queries = body.get('queries')
+        if not isinstance(queries, list) or not all(isinstance(query, str) for query in queries):
+            return {"error": "queries must be a list of strings"}, 400
+        if len(queries) > MAX_BATCH_QUERIES:
+            return {"error": f"at most {MAX_BATCH_QUERIES} queries are allowed"}, 400
+        limit = body.get('limit', 10)
+        if isinstance(limit, bool) or not isinstance(limit, int) or not 1 <= limit <= MAX_BATCH_LIMIT:
+            return {"error": f"limit must be an integer from 1 to {MAX_BATCH_LIMIT}"}, 400
+        filters = body.get('filters')
+        if filters is not None and not isinstance(filters, dict):
+            return {"error": "invalid filters"}, 400
+        try:
+            filters = normalize_filters(filters)
+        except (TypeError, ValueError):
+            return {"error": "invalid filters"}, 400
+
+        queries = [query.lower() for query in queries]
+        vector_store = get_vector_store()
+        version = vector_store.catalog_version
+        cache = get_search_cache()
+        results = {query: cache.get(search_cache_key(query, limit, filters), version) for query in queries}
+        missing = list(dict.fromkeys(query for query in queries if query and results[query] is None))
+        if missing:
+            for query, products in zip(missing, vector_store.search_many(missing, limit=limit, filters=filters)):
+                results[query] = products
+                if products:
+                    cache.put(search_cache_key(query, limit, filters), version, products)
+        return {"results": [{"query": query, "products": results[query] or []} for query in queries]}
+
     return app
 
 if __name__ == "__main__":
+    # Development server; production runs gunicorn with gunicorn.conf.py
     app = initialize_app()
     port = int(os.environ.get("PORT", 5000))
-    app.run(host="0.0.0.0", port=port, debug=True)
+    app.run(host="0.0.0.0", port=port, debug=os.environ.get("ENV") == "dev")
@@ -0,0 +1,94 @@
+"""
+Fixed fixtures for the micro-benchmarks: synthetic audio, generated catalogs
+and conversation histories of several sizes.
+"""
+
+import os
+import random
+
+import pytest
+
+os.environ.setdefault("VECTOR_STORE_WARMUP", "false")
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+from src.utils.load_harness import FakeEmbeddings, ServiceProfile, wav_bytes
+
+CATALOG_SIZES = (1000, 10000)
+SEARCH_BACKENDS = ("numpy", "chroma")
+HISTORY_SIZES = (0, 20, 200, 2000)
+AUDIO_SECONDS = (5, 30)
+
+CATEGORIES = ["apparel", "electronics", "footwear", "home", "kitchen", "beauty", "toys", "sports"]
+ADJECTIVES = ["comfortable", "durable", "lightweight", "premium", "classic", "wireless", "organic", "compact"]
+NOUNS = ["shirt", "phone", "shoes", "lamp", "kettle", "cream", "puzzle", "racket", "jacket", "speaker"]
+
+
+def generate_catalog(size, seed=7):
+    """Deterministic synthetic products."""
+    rng = random.Random(seed)
+    products = []
+    for i in range(size):
+        adjective, noun = rng.choice(ADJECTIVES), rng.choice(NOUNS)
+        products.append({
+            "id": f"bench{i}",
+            "name": f"{adjective.title()} {noun.title()} {i}",
+            "description": f"A {adjective} {noun} " + " ".join(rng.choices(ADJECTIVES + NOUNS, k=12)),
+            "price": f"₹{rng.randint(199, 49999)}",
+            "category": rng.choice(CATEGORIES),
+            "image_url": f"https://example.com/images/{i}.jpg",
+        })
+    return products
+
+
+def generate_history(size, seed=7):
+    """Deterministic alternating user/assistant messages."""
+    rng = random.Random(seed)
+    return [
+        {
+            "role": "user" if i % 2 == 0 else "assistant",
+            "content": " ".join(rng.choices(ADJECTIVES + NOUNS, k=rng.randint(8, 60))),
+        }
+        for i in range(size)
+    ]
+
+
+@pytest.fixture(scope="session", params=AUDIO_SECONDS, ids=lambda seconds: f"{seconds}s")
+def wav_audio(request):
+    return wav_bytes(seconds=request.param)
+
+
+@pytest.fixture(params=HISTORY_SIZES, ids=lambda size: f"{size}msgs")
+def history(request):
+    return generate_history(request.param)
+
+
+@pytest.fixture(scope="session")
+def prompt_products():
+    return generate_catalog(3)
+
+
+@pytest.fixture(scope="session")
+def store_cache():
+    return {}
+
+
+@pytest.fixture(params=[(backend, size) for backend in SEARCH_BACKENDS for size in CATALOG_SIZES],
+                ids=lambda param: f"{param[0]}-{param[1]}")
+def search_store(request, store_cache, tmp_path_factory):
+    """A vector store of a generated catalog with stubbed embeddings, built once per session."""
+    from src.utils.vector_store import VectorStore, NumpyVectorStore, product_text
+    from src.utils.embedding_cache import CachedEmbeddings
+
+    backend, size = request.param
+    if request.param not in store_cache:
+        cls = NumpyVectorStore if backend == "numpy" else VectorStore
+        store = cls(persist_directory=str(tmp_path_factory.mktemp(f"{backend}-{size}")))
+        embeddings = FakeEmbeddings(ServiceProfile(0))
+        store.embeddings = CachedEmbeddings(embeddings, persist_path=None)
+        store.initialize_collection()
+        products = generate_catalog(size)
+        for start in range(0, size, 1000):
+            batch = products[start:start + 1000]
+            store.upsert_embeddings(batch, embeddings.embed_documents([product_text(p) for p in batch]))
+        store_cache[request.param] = store
+    return store_cache[request.param]
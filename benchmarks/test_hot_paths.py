@@ -0,0 +1,64 @@
+"""
+Micro-benchmarks for the CPU-bound hot paths of a voice request.
+
+Run with scripts/run_benchmarks.py to save a baseline and compare against it.
+"""
+
+import io
+import shutil
+
+import pytest
+from pydub import AudioSegment
+
+from src.speech_processing.processor import clean_for_translation, convert_to_wav, detect_audio_format, encode_ogg_opus
+from src.prompts.shopping_assistant import get_prompt
+
+pytest.importorskip("pytest_benchmark")
+
+requires_ffmpeg = pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg is not installed")
+
+QUERIES = ["comfortable running shoes", "wireless speaker under 5000", "organic cream", "premium leather jacket"]
+
+LLM_RESPONSE = (
+    "Here are a few options! The **Classic Shoes 12** (₹2,499) are lightweight & durable; "
+    "the Premium Jacket (₹4,999) is our best-seller... Would you like to add one to your cart? :)"
+) * 4
+
+def test_detect_audio_format(benchmark):
+    """Format detection from content type and from file extension."""
+    cases = [
+        ("/tmp/a.audio", "audio/ogg"), ("/tmp/a.opus", ""), ("/tmp/a.m4a", None),
+        ("/tmp/a.wav", "audio/x-wav"), ("/tmp/a.bin", "application/octet-stream"),
+    ]
+    benchmark(lambda: [detect_audio_format(path, content_type) for path, content_type in cases])
+
+def test_transcode_wav(benchmark, wav_audio, tmp_path):
+    """Decode and re-export a WAV voice note, the path taken without ffmpeg."""
+    path = tmp_path / "note.wave"
+    path.write_bytes(wav_audio)
+    benchmark(convert_to_wav, str(path), "wav")
+
+@requires_ffmpeg
+def test_transcode_ogg(benchmark, wav_audio, tmp_path):
+    """Decode a WhatsApp OGG/Opus voice note to WAV."""
+    path = tmp_path / "note.ogg"
+    AudioSegment.from_file(io.BytesIO(wav_audio), format="wav").export(str(path), format="ogg", codec="libopus")
+    benchmark(convert_to_wav, str(path), "ogg")
+
+@requires_ffmpeg
+def test_encode_ogg_opus(benchmark, wav_audio):
+    """Encode the TTS output as OGG/Opus."""
+    benchmark(encode_ogg_opus, wav_audio)
+
+def test_get_prompt(benchmark, history, prompt_products):
+    """Prompt assembly with histories of increasing length."""
+    benchmark(get_prompt, history=history, products=prompt_products, query=QUERIES[0])
+
+def test_clean_for_translation(benchmark):
+    """Punctuation stripping before translation."""
+    benchmark(clean_for_translation, LLM_RESPONSE)
+
+def test_vector_store_search(benchmark, search_store):
+    """Search with embeddings stubbed out; query embeddings come from the cache after the first round."""
+    queries = iter(QUERIES * 100000)
+    benchmark(lambda: search_store.search(next(queries), limit=3))
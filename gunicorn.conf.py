@@ -0,0 +1,110 @@
+"""
+Gunicorn configuration for production serving.
+
+    gunicorn --config gunicorn.conf.py
+
+Workers and threads are derived from the CPUs available to the container and
+from the share of a request spent waiting on I/O. A webhook job mostly waits
+on Sarvam, OpenAI, Firestore and Twilio, so each worker runs several threads
+while the number of processes follows the CPU count. Every setting can be
+overridden with the GUNICORN_* environment variables below.
+"""
+import os
+import math
+import time
+import signal
+import logging
+
+logger = logging.getLogger("gunicorn.error")
+
+
+def available_cpus() -> int:
+    """CPUs this process may run on, honouring cgroup CPU quotas."""
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cpus = min(cpus, max(1, math.ceil(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return max(1, cpus)
+
+
+def threads_per_worker(io_wait_ratio: float, max_threads: int = 32) -> int:
+    """Threads that keep one core busy when requests wait on I/O io_wait_ratio of the time."""
+    io_wait_ratio = min(max(io_wait_ratio, 0.0), 0.99)
+    return max(1, min(max_threads, round(1 / (1 - io_wait_ratio))))
+
+
+CPUS = available_cpus()
+# Share of a webhook job spent waiting on external services
+IO_WAIT_RATIO = float(os.environ.get("GUNICORN_IO_WAIT_RATIO", "0.9"))
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+wsgi_app = "app:initialize_app(warm_up_in_background=False)"
+worker_class = "gthread"
+workers = int(os.environ.get("GUNICORN_WORKERS", CPUS))
+threads = int(os.environ.get("GUNICORN_THREADS", threads_per_worker(IO_WAIT_RATIO)))
+# Webhook jobs admitted at once per worker (src/utils/admission.py). Fewer than the threads, so a
+# worker at its cap still has threads free to turn senders away and answer health checks
+os.environ.setdefault("MAX_CONCURRENT_JOBS", str(max(1, threads - 2)))
+
+# Import the app and compile the agent graph once in the master; workers share it copy-on-write
+preload_app = os.environ.get("GUNICORN_PRELOAD", "true").lower() == "true"
+
+# A voice note can take tens of seconds end to end
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "120"))
+# Time in-flight webhook jobs get to finish after SIGTERM; Cloud Run allows 10s
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", "9"))
+# Part of graceful_timeout kept for committing queued conversation writes
+SHUTDOWN_FLUSH_SECONDS = float(os.environ.get("GUNICORN_SHUTDOWN_FLUSH_SECONDS", "2"))
+keepalive = 5
+accesslog = "-"
+
+
+def when_ready(server):
+    if preload_app:
+        from app import preload
+
+        preload()
+    logger.info(f"Serving with {workers} workers x {threads} threads ({CPUS} CPUs, I/O wait ratio {IO_WAIT_RATIO})")
+
+
+def post_fork(server, worker):
+    # Threads and connections don't survive fork, so each worker warms up its own vector store
+    from app import start_warm_up
+
+    start_warm_up()
+
+
+def shutdown_deadline(started: float = None) -> float:
+    """When a worker told to stop at started (default now) must be done; the master kills it then."""
+    return (time.monotonic() if started is None else started) + graceful_timeout
+
+
+def post_worker_init(worker):
+    """Note when the worker receives SIGTERM, so worker_exit keeps within the same graceful_timeout."""
+    handle_exit = worker.handle_exit
+
+    def record_shutdown(sig, frame):
+        if getattr(worker, "shutdown_started", None) is None:
+            worker.shutdown_started = time.monotonic()
+        handle_exit(sig, frame)
+
+    signal.signal(signal.SIGTERM, record_shutdown)
+    # signal() makes the signal interrupt system calls again; gunicorn turns that off
+    signal.siginterrupt(signal.SIGTERM, False)
+
+
+def worker_exit(server, worker):
+    """Let in-flight webhook jobs finish, then flush queued conversation writes, before the deadline."""
+    from src.whatsapp.webhook import wait_for_in_flight
+    from src.db import write_behind
+
+    # The worker has already spent part of graceful_timeout finishing its requests
+    deadline = shutdown_deadline(getattr(worker, "shutdown_started", None))
+    if not wait_for_in_flight(max(0.0, deadline - SHUTDOWN_FLUSH_SECONDS - time.monotonic())):
+        logger.warning(f"Worker {worker.pid} exiting with webhook jobs still in flight")
+    if write_behind.write_behind_queue is not None:
+        write_behind.write_behind_queue.shutdown(timeout=max(0.1, deadline - time.monotonic()))
@@ -43,6 +43,14 @@ resource "google_cloud_run_service" "app" {
         ports {
           container_port = 5000
         }
+        # Only route traffic once the vector store has warmed up
+        startup_probe {
+          http_get {
+            path = "/ready"
+          }
+          period_seconds    = 5
+          failure_threshold = 24
+        }
         env {
           name  = "ENV"
           value = var.env
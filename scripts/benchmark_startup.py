@@ -0,0 +1,96 @@
+"""
+Benchmark cold start: time from process launch until the server answers its
+first request, and until /ready reports the app warmed up.
+
+Usage:
+    python scripts/benchmark_startup.py --runs 5
+    python scripts/benchmark_startup.py --command "python app.py" --no-ready
+"""
+import sys
+import os
+import time
+import shlex
+import socket
+import argparse
+import statistics
+import subprocess
+import urllib.error
+import urllib.request
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../'))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def status(url):
+    try:
+        with urllib.request.urlopen(url, timeout=1) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except OSError:
+        return None
+
+
+def wait_for(url, accept, start, timeout):
+    """Seconds from start until url answers with a status in accept."""
+    while time.perf_counter() - start < timeout:
+        if status(url) in accept:
+            return time.perf_counter() - start
+        time.sleep(0.01)
+    raise TimeoutError(f"{url} did not answer within {timeout}s")
+
+
+def run_once(command, wait_ready, timeout):
+    port = free_port()
+    env = dict(os.environ, PORT=str(port))
+    env.setdefault("ENV", "dev")
+    env.setdefault("SARVAM_API_KEY", "startup-benchmark")
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [arg.replace("{port}", str(port)) for arg in shlex.split(command)],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        base = f"http://127.0.0.1:{port}"
+        # Any HTTP answer, even 503 from /ready, means the server is taking requests
+        first = wait_for(f"{base}/ready", {200, 503}, start, timeout)
+        ready = wait_for(f"{base}/ready", {200}, start, timeout) if wait_ready else None
+        return first, ready
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--command", default=f"{shlex.quote(sys.executable)} app.py",
+                        help="Server command, run from the repository root; {port} is replaced by the port")
+    parser.add_argument("--runs", type=int, default=3, help="Number of cold starts")
+    parser.add_argument("--no-ready", dest="ready", action="store_false",
+                        help="Only measure the first request, not /ready")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Seconds to wait for each milestone")
+    args = parser.parse_args()
+
+    firsts, readies = [], []
+    for run in range(args.runs):
+        first, ready = run_once(args.command, args.ready, args.timeout)
+        firsts.append(first)
+        if ready is not None:
+            readies.append(ready)
+        print(f"run {run + 1}: first request {first * 1000:.0f}ms" + (f", ready {ready * 1000:.0f}ms" if ready else ""))
+
+    print(f"\ntime to first request: median {statistics.median(firsts) * 1000:.0f}ms, min {min(firsts) * 1000:.0f}ms")
+    if readies:
+        print(f"time to ready:         median {statistics.median(readies) * 1000:.0f}ms, min {min(readies) * 1000:.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark per-operation latency and throughput of the user data storage backends.
+
+Usage:
+    python scripts/benchmark_storage.py --backends sqlite,firestore --users 50 --turns 10
+"""
+import sys
+import os
+import time
+import uuid
+import argparse
+import tempfile
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+
+# Add the src directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
+
+load_dotenv()
+
+from src.db.storage import create_user_store
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def timed(samples, fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    samples.append(time.perf_counter() - start)
+
+
+def run_user(store, user_id, turns, samples):
+    timed(samples["get_full_user_data"], store.get_full_user_data, user_id)
+    timed(samples["save_user_data"], store.save_user_data, user_id, "preferred-language", "hi-IN")
+    for turn in range(turns):
+        timed(samples["get_full_user_data"], store.get_full_user_data, user_id)
+        timed(samples["save_conversation"], store.save_conversation, user_id, [
+            {"role": "user", "content": f"Show me running shoes under {turn}000 rupees"},
+            {"role": "assistant", "content": "Here are some running shoes you might like."},
+        ])
+    timed(samples["delete_user"], store.delete_user, user_id)
+
+
+def benchmark(backend, users, turns, concurrency, sqlite_path):
+    store = create_user_store(backend, sqlite_path=sqlite_path)
+    samples = {
+        "get_full_user_data": [],
+        "save_user_data": [],
+        "save_conversation": [],
+        "delete_user": [],
+    }
+    user_ids = [f"bench-{uuid.uuid4().hex[:12]}" for _ in range(users)]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(lambda user_id: run_user(store, user_id, turns, samples), user_ids))
+    elapsed = time.perf_counter() - start
+
+    total_ops = sum(len(s) for s in samples.values())
+    print(f"\n{backend}: {total_ops} ops in {elapsed:.2f}s ({total_ops / elapsed:.1f} ops/s, concurrency {concurrency})")
+    print(f"{'operation':<22}{'count':>8}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for operation, values in samples.items():
+        print(
+            f"{operation:<22}{len(values):>8}"
+            f"{statistics.mean(values) * 1000:>10.2f}"
+            f"{percentile(values, 50) * 1000:>10.2f}"
+            f"{percentile(values, 95) * 1000:>10.2f}"
+            f"{percentile(values, 99) * 1000:>10.2f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", default="sqlite", help="Comma separated list of backends to benchmark")
+    parser.add_argument("--users", type=int, default=50, help="Number of simulated users")
+    parser.add_argument("--turns", type=int, default=10, help="Conversation turns per user")
+    parser.add_argument("--concurrency", type=int, default=8, help="Number of concurrent users")
+    parser.add_argument("--sqlite-path", help="SQLite database file (defaults to a scratch file)")
+    args = parser.parse_args()
+
+    sqlite_path = args.sqlite_path or os.path.join(tempfile.mkdtemp(), "benchmark.sqlite3")
+    for backend in args.backends.split(","):
+        benchmark(backend.strip(), args.users, args.turns, args.concurrency, sqlite_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Compare query latency, throughput, recall and memory of the vector backends:
+Chroma (the current chroma_db store), the exact NumPy index and the NumPy
+index in int8 mode.
+
+Each (backend, catalog size) pair runs in a fresh process on the same synthetic
+embeddings, so no OpenAI calls are made and memory numbers don't interfere.
+Recall@k is measured against exact float32 search.
+
+Usage:
+    python scripts/benchmark_vector_backends.py --sizes 1000,50000,200000 --dim 1536
+"""
+import sys
+import os
+import time
+import argparse
+import tempfile
+import statistics
+import multiprocessing
+
+import numpy as np
+
+# Add the src directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
+
+CHROMA_MAX_BATCH = 5000
+
+
+def rss_mb():
+    """Anonymous and file-backed resident memory of this process in MB (Linux only)."""
+    usage = {"RssAnon": float("nan"), "RssFile": float("nan")}
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in usage:
+                    usage[key] = int(value.split()[0]) / 1024
+    except OSError:
+        pass
+    return usage["RssAnon"], usage["RssFile"]
+
+
+def synthetic_catalog(size, dim, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((size, dim), dtype=np.float32)
+    metadatas = [{"id": f"prod{i}", "name": f"Product {i}", "price": f"₹{100 + i % 5000}"} for i in range(size)]
+    return vectors, metadatas
+
+
+def quantization(backend):
+    return "int8" if backend == "numpy-int8" else None
+
+
+def disk_mb(directory):
+    return sum(
+        os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(directory) for name in names
+    ) / 1024 / 1024
+
+
+def exact_top_k(vectors, queries, k):
+    """Ground-truth ids of the k most similar vectors for each query."""
+    from src.utils.numpy_index import normalize_rows, top_k
+    indices, _ = top_k(normalize_rows(queries) @ normalize_rows(vectors).T, k)
+    return [{f"prod{i}" for i in row} for row in indices]
+
+
+def build(backend, directory, vectors, metadatas):
+    if backend.startswith("numpy"):
+        from src.utils.numpy_index import NumpyVectorIndex
+        index = NumpyVectorIndex(directory, quantization=quantization(backend))
+        index.append(vectors, metadatas)
+        if index.quantization:
+            index.quantized()
+    else:
+        import chromadb
+        collection = chromadb.PersistentClient(path=directory).get_or_create_collection(
+            "products", metadata={"hnsw:space": "cosine"}
+        )
+        for start in range(0, len(vectors), CHROMA_MAX_BATCH):
+            end = start + CHROMA_MAX_BATCH
+            collection.add(
+                ids=[m["id"] for m in metadatas[start:end]],
+                embeddings=vectors[start:end].tolist(),
+                metadatas=metadatas[start:end],
+            )
+
+
+def open_searcher(backend, directory):
+    """Load the index and return a function running a batch of queries."""
+    if backend.startswith("numpy"):
+        from src.utils.numpy_index import NumpyVectorIndex
+        index = NumpyVectorIndex(directory, quantization=quantization(backend)).load()
+        return lambda queries, k: [[index.metadata[i] for i, _ in hits] for hits in index.search_batch(queries, k)]
+
+    import chromadb
+    collection = chromadb.PersistentClient(path=directory).get_collection("products")
+    return lambda queries, k: collection.query(query_embeddings=queries.tolist(), n_results=k)["metadatas"]
+
+
+def run(backend, size, dim, queries, k, batch_size, results):
+    vectors, metadatas = synthetic_catalog(size, dim)
+    query_vectors = np.random.default_rng(1).standard_normal((queries, dim), dtype=np.float32)
+    directory = tempfile.mkdtemp(prefix=f"bench-{backend}-")
+    truth = exact_top_k(vectors, query_vectors, k)
+
+    start = time.perf_counter()
+    build(backend, directory, vectors, metadatas)
+    build_seconds = time.perf_counter() - start
+    del vectors, metadatas
+
+    baseline_rss = rss_mb()
+    start = time.perf_counter()
+    search = open_searcher(backend, directory)
+    search(query_vectors[:1], k)
+    load_seconds = time.perf_counter() - start
+
+    latencies = []
+    found = 0
+    for i in range(queries):
+        start = time.perf_counter()
+        hits = search(query_vectors[i:i + 1], k)[0]
+        latencies.append(time.perf_counter() - start)
+        found += len(truth[i] & {hit["id"] for hit in hits})
+
+    start = time.perf_counter()
+    for i in range(0, queries, batch_size):
+        search(query_vectors[i:i + batch_size], k)
+    batch_qps = queries / (time.perf_counter() - start)
+
+    latencies.sort()
+    results.put({
+        "backend": backend,
+        "size": size,
+        "build_s": build_seconds,
+        "load_s": load_seconds,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+        "mean_ms": statistics.mean(latencies) * 1000,
+        "batch_qps": batch_qps,
+        "recall": found / (queries * k),
+        "anon_mb": rss_mb()[0] - baseline_rss[0],
+        "file_mb": rss_mb()[1] - baseline_rss[1],
+        "disk_mb": disk_mb(directory),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", default="chroma,numpy,numpy-int8", help="Comma separated list of backends")
+    parser.add_argument("--sizes", default="1000,20000", help="Comma separated catalog sizes")
+    parser.add_argument("--dim", type=int, default=1536, help="Embedding dimensionality")
+    parser.add_argument("--queries", type=int, default=200, help="Number of queries per run")
+    parser.add_argument("--k", type=int, default=10, help="Results per query")
+    parser.add_argument("--batch-size", type=int, default=32, help="Queries per batched call")
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    print(f"{'backend':<12}{'size':>9}{'build s':>9}{'load s':>8}{'p50 ms':>9}{'p99 ms':>9}"
+          f"{'mean ms':>9}{'batch q/s':>11}{'recall@' + str(args.k):>11}{'anon MB':>9}{'mmap MB':>9}{'disk MB':>9}")
+    for size in [int(s) for s in args.sizes.split(",")]:
+        for backend in args.backends.split(","):
+            results = context.Queue()
+            process = context.Process(
+                target=run, args=(backend.strip(), size, args.dim, args.queries, args.k, args.batch_size, results)
+            )
+            process.start()
+            row = results.get()
+            process.join()
+            print(f"{row['backend']:<12}{row['size']:>9}{row['build_s']:>9.2f}{row['load_s']:>8.3f}"
+                  f"{row['p50_ms']:>9.2f}{row['p99_ms']:>9.2f}{row['mean_ms']:>9.2f}"
+                  f"{row['batch_qps']:>11.0f}{row['recall']:>11.3f}{row['anon_mb']:>9.1f}{row['file_mb']:>9.1f}"
+                  f"{row['disk_mb']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+Pre-translate and pre-synthesise the canned error and system replies.
+
+Translates every message in CANNED_MESSAGES into each supported language with
+Sarvam, synthesises it, uploads the audio to BUCKET_NAME and records the text
+and audio URL in the bank file. Only missing or outdated entries are built, so
+re-running after adding a message or language is cheap.
+
+Usage:
+    python scripts/build_canned_responses.py
+    python scripts/build_canned_responses.py --languages hi-IN,ta-IN --file canned_responses.json
+"""
+import sys
+import os
+import argparse
+from dotenv import load_dotenv
+
+# Add the src directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
+
+load_dotenv()
+
+from src.speech_processing.processor import configure_speech_processing
+from src.speech_processing.canned_responses import (
+    CANNED_RESPONSES_FILE, SUPPORTED_LANGUAGES, CannedResponseBank,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--languages", default=",".join(SUPPORTED_LANGUAGES), help="Comma separated language codes")
+    parser.add_argument("--file", default=CANNED_RESPONSES_FILE, help="Bank file to update")
+    args = parser.parse_args()
+
+    languages = [language.strip() for language in args.languages.split(",") if language.strip()]
+    configure_speech_processing()
+    bank = CannedResponseBank(args.file)
+    built = bank.build(languages)
+    missing = bank.missing(languages)
+    print(f"Built {built} entries in {args.file}; {len(missing)} missing")
+    for key, language in missing:
+        print(f"  missing: {key} {language}")
+    sys.exit(1 if missing else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Build a read-only index snapshot from an existing vector store.
+
+The stored embeddings are copied, not recomputed, so no OpenAI key is needed.
+Run it once at build time and serve the result with VECTOR_STORE_BACKEND=snapshot.
+
+Usage:
+    python scripts/build_index_snapshot.py --source chroma --output index_snapshot
+    python scripts/build_index_snapshot.py --source chroma --output index_snapshot --related-products
+"""
+import sys
+import os
+import argparse
+import logging
+
+# Add the src directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
+
+from src.utils.index_snapshot import chroma_batches, numpy_batches, write_snapshot
+from src.utils.related_products import RELATED_PRODUCTS_PER_ITEM
+
+ROOT_DIRECTORY = os.path.abspath(os.path.join(os.path.dirname(__file__), '../'))
+SOURCE_DIRECTORIES = {
+    "chroma": os.path.join(ROOT_DIRECTORY, "chroma_db"),
+    "numpy": os.path.join(ROOT_DIRECTORY, "numpy_index", "products"),
+}
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", choices=sorted(SOURCE_DIRECTORIES), default="chroma", help="Backend to copy from")
+    parser.add_argument("--source-dir", help="Persistence directory of the source backend")
+    parser.add_argument("--output", default=os.path.join(ROOT_DIRECTORY, "index_snapshot"), help="Snapshot directory")
+    parser.add_argument("--model", default=os.environ.get("EMBEDDING_MODEL", "text-embedding-ada-002"),
+                        help="Embedding model the source vectors were produced with")
+    parser.add_argument("--int8", action="store_true", help="Include int8 codes for VECTOR_QUANTIZATION=int8")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Vectors copied at a time")
+    parser.add_argument("--related-products", action="store_true",
+                        help="Also precompute the related products offered for upselling, covered by the manifest")
+    parser.add_argument("--per-item", type=int, default=RELATED_PRODUCTS_PER_ITEM,
+                        help="Related products stored per product, with --related-products")
+    args = parser.parse_args()
+
+    source_dir = args.source_dir or SOURCE_DIRECTORIES[args.source]
+    batches = chroma_batches(source_dir, batch_size=args.batch_size) if args.source == "chroma" \
+        else numpy_batches(source_dir, batch_size=args.batch_size)
+    manifest = write_snapshot(args.output, batches, args.model, quantization="int8" if args.int8 else None,
+                              related_per_item=args.per_item if args.related_products else None)
+    logger.info(f"Snapshot {manifest['checksum']}: {manifest['count']} x {manifest['dimension']} vectors")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Precompute the related-products table used for upselling.
+
+Reads the stored embeddings of every product, finds each product's nearest
+neighbours in other categories and writes related_products.json next to the
+index, where the vector store picks it up. No OpenAI key is needed. Re-run it
+after ingesting products; products added since the last run get no related
+items until then.
+
+Index snapshots are read-only and checksummed, so their table is built with
+the snapshot instead: scripts/build_index_snapshot.py --related-products.
+
+Usage:
+    python scripts/build_related_products.py --source chroma
+    python scripts/build_related_products.py --source numpy --per-item 8
+"""
+import sys
+import os
+import time
+import argparse
+import logging
+
+import numpy as np
+
+# Add the src directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
+
+from src.utils.index_snapshot import MANIFEST_FILE, chroma_batches
+from src.utils.numpy_index import NumpyVectorIndex
+from src.utils.related_products import RELATED_CHUNK_BYTES, RELATED_PRODUCTS_PER_ITEM, compute_related, write_related
+
+ROOT_DIRECTORY = os.path.abspath(os.path.join(os.path.dirname(__file__), '../'))
+SOURCE_DIRECTORIES = {
+    "chroma": os.path.join(ROOT_DIRECTORY, "chroma_db"),
+    "numpy": os.path.join(ROOT_DIRECTORY, "numpy_index", "products"),
+}
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def load_vectors(source: str, directory: str):
+    """Stored vectors and metadata; NumPy indexes stay memory-mapped."""
+    if source == "chroma":
+        vectors, metadatas = [], []
+        for batch_vectors, batch_metadatas in chroma_batches(directory):
+            vectors.append(batch_vectors)
+            metadatas.extend(batch_metadatas)
+        return (np.concatenate(vectors) if vectors else np.empty((0, 0), dtype=np.float32)), metadatas
+    index = NumpyVectorIndex(directory).load()
+    return index.vectors, index.metadata
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", choices=sorted(SOURCE_DIRECTORIES), default="chroma", help="Backend whose index to read")
+    parser.add_argument("--source-dir", help="Index directory; the table is written there too")
+    parser.add_argument("--per-item", type=int, default=RELATED_PRODUCTS_PER_ITEM, help="Related products stored per product")
+    parser.add_argument("--same-category", action="store_true",
+                        help="Also relate products of the same category (alternatives rather than complements)")
+    parser.add_argument("--chunk-mb", type=int, default=RELATED_CHUNK_BYTES // (1024 * 1024),
+                        help="Megabytes of similarity scores computed at a time")
+    args = parser.parse_args()
+
+    directory = args.source_dir or SOURCE_DIRECTORIES[args.source]
+    if os.path.exists(os.path.join(directory, MANIFEST_FILE)):
+        parser.error(f"{directory} is an index snapshot; rebuild it with "
+                     "scripts/build_index_snapshot.py --related-products so its manifest covers the table")
+    vectors, metadatas = load_vectors(args.source, directory)
+    ids = [metadata["id"] for metadata in metadatas]
+    categories = None if args.same_category else [metadata.get("category") for metadata in metadatas]
+
+    start = time.perf_counter()
+    related = compute_related(vectors, ids, categories, k=args.per_item, chunk_bytes=args.chunk_mb * 1024 * 1024)
+    elapsed = time.perf_counter() - start
+    write_related(directory, related, k=args.per_item, cross_category=not args.same_category, source=args.source)
+    logger.info(f"Related products for {len(related)} products computed in {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,64 @@
+"""
+Ingest the product catalog into the vector store.
+
+Only new or changed products are embedded, and products that are no longer in
+the catalog are deleted, so the script is safe to re-run.
+
+Usage:
+    python scripts/generate_vector_store_persistence.py [--catalog products.jsonl] [--snapshot index_snapshot]
+    python scripts/generate_vector_store_persistence.py --normalize-only
+"""
 import sys
 import os
+import argparse
 from dotenv import load_dotenv
 import logging
 
 # Add the src directory to the Python path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
 
-from src.utils.vector_store import get_vector_store
+from src.utils.vector_store import get_vector_store, NumpyVectorStore
+from src.utils.index_snapshot import chroma_batches, numpy_batches, write_snapshot
+from src.utils.ingestion import CatalogIngestion, read_catalog, EMBED_BATCH_SIZE, EMBED_CONCURRENCY, INGEST_CHUNK_SIZE
+from src.data.sample_products import products as sample_products
 
 # Load environment variables
 load_dotenv()
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
+
+parser = argparse.ArgumentParser(description="Ingest the product catalog into the vector store.")
+parser.add_argument("--catalog", help="Catalog file (.jsonl or .json). Defaults to the sample products.")
+parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE, help="Products per embedding request")
+parser.add_argument("--concurrency", type=int, default=EMBED_CONCURRENCY, help="Embedding requests in flight")
+parser.add_argument("--chunk-size", type=int, default=INGEST_CHUNK_SIZE, help="Products read at a time")
+parser.add_argument("--keep-missing", action="store_true", help="Don't delete products missing from the catalog")
+parser.add_argument("--snapshot", help="Also write a read-only index snapshot to this directory")
+parser.add_argument("--normalize-only", action="store_true",
+                    help="Only rewrite stored metadata (numeric prices, content hashes) in place, without embedding")
+args = parser.parse_args()
+
 logger.info("Generating vector store persistence...")
 
 try:
     vector_store = get_vector_store()
-    vector_store.add_test_products()
+    products = read_catalog(args.catalog) if args.catalog else sample_products
+    ingestion = CatalogIngestion(
+        vector_store,
+        embed_batch_size=args.batch_size,
+        embed_concurrency=args.concurrency,
+        chunk_size=args.chunk_size,
+    )
+    if args.normalize_only:
+        ingestion.normalize_stored()
+    else:
+        ingestion.run(products, delete_missing=not args.keep_missing)
+    if args.snapshot:
+        if isinstance(vector_store, NumpyVectorStore):
+            batches = numpy_batches(vector_store.index.directory)
+        else:
+            batches = chroma_batches(vector_store.persist_directory)
+        write_snapshot(args.snapshot, batches, vector_store.embeddings.model)
 except Exception as e:
     logger.error(f"Error initializing vector store: {e}")
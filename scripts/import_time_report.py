@@ -0,0 +1,72 @@
+"""
+Report where import time goes when loading the app.
+
+Runs a fresh interpreter with -X importtime and summarises the slowest modules
+by cumulative time and the total self time per top-level package.
+
+Usage:
+    python scripts/import_time_report.py
+    python scripts/import_time_report.py --module src.agents.ecom_agent --top 15
+    python scripts/import_time_report.py --budget-ms 800   # exit 1 if importing app takes longer
+"""
+import sys
+import os
+import re
+import argparse
+import subprocess
+from collections import defaultdict
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../'))
+
+LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def measure(module):
+    """Return (self_us, cumulative_us, depth, name) for every module imported by module."""
+    env = dict(os.environ)
+    env.setdefault("ENV", "dev")
+    env.setdefault("SARVAM_API_KEY", "import-time-report")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise SystemExit(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+    entries = []
+    for line in result.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            entries.append((int(self_us), int(cumulative_us), len(indent) // 2, name))
+    return entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app", help="Module to import")
+    parser.add_argument("--top", type=int, default=20, help="Number of modules and packages to list")
+    parser.add_argument("--budget-ms", type=float, help="Fail if the import takes longer than this")
+    args = parser.parse_args()
+
+    entries = measure(args.module)
+    total_ms = sum(self_us for self_us, _, _, _ in entries) / 1000
+
+    by_package = defaultdict(int)
+    for self_us, _, _, name in entries:
+        by_package[name.split(".")[0]] += self_us
+
+    print(f"import {args.module}: {total_ms:.0f}ms across {len(entries)} modules\n")
+    print(f"{'slowest modules (cumulative)':<60}{'ms':>10}")
+    for _, cumulative_us, depth, name in sorted(entries, key=lambda e: e[1], reverse=True)[:args.top]:
+        print(f"{'  ' * min(depth, 6) + name:<60}{cumulative_us / 1000:>10.1f}")
+    print(f"\n{'packages (self time)':<60}{'ms':>10}")
+    for package, self_us in sorted(by_package.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"{package:<60}{self_us / 1000:>10.1f}")
+
+    if args.budget_ms is not None and total_ms > args.budget_ms:
+        print(f"\nImport time {total_ms:.0f}ms exceeds the budget of {args.budget_ms:.0f}ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
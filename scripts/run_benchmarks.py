@@ -0,0 +1,69 @@
+"""
+Run the micro-benchmarks in benchmarks/, saving baselines and comparing against them.
+
+Results are stored per machine under benchmarks/.baselines, so comparisons only
+use runs from the same hardware.
+
+Usage:
+    python scripts/run_benchmarks.py --save baseline
+    python scripts/run_benchmarks.py --compare baseline --fail-over 15
+    python scripts/run_benchmarks.py -k get_prompt
+"""
+import sys
+import os
+import glob
+import argparse
+
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../'))
+STORAGE = os.path.join(ROOT, "benchmarks", ".baselines")
+
+
+def find_run(name):
+    """Id of the latest saved run called name, e.g. "0003" for 0003_baseline.json."""
+    runs = sorted(glob.glob(os.path.join(STORAGE, "*", f"[0-9][0-9][0-9][0-9]_{name}.json")))
+    if not runs:
+        raise SystemExit(f"No saved benchmark run named {name} in {STORAGE}")
+    return os.path.basename(runs[-1])[:4]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--save", metavar="NAME", help="Save this run as a baseline")
+    parser.add_argument("--compare", metavar="NAME", nargs="?", const="",
+                        help="Compare against a saved run (the latest one if NAME is omitted)")
+    parser.add_argument("--fail-over", type=int, default=20,
+                        help="With --compare, fail if a median is this many percent slower")
+    parser.add_argument("-k", dest="keyword", help="Only run benchmarks matching this expression")
+    args = parser.parse_args()
+
+    pytest_args = [
+        os.path.join(ROOT, "benchmarks"),
+        "-q",
+        f"--benchmark-storage=file://{STORAGE}",
+        "--benchmark-columns=min,median,iqr,ops,rounds",
+        "--benchmark-sort=name",
+    ]
+    if args.keyword:
+        pytest_args += ["-k", args.keyword]
+    if args.save:
+        pytest_args.append(f"--benchmark-save={args.save}")
+    if args.compare is not None:
+        pytest_args.append(f"--benchmark-compare={find_run(args.compare)}" if args.compare else "--benchmark-compare")
+        pytest_args.append(f"--benchmark-compare-fail=median:{args.fail_over}%")
+
+    # Run from the repository root so src is importable
+    os.chdir(ROOT)
+    sys.path.insert(0, ROOT)
+    from pytest_benchmark.session import PerformanceRegression
+
+    try:
+        sys.exit(pytest.main(pytest_args))
+    except PerformanceRegression:
+        # The regressed benchmarks have already been reported
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
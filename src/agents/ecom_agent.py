@@ -2,21 +2,31 @@
 LangGraph agent definition and invocation.
 """
 from typing import Dict, TypedDict, Annotated, List
+import os
 import operator
 import logging
+import threading
 
 from langgraph.graph import StateGraph, END
 
-from src.speech_processing.processor import translate_audio, translate_and_speak
+from src.speech_processing.processor import translate_audio, translate_and_speak, translate_text, is_english
+from src.speech_processing.language_detection import detect_language
+from src.speech_processing.canned_responses import get_canned_response_bank, remember_language
 from src.utils.vector_store import get_vector_store
+from src.agents.query_filters import extract_filters
 from src.llm.sarvam import chat_completion
 from src.prompts.shopping_assistant import get_prompt
-from src.db.firestore import FirestoreClient
+from src.db.storage import get_user_store
+from src.db.write_behind import get_write_behind_queue
+from src.utils.tracing import traced
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Complementary products offered to the LLM for upselling; 0 disables them
+RELATED_PRODUCTS_LIMIT = int(os.environ.get("RELATED_PRODUCTS_LIMIT", "2"))
+
 # Define Agent State
 class Response(TypedDict):
     """
@@ -31,11 +41,14 @@ class AgentState(TypedDict):
     Represents the state of our LangGraph agent.
     """
     regional_audio_path: str
+    text_query: str  # Typed message, instead of regional_audio_path
+    reply_with_voice: bool  # Synthesise the reply; defaults to True
     user_language: str
     cart: List[str]  # List of product ids in the user's cart
     history: List[Dict[str, str]]  # List of previous interactions
     english_query: str
     products: List[dict]
+    related_products: List[dict]  # Complementary products to upsell
     llm_response: str
     response: Response
     error_message: str = None
@@ -47,7 +60,7 @@ def get_user_info_node(state: AgentState):
     """
     Retrieves user information from Firestore.
     Input: state['user_id']
-    Output: state['user_language'] or state['error_message']
+    Output: state['user_language'], state['history'], state['cart'] or state['error_message']
     """
     logger.info("---RETRIEVING USER INFO---")
     user_id = state.get("user_id")
@@ -56,23 +69,45 @@ def get_user_info_node(state: AgentState):
         return {"error_message": "User ID not found in state for user info retrieval."}
 
     try:
-        # Initialize Firestore client
-        firestore_client = FirestoreClient()
-        user_data = firestore_client.get_full_user_data(user_id)
+        user_data = get_user_store().get_full_user_data(user_id)
+        # Include writes from earlier turns that are still queued
+        user_data = get_write_behind_queue().apply_pending(user_id, user_data)
         if not user_data:
             logger.warning(f"No user data found for user_id: {user_id}")
         logger.debug(f"User data: {user_data}")
-        state['user_language'] = user_data.get("preferred-language", "en-IN")
-        state['history'] = user_data.get("history", [])
-        state['cart'] = user_data.get("cart", [])
+        # Unset for new users; speech to text detects and stores it
+        user_language = user_data.get("preferred-language")
+        remember_language(user_id, user_language)
+        return {
+            "user_language": user_language,
+            "history": user_data.get("history", []),
+            "cart": user_data.get("cart", []),
+        }
     except Exception as e:
         logger.error(f"Error fetching user data: {e}")
-        state['error_message'] = str(e)
+        return {"error_message": str(e)}
+
+def update_user_language(state: AgentState, detected_language: str) -> str:
+    """
+    Save a newly detected language as the user's preferred language.
+
+    Returns:
+        str: The detected language, or the stored one if none was detected
+    """
+    stored_language = state.get("user_language")
+    user_language = detected_language or stored_language
+    if user_language and user_language != stored_language:
+        logger.info(f"Preferred language of {state.get('user_id')} is now {user_language}")
+        get_write_behind_queue().enqueue_user_data(state["user_id"], "preferred-language", user_language)
+    remember_language(state.get("user_id"), user_language)
+    return user_language
 
 def convert_speech_to_text_node(state: AgentState):
     """
     Converts regional voice message to English text.
-    Input: state['regional_audio_path']
+    The stored language is passed to STT as a hint, and a newly detected
+    language is saved as the user's preferred language.
+    Input: state['regional_audio_path'], state['user_language']
     Output: state['english_query'], state['user_language'] or state['error_message']
     """
     logger.info("---CONVERTING SPEECH TO TEXT---")
@@ -83,13 +118,17 @@ def convert_speech_to_text_node(state: AgentState):
     
     try:
         #Translate regional audio to English
-        english_text, user_language = translate_audio(audio_path)
+        stored_language = state.get("user_language")
+        english_text, detected_language = translate_audio(audio_path, language_hint=stored_language)
 
         if not english_text:
             logger.error("Translation to English failed.")
             return {"error_message": "Translation to English failed."}
         
         logger.debug(f"English query: {english_text}")
+        if detected_language == "unknown":
+            detected_language = None
+        user_language = update_user_language(state, detected_language)
         return {"english_query": english_text, "user_language": user_language}
     except Exception as e:
         import traceback
@@ -99,11 +138,43 @@ def convert_speech_to_text_node(state: AgentState):
         logger.error(error_details)
         return {"error_message": f"Speech to text/translation pipeline failed: {str(e)}"}
 
+def convert_text_to_english_node(state: AgentState):
+    """
+    Detects the language of a typed message from its script and translates
+    it to English unless it already is, so typed messages skip STT. Only
+    messages in an Indic script change the user's stored language.
+    Input: state['text_query'], state['user_language']
+    Output: state['english_query'], state['user_language'] or state['error_message']
+    """
+    logger.info("---CONVERTING TEXT TO ENGLISH---")
+    text = (state.get("text_query") or "").strip()
+
+    if not text:
+        return {"error_message": "Text message not found in state."}
+
+    text_language = detect_language(text, state.get("user_language"))
+    if not text_language or is_english(text_language):
+        # Latin text ("ok", "iPhone 15", romanised Hindi) is read as is, but says too
+        # little to change the reply language; only Indic scripts update the stored one
+        user_language = update_user_language(state, None) or text_language
+        return {"english_query": text, "user_language": user_language}
+
+    user_language = update_user_language(state, text_language)
+
+    try:
+        english_text = translate_text(text, user_language, "en-IN")
+    except Exception as e:
+        logger.error(f"Error translating text message: {e}")
+        return {"error_message": f"Text translation failed: {str(e)}"}
+    logger.debug(f"English query: {english_text}")
+    return {"english_query": english_text, "user_language": user_language}
+
 def query_vector_db_node(state: AgentState):
     """
-    Query the vector database and identify relevant products.
+    Query the vector database and identify relevant products, plus
+    complementary ones from the precomputed related-products table.
     Input: state['english_query']
-    Output: state['products'] or state['error_message']
+    Output: state['products'], state['related_products'] or state['error_message']
     """
     logger.info("---QUERYING VECTOR DATABASE---")
     english_query = state.get("english_query")
@@ -112,11 +183,21 @@ def query_vector_db_node(state: AgentState):
         return {"error_message": "English query not found in state for DB query."}
 
     vector_store = get_vector_store()
-    products = vector_store.search(english_query, limit=3)
+    # Push price and category constraints from the query into the search
+    filters = extract_filters(english_query, vector_store.categories())
+    logger.debug(f"Query filters: {filters}")
+    products = vector_store.search(english_query, limit=3, filters=filters)
+    if filters and not products:
+        # Nothing matches the constraints; let the LLM offer the closest alternatives
+        products = vector_store.search(english_query, limit=3)
 
     state['products'] = products
     logger.debug(f"Relevant products: {state['products']}")
-    return {"products": state['products']}
+    # A table lookup, not another search
+    related = vector_store.related_products([product["id"] for product in products], limit=RELATED_PRODUCTS_LIMIT) \
+        if RELATED_PRODUCTS_LIMIT > 0 and products else []
+    logger.debug(f"Related products: {related}")
+    return {"products": state['products'], "related_products": related}
 
 def call_llm_node(state: AgentState):
     """
@@ -130,15 +211,14 @@ def call_llm_node(state: AgentState):
         history=state.get("history", []),
         products=products,
         query=english_query,
+        related=state.get("related_products"),
     )
     logger.debug(f"LLM prompt: {llm_prompt}")
     state['llm_response'] = chat_completion(
         prompt=llm_prompt,
     )
-    # Store conversation
-    # Initialize Firestore client
-    firestore_client = FirestoreClient()
-    firestore_client.save_conversation(state["user_id"], [
+    # Store conversation in the background so the reply doesn't wait on the write
+    get_write_behind_queue().enqueue_conversation(state["user_id"], [
         {"role": "user", "content": english_query},
         {"role": "assistant", "content": state['llm_response']},
     ])
@@ -157,10 +237,12 @@ def generate_response_node(state: AgentState):
     if not llm_response:
         return {"error_message": "No LLM response."}
 
+    # The LLM answers in English; English-speaking users skip the translate call
     response_text, response_voice_url = translate_and_speak(
         llm_response,
         "en-IN",
-        state.get("user_language")
+        state.get("user_language") or "en-IN",
+        speak=state.get("reply_with_voice", True)
     )
 
     state['response'] = {
@@ -176,35 +258,24 @@ def generate_response_node(state: AgentState):
 
 def handle_error_node(state: AgentState):
     """
-    Handles errors and prepares a generic error message.
+    Handles errors with the pre-translated, pre-synthesised error reply in the
+    user's language, so no upstream service is called on the error path.
     """
     logger.info(f"---ERROR HANDLER---")
     error = state.get("error_message", "An unknown error occurred.")
     logger.debug(f"Error: {error}")
+    canned = get_canned_response_bank().get("error", state.get("user_language"))
     return {
-        "llm_response": "Sorry, I encountered an error while processing your request. Please try again later.",
+        "llm_response": canned["text"],
+        "response": {"text": canned["text"], "voice_url": canned["voice_url"], "image_url": None},
         "error_message": error # Keep the error message for logging
     }
 
-# Define Graph
-workflow = StateGraph(AgentState)
-
-# TODO: Intent identification node - Router
-workflow.add_node("get_user_info", get_user_info_node)
-workflow.add_node("speech_to_text", convert_speech_to_text_node)
-workflow.add_node("query_vector_db", query_vector_db_node)
-workflow.add_node("call_llm", call_llm_node)
-workflow.add_node("generate_response", generate_response_node)
-workflow.add_node("error_handler", handle_error_node)
-
-# Define Edges
-workflow.set_entry_point("get_user_info")
-
 def decide_next_step(state: AgentState):
     if state.get("error_message"):
         return "error_handler"
     if not state.get("english_query"):
-        return "speech_to_text"
+        return "text_to_english" if state.get("text_query") else "speech_to_text"
     if not state.get("products"):
         return "query_vector_db"
     if not state.get("llm_response"): # Check if response is generated
@@ -213,43 +284,74 @@ def decide_next_step(state: AgentState):
         return "generate_response"
     return END
 
-workflow.add_conditional_edges(
-    "get_user_info",
-    decide_next_step,
-    {
-        "speech_to_text": "speech_to_text",
-        "error_handler": "error_handler",
-    } 
-)
-
-workflow.add_conditional_edges(
-    "speech_to_text",
-    decide_next_step,
-    {
-        "query_vector_db": "query_vector_db",
-        "error_handler": "error_handler",
-    }
-)
-
-workflow.add_conditional_edges(
-    "query_vector_db",
-    decide_next_step,
-    {
-        "call_llm": "call_llm",
-        "error_handler": "error_handler",
-    }
-)
-workflow.add_conditional_edges(
-    "call_llm",
-    decide_next_step,
-    {
-        "generate_response": "generate_response",
-        "error_handler": "error_handler",
-    }
-)
+def build_graph():
+    """Build and compile the agent graph."""
+    workflow = StateGraph(AgentState)
+
+    # TODO: Intent identification node - Router
+    # Every node is recorded as a span of the request that invoked the graph
+    workflow.add_node("get_user_info", traced("get_user_info", "node")(get_user_info_node))
+    workflow.add_node("speech_to_text", traced("speech_to_text", "node")(convert_speech_to_text_node))
+    workflow.add_node("text_to_english", traced("text_to_english", "node")(convert_text_to_english_node))
+    workflow.add_node("query_vector_db", traced("query_vector_db", "node")(query_vector_db_node))
+    workflow.add_node("call_llm", traced("call_llm", "node")(call_llm_node))
+    workflow.add_node("generate_response", traced("generate_response", "node")(generate_response_node))
+    workflow.add_node("error_handler", traced("error_handler", "node")(handle_error_node))
+
+    # Define Edges
+    workflow.set_entry_point("get_user_info")
+
+    workflow.add_conditional_edges(
+        "get_user_info",
+        decide_next_step,
+        {
+            "speech_to_text": "speech_to_text",
+            "text_to_english": "text_to_english",
+            "error_handler": "error_handler",
+        } 
+    )
+
+    for node in ("speech_to_text", "text_to_english"):
+        workflow.add_conditional_edges(
+            node,
+            decide_next_step,
+            {
+                "query_vector_db": "query_vector_db",
+                "error_handler": "error_handler",
+            }
+        )
+
+    workflow.add_conditional_edges(
+        "query_vector_db",
+        decide_next_step,
+        {
+            "call_llm": "call_llm",
+            "error_handler": "error_handler",
+        }
+    )
+    workflow.add_conditional_edges(
+        "call_llm",
+        decide_next_step,
+        {
+            "generate_response": "generate_response",
+            "error_handler": "error_handler",
+        }
+    )
+
+    workflow.add_edge("error_handler", END)
+    workflow.add_edge("generate_response", END)
+
+    return workflow.compile()
+
 
-workflow.add_edge("error_handler", "generate_response")
-workflow.add_edge("generate_response", END)
+compiled_graph = None
+_compiled_graph_lock = threading.Lock()
 
-# Compile the graph
-compiled_graph = workflow.compile()
\ No newline at end of file
+def get_compiled_graph():
+    """Compile the graph on first use, so importing this module stays cheap."""
+    global compiled_graph
+    if compiled_graph is None:
+        with _compiled_graph_lock:
+            if compiled_graph is None:
+                compiled_graph = build_graph()
+    return compiled_graph
@@ -0,0 +1,103 @@
+"""
+Extract simple structured constraints (price range, category) from English queries.
+"""
+import re
+from typing import Any, Dict, Iterable, Optional
+
+from src.data.catalog import normalize_category
+
+# Words that point at a catalog category without naming it
+CATEGORY_SYNONYMS = {
+    "footwear": ["shoe", "shoes", "sneaker", "sneakers", "sandal", "sandals", "slippers", "footwear"],
+    "apparel": ["shirt", "shirts", "t-shirt", "t-shirts", "tshirt", "jeans", "kurti", "kurtis", "clothes",
+                "clothing", "dress", "apparel"],
+    "electronics": ["phone", "phones", "smartphone", "mobile", "earbuds", "headphones", "speaker", "gadget",
+                    "gadgets", "electronics"],
+    "accessories": ["wallet", "watch", "sunglasses", "backpack", "bag", "accessory", "accessories"],
+    "furniture": ["chair", "table", "desk", "sofa", "furniture"],
+}
+
+_CURRENCY_BEFORE = r"(rs\.?|inr|₹)?"
+_CURRENCY_AFTER = r"(rs\.?|rupees?|inr|₹|/-)?"
+_AMOUNT = rf"{_CURRENCY_BEFORE}\s*(\d[\d,]*(?:\.\d+)?)\s*(?:(k|thousand)\b)?\s*{_CURRENCY_AFTER}"
+# Groups per amount: currency before, number, multiplier, currency after
+_GROUPS = 4
+_BETWEEN = re.compile(rf"\b(?:between|from)\s+{_AMOUNT}\s+(?:and|to|-)\s+{_AMOUNT}", re.IGNORECASE)
+_MAX = re.compile(
+    rf"\b(?:under|below|less than|cheaper than|within|up to|upto|at most|not more than|max(?:imum)?|budget of|budget)\s+{_AMOUNT}",
+    re.IGNORECASE,
+)
+_MIN = re.compile(rf"\b(?:above|over|more than|at least|min(?:imum)?|starting(?: at| from)?)\s+{_AMOUNT}", re.IGNORECASE)
+# Units that make a number something other than a price, e.g. "within 2 days", "over 8 GB"
+_UNIT = re.compile(
+    r"\s*(?:days?|hours?|hrs?|minutes?|mins?|weeks?|months?|years?|yrs?|km|kms|kilomet(?:er|re)s?|m|met(?:er|re)s?|"
+    r"cm|mm|inch(?:es)?|kg|kgs|g|grams?|gb|tb|mb|mah|mp|w|watts?|l|lit(?:er|re)s?|ml|%|percent|"
+    r"pieces?|pcs|items?|people|persons?|stars?)(?!\w)"
+)
+
+
+def _amount(match: re.Match, index: int = 0) -> float:
+    number, multiplier = match.group(index * _GROUPS + 2), match.group(index * _GROUPS + 3)
+    value = float(number.replace(",", ""))
+    return value * 1000 if multiplier else value
+
+
+def _is_price(match: re.Match, text: str) -> bool:
+    """
+    Whether every amount of a matched bound is a price rather than, say, "within 2 days".
+
+    Bare numbers are prices unless a unit follows them; an amount with a
+    currency marker always is.
+    """
+    for index in range(len(match.groups()) // _GROUPS):
+        before, _, multiplier, after = match.groups()[index * _GROUPS:(index + 1) * _GROUPS]
+        if before or after:
+            continue
+        end = match.end(index * _GROUPS + (3 if multiplier else 2))
+        if _UNIT.match(text, end):
+            return False
+    return True
+
+
+def _first_price(pattern: re.Pattern, text: str) -> Optional[re.Match]:
+    return next((match for match in pattern.finditer(text) if _is_price(match, text)), None)
+
+
+def extract_filters(query: str, categories: Iterable[str] = ()) -> Dict[str, Any]:
+    """
+    Extract a price range and category from a query.
+
+    Args:
+        query: English query, e.g. "show me running shoes under 2000 rupees"
+        categories: Categories present in the catalog; others are never returned
+
+    Returns:
+        dict: Filters for VectorStore.search, e.g. {"category": ["footwear"], "max_price": 2000.0}.
+        Numbers followed by a unit are not prices, so "within 2 days" sets no bound.
+    """
+    filters: Dict[str, Any] = {}
+    text = query.lower()
+
+    between = _first_price(_BETWEEN, text)
+    if between:
+        low, high = _amount(between), _amount(between, 1)
+        filters["min_price"], filters["max_price"] = min(low, high), max(low, high)
+    else:
+        maximum = _first_price(_MAX, text)
+        if maximum:
+            filters["max_price"] = _amount(maximum)
+        minimum = _first_price(_MIN, text)
+        if minimum:
+            filters["min_price"] = _amount(minimum)
+
+    known = {normalize_category(category) for category in categories}
+    words = set(re.findall(r"[\w-]+", text))
+    matched = set()
+    for category in known:
+        if category in text or words & set(CATEGORY_SYNONYMS.get(category, [])):
+            matched.add(category)
+    # Only filter on category when the query clearly points at one
+    if len(matched) == 1:
+        filters["category"] = sorted(matched)
+
+    return filters
@@ -0,0 +1,107 @@
+"""
+Catalog normalisation and structured product filters.
+
+Products are normalised at ingestion: display prices such as "₹1,299" are
+parsed into a numeric price_value field and categories are lowercased, so
+searches can filter on them inside the index.
+
+Filters are dictionaries with any of these keys:
+    category: category name or list of names
+    min_price: minimum price in rupees (inclusive)
+    max_price: maximum price in rupees (inclusive)
+"""
+import re
+from typing import Any, Dict, List, Optional
+
+PRICE_FIELD = "price_value"
+
+_PRICE_PATTERN = re.compile(r"\d[\d,]*(?:\.\d+)?")
+
+
+def parse_price(price: Any) -> Optional[float]:
+    """
+    Parse a display price into a number.
+
+    Args:
+        price: Price such as "₹1299", "Rs. 1,299.50" or 1299
+
+    Returns:
+        The price as a float, or None if it can't be parsed
+    """
+    if isinstance(price, (int, float)):
+        return float(price)
+    match = _PRICE_PATTERN.search(str(price or ""))
+    if not match:
+        return None
+    return float(match.group().replace(",", ""))
+
+
+def normalize_category(category: Any) -> str:
+    """Lowercase a category and collapse separators, e.g. "Home_Decor " -> "home decor"."""
+    return re.sub(r"[\s_\-]+", " ", str(category or "")).strip().lower()
+
+
+def prepare_product(product: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Normalise a catalog product for storage.
+
+    Args:
+        product: Product dictionary from the catalog
+
+    Returns:
+        A copy with a normalised category and a numeric price_value
+    """
+    prepared = dict(product)
+    if "category" in prepared:
+        prepared["category"] = normalize_category(prepared["category"])
+    price = parse_price(prepared.get("price"))
+    if price is not None:
+        prepared[PRICE_FIELD] = price
+    else:
+        prepared.pop(PRICE_FIELD, None)
+    return prepared
+
+
+def normalize_filters(filters: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Drop empty filter values and normalise category names into a list."""
+    normalized = {}
+    if not filters:
+        return normalized
+    categories = filters.get("category")
+    if categories:
+        if isinstance(categories, str):
+            categories = [categories]
+        normalized["category"] = sorted({normalize_category(c) for c in categories})
+    for key in ("min_price", "max_price"):
+        if filters.get(key) is not None:
+            normalized[key] = float(filters[key])
+    return normalized
+
+
+def matches_filters(product: Dict[str, Any], filters: Dict[str, Any]) -> bool:
+    """Check a product against normalised filters."""
+    if "category" in filters and product.get("category") not in filters["category"]:
+        return False
+    if "min_price" in filters or "max_price" in filters:
+        price = product.get(PRICE_FIELD)
+        if price is None:
+            return False
+        if price < filters.get("min_price", float("-inf")) or price > filters.get("max_price", float("inf")):
+            return False
+    return True
+
+
+def chroma_where(filters: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Translate normalised filters into a Chroma metadata where clause."""
+    clauses: List[Dict[str, Any]] = []
+    if "category" in filters:
+        clauses.append({"category": {"$in": filters["category"]}})
+    if "min_price" in filters:
+        clauses.append({PRICE_FIELD: {"$gte": filters["min_price"]}})
+    if "max_price" in filters:
+        clauses.append({PRICE_FIELD: {"$lte": filters["max_price"]}})
+    if not clauses:
+        return None
+    if len(clauses) == 1:
+        return clauses[0]
+    return {"$and": clauses}
@@ -2,25 +2,37 @@ import os
 from google.cloud import firestore
 import logging
 
+from src.db.storage import UserStore, apply_write
+from src.utils.tracing import traced
+
 DB_NAME = os.environ.get("DB_NAME")
 COLLECTION_NAME = os.environ.get("SCHEMA_NAME")
+# Firestore rejects batches with more than 500 writes
+MAX_BATCH_WRITES = 500
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-class FirestoreClient:
-    def __init__(self):
+class FirestoreClient(UserStore):
+    def __init__(self, database: str = None, collection_name: str = None):
         """
         Initialize FirestoreClient.
+
+        Args:
+            database (str): Firestore database name. Defaults to DB_NAME.
+            collection_name (str): Collection holding user documents. Defaults to COLLECTION_NAME.
         """
-        if not DB_NAME or not COLLECTION_NAME:
+        database = database or DB_NAME
+        collection_name = collection_name or COLLECTION_NAME
+        if not database or not collection_name:
             raise ValueError("DB_NAME and COLLECTION_NAME environment variables must be set.")
         self.client = firestore.Client(
             project=os.environ.get("GCP_PROJECT_ID"),
-            database=DB_NAME
+            database=database
         )
-        self.collection = self.client.collection(COLLECTION_NAME)
+        self.collection = self.client.collection(collection_name)
 
+    @traced("firestore.save_conversation", "firestore")
     def save_conversation(self, user_id: str, exchange: list[dict]) -> None:
         """
         Save conversation data to Firestore.
@@ -38,8 +50,9 @@ class FirestoreClient:
             history = []
 
         history.extend(exchange)
-        doc_ref.set({"history": history})
+        doc_ref.set({"history": history}, merge=True)
 
+    @traced("firestore.save_user_data", "firestore")
     def save_user_data(self, user_id: str, key: str, input_data: any) -> None:
         """
         Save user data to Firestore.
@@ -59,6 +72,7 @@ class FirestoreClient:
         user_data[key] = input_data
         doc_ref.set(user_data)
 
+    @traced("firestore.get_full_user_data", "firestore")
     def get_full_user_data(self, user_id: str) -> dict:
         """
         Load user data from Firestore.
@@ -76,9 +90,44 @@ class FirestoreClient:
             return doc.to_dict()
         return {}
 
+    @traced("firestore.apply_writes", "firestore")
+    def apply_writes(self, writes: list[tuple]) -> None:
+        """
+        Apply queued writes for many users using batched commits.
+
+        All affected documents are read in a single round trip, the writes are
+        applied in order in memory and the results are committed in batches.
+
+        Args:
+            writes (list[tuple]): (user_id, kind, payload) tuples where kind is
+                "conversation" (payload is a list of messages) or "user_data"
+                (payload is a (key, value) tuple).
+        """
+        if not writes:
+            return
+
+        user_ids = list(dict.fromkeys(user_id for user_id, _, _ in writes))
+        doc_refs = {user_id: self.collection.document(user_id) for user_id in user_ids}
+
+        documents = {user_id: {} for user_id in user_ids}
+        for snapshot in self.client.get_all(list(doc_refs.values())):
+            if snapshot.exists:
+                documents[snapshot.id] = snapshot.to_dict()
+
+        for user_id, kind, payload in writes:
+            apply_write(documents[user_id], kind, payload)
+
+        for start in range(0, len(user_ids), MAX_BATCH_WRITES):
+            batch = self.client.batch()
+            for user_id in user_ids[start:start + MAX_BATCH_WRITES]:
+                batch.set(doc_refs[user_id], documents[user_id])
+            batch.commit()
+
+    @traced("firestore.delete_user", "firestore")
     def delete_user(self, user_id: str) -> None:
         """
         Delete user data from Firestore.
         """
         doc_ref = self.collection.document(user_id)
         doc_ref.delete()
+
@@ -0,0 +1,127 @@
+"""
+Embedded SQLite storage backend for user data.
+
+Each user is stored as a single JSON document, mirroring the Firestore layout.
+The database runs in WAL mode so readers don't block the writer.
+"""
+import json
+import sqlite3
+import threading
+import logging
+
+from src.db.storage import UserStore, apply_write
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class SQLiteClient(UserStore):
+    def __init__(self, db_path: str):
+        """
+        Initialize SQLiteClient.
+
+        Args:
+            db_path (str): Path to the database file.
+        """
+        self.db_path = db_path
+        self._local = threading.local()
+        with self._transaction() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS users (user_id TEXT PRIMARY KEY, data TEXT NOT NULL)"
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return the connection for the current thread, opening it if needed."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _transaction(self) -> "_Transaction":
+        return _Transaction(self._connection())
+
+    @staticmethod
+    def _read(conn: sqlite3.Connection, user_id: str) -> dict:
+        row = conn.execute("SELECT data FROM users WHERE user_id = ?", (user_id,)).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    @staticmethod
+    def _write(conn: sqlite3.Connection, user_id: str, user_data: dict) -> None:
+        conn.execute(
+            "INSERT INTO users (user_id, data) VALUES (?, ?) "
+            "ON CONFLICT(user_id) DO UPDATE SET data = excluded.data",
+            (user_id, json.dumps(user_data, ensure_ascii=False)),
+        )
+
+    def save_conversation(self, user_id: str, exchange: list[dict]) -> None:
+        """
+        Save conversation data to SQLite.
+
+        Args:
+            user_id (str): Unique identifier for the user.
+            exchange (list[dict]): List of dictionaries containing conversation data.
+        """
+        self.apply_writes([(user_id, "conversation", exchange)])
+
+    def save_user_data(self, user_id: str, key: str, input_data: any) -> None:
+        """
+        Save user data to SQLite.
+
+        Args:
+            key (str): The key under which to store the user data.
+            input_data (any): Input data from the user.
+        """
+        self.apply_writes([(user_id, "user_data", (key, input_data))])
+
+    def apply_writes(self, writes: list[tuple]) -> None:
+        """
+        Apply queued writes for many users in a single transaction.
+        """
+        if not writes:
+            return
+        with self._transaction() as conn:
+            documents = {}
+            for user_id, kind, payload in writes:
+                if user_id not in documents:
+                    documents[user_id] = self._read(conn, user_id)
+                apply_write(documents[user_id], kind, payload)
+            for user_id, user_data in documents.items():
+                self._write(conn, user_id, user_data)
+
+    def get_full_user_data(self, user_id: str) -> dict:
+        """
+        Load user data from SQLite.
+
+        Returns:
+            dict: user data
+        """
+        logger.info(f"Fetching user data for user_id: {user_id}")
+        return self._read(self._connection(), user_id)
+
+    def delete_user(self, user_id: str) -> None:
+        """
+        Delete user data from SQLite.
+        """
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM users WHERE user_id = ?", (user_id,))
+
+
+class _Transaction:
+    """Runs a block inside BEGIN IMMEDIATE ... COMMIT on an autocommit connection."""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.conn.execute("COMMIT")
+        else:
+            self.conn.execute("ROLLBACK")
+        return False
@@ -0,0 +1,127 @@
+"""
+Storage interface for user data and conversation history.
+
+The backend is selected with the STORAGE_BACKEND environment variable:
+"firestore" (default) or "sqlite" for an embedded database that works offline.
+"""
+import os
+import threading
+import logging
+from abc import ABC, abstractmethod
+
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "firestore")
+SQLITE_DB_PATH = os.environ.get("SQLITE_DB_PATH", "user_data.sqlite3")
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def apply_write(user_data: dict, kind: str, payload: any) -> dict:
+    """
+    Apply a single queued write to a user document in memory.
+
+    Args:
+        user_data (dict): The user document, modified in place.
+        kind (str): "conversation" or "user_data".
+        payload (any): Messages to append, or a (key, value) tuple.
+
+    Returns:
+        dict: The updated user document.
+    """
+    if kind == "conversation":
+        user_data["history"] = list(user_data.get("history", [])) + list(payload)
+    elif kind == "user_data":
+        key, value = payload
+        user_data[key] = value
+    else:
+        raise ValueError(f"Unknown write kind: {kind}")
+    return user_data
+
+
+class UserStore(ABC):
+    """Interface implemented by every user data storage backend."""
+
+    @abstractmethod
+    def get_full_user_data(self, user_id: str) -> dict:
+        """
+        Load user data.
+
+        Returns:
+            dict: user data, or an empty dict for unknown users
+        """
+
+    @abstractmethod
+    def save_conversation(self, user_id: str, exchange: list[dict]) -> None:
+        """
+        Append messages to the user's conversation history.
+
+        Args:
+            user_id (str): Unique identifier for the user.
+            exchange (list[dict]): List of dictionaries containing conversation data.
+        """
+
+    @abstractmethod
+    def save_user_data(self, user_id: str, key: str, input_data: any) -> None:
+        """
+        Save a single user data field.
+
+        Args:
+            user_id (str): Unique identifier for the user.
+            key (str): The key under which to store the user data.
+            input_data (any): Input data from the user.
+        """
+
+    @abstractmethod
+    def delete_user(self, user_id: str) -> None:
+        """
+        Delete all data for a user.
+        """
+
+    def apply_writes(self, writes: list[tuple]) -> None:
+        """
+        Apply queued writes in order. Backends override this to batch them.
+
+        Args:
+            writes (list[tuple]): (user_id, kind, payload) tuples, see apply_write.
+        """
+        for user_id, kind, payload in writes:
+            if kind == "conversation":
+                self.save_conversation(user_id, payload)
+            elif kind == "user_data":
+                self.save_user_data(user_id, *payload)
+            else:
+                raise ValueError(f"Unknown write kind: {kind}")
+
+
+def create_user_store(backend: str = None, sqlite_path: str = None) -> UserStore:
+    """
+    Create a storage backend by name.
+
+    Args:
+        backend (str): "firestore" or "sqlite". Defaults to STORAGE_BACKEND.
+        sqlite_path (str): Database file for the sqlite backend. Defaults to SQLITE_DB_PATH.
+
+    Returns:
+        UserStore: The storage backend.
+    """
+    backend = (backend or STORAGE_BACKEND).lower()
+    if backend == "firestore":
+        from src.db.firestore import FirestoreClient
+        return FirestoreClient()
+    if backend == "sqlite":
+        from src.db.sqlite_store import SQLiteClient
+        return SQLiteClient(sqlite_path or SQLITE_DB_PATH)
+    raise ValueError(f"Unknown storage backend: {backend}")
+
+
+user_store = None
+_user_store_lock = threading.Lock()
+
+def get_user_store() -> UserStore:
+    global user_store
+    if user_store is None:
+        with _user_store_lock:
+            if user_store is None:
+                logger.info(f"Initializing '{STORAGE_BACKEND}' storage backend")
+                user_store = create_user_store()
+    return user_store
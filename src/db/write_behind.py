@@ -0,0 +1,205 @@
+"""
+Write-behind queue for user data persistence.
+
+Conversation turns and user data updates are queued in memory and committed
+to the database in batches by a background thread, so request handlers never
+wait on a database write.
+"""
+import os
+import atexit
+import time
+import threading
+import logging
+from typing import Any, Callable, List, Tuple
+
+from src.db.storage import get_user_store, apply_write
+from src.utils import metrics
+
+MAX_BATCH_SIZE = int(os.environ.get("WRITE_BEHIND_BATCH_SIZE", "50"))
+FLUSH_INTERVAL = float(os.environ.get("WRITE_BEHIND_FLUSH_INTERVAL", "1.0"))
+# Consecutive failed commits after which the writes in hand are dropped
+MAX_RETRIES = int(os.environ.get("WRITE_BEHIND_MAX_RETRIES", "5"))
+RETRY_BACKOFF = float(os.environ.get("WRITE_BEHIND_RETRY_BACKOFF", "1.0"))
+MAX_RETRY_BACKOFF = 60.0
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+queue_depth_gauge = metrics.gauge("write_behind_queue_depth", "Writes waiting to be committed")
+flush_latency_histogram = metrics.histogram("write_behind_flush_seconds", "Time taken to commit a batch of writes")
+flushed_writes_counter = metrics.counter("write_behind_flushed_writes_total", "Writes committed by the write-behind queue")
+flush_errors_counter = metrics.counter("write_behind_flush_errors_total", "Failed write-behind batch commits")
+dropped_writes_counter = metrics.counter("write_behind_dropped_writes_total",
+                                         "Writes dropped after repeated failed commits")
+
+
+class WriteBehindQueue:
+    """Buffers user writes and commits them in batches from a background thread."""
+
+    def __init__(self, client_factory: Callable[[], Any] = get_user_store,
+                 max_batch_size: int = MAX_BATCH_SIZE, flush_interval: float = FLUSH_INTERVAL,
+                 max_retries: int = MAX_RETRIES, retry_backoff: float = RETRY_BACKOFF):
+        """
+        Initialize the queue and start the flusher thread.
+
+        Args:
+            client_factory: Callable returning a client with an apply_writes method.
+            max_batch_size: Number of queued writes that triggers an immediate flush.
+            flush_interval: Maximum time in seconds a write waits before being flushed.
+            max_retries: Consecutive failed commits after which the queued writes are dropped.
+            retry_backoff: Delay in seconds after the first failed commit, doubled on each further failure.
+        """
+        self.client_factory = client_factory
+        self.client = None
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+
+        self._pending: List[Tuple[str, str, Any]] = []
+        self._in_flight: List[Tuple[str, str, Any]] = []
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._closed = False
+        self._failures = 0
+        self._retry_at = 0.0
+
+        queue_depth_gauge.set_function(self.depth)
+
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+
+    def depth(self) -> int:
+        """Number of writes not yet committed."""
+        with self._condition:
+            return len(self._pending) + len(self._in_flight)
+
+    def enqueue_conversation(self, user_id: str, exchange: list[dict]) -> None:
+        """Queue messages to be appended to the user's conversation history."""
+        self._enqueue(user_id, "conversation", list(exchange))
+
+    def enqueue_user_data(self, user_id: str, key: str, value: Any) -> None:
+        """Queue a single user data field update."""
+        self._enqueue(user_id, "user_data", (key, value))
+
+    def _enqueue(self, user_id: str, kind: str, payload: Any) -> None:
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Write-behind queue has been shut down")
+            self._pending.append((user_id, kind, payload))
+            if len(self._pending) >= self.max_batch_size:
+                self._condition.notify()
+
+    def apply_pending(self, user_id: str, user_data: dict) -> dict:
+        """
+        Overlay writes for user_id that have not been committed yet.
+
+        Args:
+            user_id: Unique identifier for the user.
+            user_data: User data as read from the database.
+
+        Returns:
+            dict: User data including the uncommitted writes.
+        """
+        with self._condition:
+            writes = [w for w in self._in_flight + self._pending if w[0] == user_id]
+        if not writes:
+            return user_data
+        user_data = dict(user_data or {})
+        for _, kind, payload in writes:
+            apply_write(user_data, kind, payload)
+        return user_data
+
+    def flush(self) -> int:
+        """
+        Commit every queued write.
+
+        Returns:
+            int: Number of writes committed.
+        """
+        with self._flush_lock:
+            with self._condition:
+                if not self._pending:
+                    return 0
+                self._in_flight = self._pending
+                self._pending = []
+            writes = self._in_flight
+
+            start = time.perf_counter()
+            try:
+                if self.client is None:
+                    self.client = self.client_factory()
+                self.client.apply_writes(writes)
+            except Exception as e:
+                logger.error(f"Error committing {len(writes)} queued writes: {e}")
+                flush_errors_counter.inc()
+                self._failures += 1
+                with self._condition:
+                    self._in_flight = []
+                    if self._failures >= self.max_retries:
+                        self._failures = 0
+                        self._retry_at = 0.0
+                        users = sorted({user_id for user_id, _, _ in writes})
+                        logger.error(f"Dropping {len(writes)} writes for users {users} "
+                                     f"after {self.max_retries} failed commits")
+                        dropped_writes_counter.inc(len(writes))
+                    else:
+                        # Put the writes back in front of anything queued meanwhile and back off
+                        self._pending = writes + self._pending
+                        backoff = min(self.retry_backoff * 2 ** (self._failures - 1), MAX_RETRY_BACKOFF)
+                        self._retry_at = time.monotonic() + backoff
+                return 0
+            finally:
+                flush_latency_histogram.observe(time.perf_counter() - start)
+
+            self._failures = 0
+            with self._condition:
+                self._in_flight = []
+                self._retry_at = 0.0
+            flushed_writes_counter.inc(len(writes))
+            logger.debug(f"Committed {len(writes)} queued writes")
+            return len(writes)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                backoff = self._retry_at - time.monotonic()
+                if not self._closed and (backoff > 0 or len(self._pending) < self.max_batch_size):
+                    self._condition.wait(timeout=max(backoff, self.flush_interval))
+                closed = self._closed
+                if not closed and self._retry_at > time.monotonic():
+                    # Woken by new writes while backing off from a failed commit
+                    continue
+            self.flush()
+            if closed:
+                return
+
+    def shutdown(self, timeout: float = 10.0) -> None:
+        """Stop accepting writes and drain the queue."""
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify()
+        self._thread.join(timeout=timeout)
+        if self._thread.is_alive():
+            logger.warning("Write-behind flusher did not stop in time")
+            return
+        # Retry anything that failed during the final flush once more
+        self.flush()
+        remaining = self.depth()
+        if remaining:
+            logger.error(f"Write-behind queue shut down with {remaining} uncommitted writes")
+
+
+write_behind_queue = None
+_queue_lock = threading.Lock()
+
+def get_write_behind_queue() -> WriteBehindQueue:
+    global write_behind_queue
+    if write_behind_queue is None:
+        with _queue_lock:
+            if write_behind_queue is None:
+                write_behind_queue = WriteBehindQueue()
+                atexit.register(write_behind_queue.shutdown)
+    return write_behind_queue
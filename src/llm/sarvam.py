@@ -6,6 +6,8 @@ import os
 import logging
 from sarvamai import SarvamAI
 
+from src.utils.tracing import span
+
 # Initialize Sarvam AI client
 sarvam_api_key = os.environ.get("SARVAM_API_KEY")
 sarvam_client = None
@@ -46,21 +48,22 @@ def chat_completion(prompt: str, model: str = "sarvam-m", temperature: float = 0
     logger.info(f"Generating chat completion with model: {model}")
     
     try:
-        response = sarvam_client.chat.completions(messages=[
-            {
-                "role": "system", 
-                "content": (
-                    "You are a helpful salesperson." 
-                    "Answer questions about products and provide recommendations based only on the context provided."
-                    "Do not make thing up if you don't know the answer. Try to be helpful and upsell products when possible."
-                    "Make sure to return no more than 900 characters in your response."
-                )
-            },
-            {
-                "role": "user", 
-                "content": prompt
-            }
-        ])
+        with span("sarvam.chat_completion", "sarvam", model=model):
+            response = sarvam_client.chat.completions(messages=[
+                {
+                    "role": "system", 
+                    "content": (
+                        "You are a helpful salesperson." 
+                        "Answer questions about products and provide recommendations based only on the context provided."
+                        "Do not make thing up if you don't know the answer. Try to be helpful and upsell products when possible."
+                        "Make sure to return no more than 900 characters in your response."
+                    )
+                },
+                {
+                    "role": "user", 
+                    "content": prompt
+                }
+            ])
         
         return response.choices[0].message.content.strip()
     
@@ -2,17 +2,24 @@
 Shopping Assistant Prompt
 """
 
-def get_prompt(history: list, products: str, query: str) -> str:
+def get_prompt(history: list, products: str, query: str, related: list = None) -> str:
     """
     Returns a prompt for the shopping assistant.
 
     This template is used to format user queries and product context for the LLM.
+    Related products, if given, are complementary items the assistant can upsell.
     """
     prompt = f"""
         Here are the details of the relevant products in json format:
         {products}
 
-        Conversation History:
+"""
+    if related:
+        prompt += f"""        Here are complementary products the user may also like, in json format. Suggest one when it fits:
+        {related}
+
+"""
+    prompt += """        Conversation History:
 
     """
     for exchange in history:
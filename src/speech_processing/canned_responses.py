@@ -0,0 +1,180 @@
+"""
+Pre-translated, pre-synthesised replies for errors and common system messages.
+
+Error replies are needed exactly when Sarvam or another upstream is failing,
+so they are translated and synthesised ahead of time, either offline with
+scripts/build_canned_responses.py or at startup with CANNED_RESPONSES_BUILD=true.
+The text and audio URL of every message in every supported language are kept
+in CANNED_RESPONSES_FILE, and serving a canned reply makes no upstream calls.
+Messages missing from the bank fall back to the English text without audio.
+"""
+import os
+import json
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Optional
+
+CANNED_RESPONSES_FILE = os.environ.get("CANNED_RESPONSES_FILE", "canned_responses.json")
+DEFAULT_LANGUAGE = "en-IN"
+# Languages Sarvam translates to and synthesises
+SUPPORTED_LANGUAGES = (
+    "en-IN", "hi-IN", "bn-IN", "gu-IN", "kn-IN", "ml-IN", "mr-IN", "od-IN", "pa-IN", "ta-IN", "te-IN",
+)
+
+# English source text of every canned message
+CANNED_MESSAGES = {
+    "error": "Sorry, I encountered an error while processing your request. Please try again later.",
+    "voice_processing_failed": (
+        "Sorry, I had trouble processing your voice message. "
+        "Could you please try again or send a text message instead?"
+    ),
+    "try_later": (
+        "I'm still working on your earlier messages. "
+        "Please wait a moment and send your message again."
+    ),
+}
+
+# Senders whose language is remembered for replies sent without graph state
+MAX_REMEMBERED_LANGUAGES = 10000
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def source_hash(text: str) -> str:
+    """Identifies the English text an entry was built from, so edited messages are rebuilt."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:12]
+
+
+class CannedResponseBank:
+    """Canned messages per language, loaded from and saved to a JSON file."""
+
+    def __init__(self, path: str = CANNED_RESPONSES_FILE, messages: Dict[str, str] = None):
+        self.path = path
+        self.messages = dict(messages or CANNED_MESSAGES)
+        self.entries: Dict[str, Dict[str, Dict[str, Optional[str]]]] = {}
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self) -> None:
+        if not os.path.exists(self.path):
+            logger.warning(f"No canned response bank at {self.path}; replies fall back to English text")
+            return
+        with open(self.path, encoding="utf-8") as f:
+            self.entries = json.load(f).get("messages", {})
+        logger.info(f"Loaded canned responses for {len(self.entries)} messages from {self.path}")
+
+    def save(self) -> None:
+        # A temporary file of its own, as every gunicorn worker may build and save at once
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, temp_path = tempfile.mkstemp(prefix=os.path.basename(self.path) + ".", dir=directory)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"messages": self.entries}, f, ensure_ascii=False, indent=2, sort_keys=True)
+            os.replace(temp_path, self.path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def get(self, key: str, language: Optional[str] = None) -> Dict[str, Optional[str]]:
+        """
+        Return the canned reply for a message key.
+
+        Args:
+            key: Message key, e.g. "error"
+            language: Language code; defaults to English
+
+        Returns:
+            dict: "text" and "voice_url" (None without pre-synthesised audio)
+        """
+        expected = source_hash(self.messages[key])
+        by_language = self.entries.get(key, {})
+        for candidate in (language or DEFAULT_LANGUAGE, DEFAULT_LANGUAGE):
+            entry = by_language.get(candidate)
+            if entry and entry.get("source_hash") == expected:
+                return {"text": entry["text"], "voice_url": entry.get("voice_url")}
+        return {"text": self.messages[key], "voice_url": None}
+
+    def missing(self, languages: Iterable[str] = SUPPORTED_LANGUAGES):
+        """(key, language) pairs that are absent, lack audio or were built from outdated text."""
+        pairs = []
+        for key, text in self.messages.items():
+            for language in languages:
+                entry = self.entries.get(key, {}).get(language)
+                if not entry or not entry.get("voice_url") or entry.get("source_hash") != source_hash(text):
+                    pairs.append((key, language))
+        return pairs
+
+    def build(self, languages: Iterable[str] = SUPPORTED_LANGUAGES,
+              translate: Callable[[str, str], str] = None,
+              synthesize: Callable[[str, str, str], Optional[str]] = None) -> int:
+        """
+        Translate and synthesise every missing entry and save the bank.
+
+        Args:
+            languages: Language codes to build
+            translate: (english_text, language) -> translated text; defaults to Sarvam
+            synthesize: (text, language, filename) -> audio URL; defaults to Sarvam TTS and GCS
+
+        Returns:
+            int: Number of entries built
+        """
+        if translate is None or synthesize is None:
+            from src.speech_processing.processor import text_to_speech, translate_text
+
+            translate = translate or (lambda text, language: translate_text(text, DEFAULT_LANGUAGE, language))
+            synthesize = synthesize or (lambda text, language, filename: text_to_speech(text, language, filename))
+
+        built = 0
+        with self._lock:
+            for key, language in self.missing(languages):
+                english = self.messages[key]
+                try:
+                    text = english if language == DEFAULT_LANGUAGE else translate(english, language)
+                    digest = source_hash(english)
+                    voice_url = synthesize(text, language, f"canned/{key}_{language}_{digest}.ogg")
+                except Exception as e:
+                    logger.error(f"Could not build canned response {key} for {language}: {e}")
+                    continue
+                self.entries.setdefault(key, {})[language] = {
+                    "text": text, "voice_url": voice_url, "source_hash": digest,
+                }
+                built += 1
+            if built:
+                self.save()
+        logger.info(f"Built {built} canned responses; {len(self.missing(languages))} still missing")
+        return built
+
+
+canned_response_bank = None
+_bank_lock = threading.Lock()
+
+def get_canned_response_bank() -> CannedResponseBank:
+    global canned_response_bank
+    if canned_response_bank is None:
+        with _bank_lock:
+            if canned_response_bank is None:
+                canned_response_bank = CannedResponseBank()
+    return canned_response_bank
+
+
+_languages: "OrderedDict[str, str]" = OrderedDict()
+_languages_lock = threading.Lock()
+
+def remember_language(user_id: str, language: Optional[str]) -> None:
+    """Record a sender's language for replies sent when the graph failed."""
+    if not user_id or not language:
+        return
+    with _languages_lock:
+        _languages[user_id] = language
+        _languages.move_to_end(user_id)
+        while len(_languages) > MAX_REMEMBERED_LANGUAGES:
+            _languages.popitem(last=False)
+
+def remembered_language(user_id: str) -> Optional[str]:
+    with _languages_lock:
+        return _languages.get(user_id)
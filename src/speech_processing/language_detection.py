@@ -0,0 +1,69 @@
+"""
+Local language detection for typed messages.
+
+Each Indic language Sarvam supports has its own Unicode block, so the script
+a message is written in identifies its language without a network call.
+Devanagari is shared by Hindi and Marathi; a user whose stored language is
+Marathi keeps it. Latin text, including romanised Indic text, is treated as
+English, which the LLM reads directly; it doesn't replace a stored Indic
+language, since "ok" or "iPhone 15" says nothing about how to reply.
+"""
+from typing import Optional
+
+# (first code point, last code point, script, language)
+SCRIPT_RANGES = (
+    (0x0900, 0x097F, "Devanagari", "hi-IN"),
+    (0x0980, 0x09FF, "Bengali", "bn-IN"),
+    (0x0A00, 0x0A7F, "Gurmukhi", "pa-IN"),
+    (0x0A80, 0x0AFF, "Gujarati", "gu-IN"),
+    (0x0B00, 0x0B7F, "Oriya", "od-IN"),
+    (0x0B80, 0x0BFF, "Tamil", "ta-IN"),
+    (0x0C00, 0x0C7F, "Telugu", "te-IN"),
+    (0x0C80, 0x0CFF, "Kannada", "kn-IN"),
+    (0x0D00, 0x0D7F, "Malayalam", "ml-IN"),
+)
+# Languages written in each script, for keeping a stored language the script can't tell apart
+SCRIPT_LANGUAGES = {"Devanagari": ("hi-IN", "mr-IN")}
+ENGLISH = "en-IN"
+
+
+def detect_script(text: str) -> Optional[str]:
+    """
+    Return the script most letters of the text are written in.
+
+    Returns:
+        str: A script name from SCRIPT_RANGES, "Latin", or None if the text has no letters
+    """
+    counts = {}
+    for char in text:
+        code = ord(char)
+        if code < 0x0900:
+            if char.isalpha():
+                counts["Latin"] = counts.get("Latin", 0) + 1
+            continue
+        for first, last, script, _ in SCRIPT_RANGES:
+            if first <= code <= last:
+                counts[script] = counts.get(script, 0) + 1
+                break
+    return max(counts, key=counts.get) if counts else None
+
+
+def detect_language(text: str, preferred_language: Optional[str] = None) -> Optional[str]:
+    """
+    Detect the language of a typed message from its script.
+
+    Args:
+        text: Message text
+        preferred_language: The user's stored language, used where the script is ambiguous
+
+    Returns:
+        str: Language code such as 'ta-IN', or preferred_language if the text has no letters
+    """
+    script = detect_script(text)
+    if script is None:
+        return preferred_language
+    if script == "Latin":
+        return ENGLISH
+    if preferred_language in SCRIPT_LANGUAGES.get(script, ()):
+        return preferred_language
+    return next(language for _, _, name, language in SCRIPT_RANGES if name == script)
@@ -9,13 +9,15 @@ import logging
 import io
 import re
 from sarvamai import SarvamAI
-import shutil
 import time
 import mimetypes
 import base64
-from google.cloud import storage
 from pydub import AudioSegment
 
+from src.utils import metrics
+from src.utils.tracing import span
+from src.utils.spool import get_debug_audio_spool
+
 # Initialize Sarvam AI client
 sarvam_api_key = os.environ.get("SARVAM_API_KEY")
 sarvam_client = None
@@ -24,6 +26,10 @@ sarvam_client = None
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+translations_skipped_counter = metrics.counter(
+    "translations_skipped_total", "Replies sent without a translate call because they were already in the user's language"
+)
+
 def detect_audio_format(file_path, content_type=None):
     """
     Detect audio format using file extension and content type
@@ -90,12 +96,66 @@ def configure_speech_processing():
     logger.info("Sarvam AI client initialized successfully")
 
 
-def download_audio_for_sarvam(media_url):
+def convert_to_wav(original_path, audio_format):
+    """
+    Transcode an audio file to WAV next to the original.
+
+    Args:
+        original_path: Path to the audio file
+        audio_format: Format name from detect_audio_format
+
+    Returns:
+        str: Path to the WAV file
+    """
+    with span("audio.transcode_to_wav", "audio", source_format=audio_format):
+        # For OGG files from WhatsApp, we may need to try different approaches
+        if audio_format == 'ogg':
+            # Try with both OGG and Opus decoders since WhatsApp can use either
+            try:
+                # First try as OGG Vorbis
+                audio = AudioSegment.from_file(original_path, format="ogg")
+            except Exception as inner_e:
+                logger.warning(f"Failed with OGG format, trying as Opus: {inner_e}")
+                # If that fails, try as Opus in OGG container
+                audio = AudioSegment.from_file(original_path, format="opus")
+        else:
+            # For other formats use the detected format
+            audio = AudioSegment.from_file(original_path, format=audio_format)
+        
+        # Export to WAV format
+        wav_path = original_path.rsplit('.', 1)[0] + '.wav'
+        audio.export(wav_path, format="wav")
+    return wav_path
+
+def encode_ogg_opus(wav_bytes):
+    """
+    Encode WAV audio as OGG/Opus, the format WhatsApp plays as a voice note.
+
+    Args:
+        wav_bytes: WAV file contents
+
+    Returns:
+        io.BytesIO: The OGG file, positioned at the start
+    """
+    audio = AudioSegment.from_file(io.BytesIO(wav_bytes), format="wav")
+    with span("audio.encode_ogg", "audio"):
+        ogg_buffer = io.BytesIO()
+        audio.export(ogg_buffer, format="ogg", codec="libopus")
+        ogg_buffer.seek(0)
+    return ogg_buffer
+
+def clean_for_translation(text):
+    """Remove punctuation from text before it is translated."""
+    return re.sub(r'[^\w\s]', '', text)
+
+def download_audio_for_sarvam(media_url, directory=None):
     """
     Download audio file from URL and convert it to WAV format if needed.
     
     Args:
         media_url: URL to the audio file
+        directory: Directory for the downloaded and converted files, normally a
+            spool scope that removes them afterwards; defaults to the system temp directory
         
     Returns:
         str: Path to the downloaded and converted audio file in WAV format
@@ -103,7 +163,8 @@ def download_audio_for_sarvam(media_url):
     account_sid = os.environ.get('TWILIO_ACCOUNT_SID')
     auth_token = os.environ.get('TWILIO_AUTH_TOKEN')
 
-    response = requests.get(media_url, auth=(account_sid, auth_token))
+    with span("twilio.download_media", "twilio"):
+        response = requests.get(media_url, auth=(account_sid, auth_token))
     
     if response.status_code != 200:
         logger.error(f"Failed to download audio: {response.status_code}, {response.text[:100]}")
@@ -114,7 +175,7 @@ def download_audio_for_sarvam(media_url):
     logger.info(f"Content-Type from response headers: {content_type}")
     
     # Create a temporary file with a generic extension
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.audio') as temp_file:
+    with tempfile.NamedTemporaryFile(delete=False, suffix='.audio', dir=directory) as temp_file:
         temp_file.write(response.content)
         original_path = temp_file.name
     
@@ -123,16 +184,14 @@ def download_audio_for_sarvam(media_url):
     logger.info(f"Detected audio format: {audio_format}, extension: {extension}")
     
     # Rename the file with the correct extension
-    new_path = original_path.replace('.audio', extension)
+    new_path = original_path[:-len('.audio')] + extension
     os.rename(original_path, new_path)
     original_path = new_path
     
-    if os.environ.get("ENV") == "dev":
-        # Save a copy to a persistent location for debugging
-        debug_dir = "/app/debug_audio"
-        os.makedirs(debug_dir, exist_ok=True)
-        debug_file = f"{debug_dir}/audio_original_{int(time.time())}{extension}"
-        shutil.copy(original_path, debug_file)
+    debug = os.environ.get("ENV") == "dev"
+    if debug:
+        # Save a copy to the debug spool, which keeps a bounded number of recent captures
+        debug_file = get_debug_audio_spool().keep(original_path, f"audio_original_{int(time.time())}{extension}")
         logger.info(f"Original audio saved to: {debug_file}")
 
     # Convert to WAV if not already in WAV format
@@ -143,35 +202,14 @@ def download_audio_for_sarvam(media_url):
             file_size = os.path.getsize(original_path)
             logger.info(f"Original file size before conversion: {file_size} bytes")
             
-            # For OGG files from WhatsApp, we may need to try different approaches
-            if audio_format == 'ogg':
-                # Try with both OGG and Opus decoders since WhatsApp can use either
-                try:
-                    # First try as OGG Vorbis
-                    audio = AudioSegment.from_file(original_path, format="ogg")
-                except Exception as inner_e:
-                    logger.warning(f"Failed with OGG format, trying as Opus: {inner_e}")
-                    # If that fails, try as Opus in OGG container
-                    audio = AudioSegment.from_file(original_path, format="opus")
-            else:
-                # For other formats use the detected format
-                audio = AudioSegment.from_file(original_path, format=audio_format)
-            
-            # Export to WAV format
-            wav_path = original_path.rsplit('.', 1)[0] + '.wav'
-            audio.export(wav_path, format="wav")
+            wav_path = convert_to_wav(original_path, audio_format)
             
             # Verify the WAV file was created successfully
             if not os.path.exists(wav_path) or os.path.getsize(wav_path) == 0:
                 raise Exception("Converted WAV file is empty or doesn't exist")
-              # Save a debug copy of the converted WAV file
-            try:
-                debug_wav = os.path.join(debug_dir, f"audio_converted_{int(time.time())}.wav")
-                shutil.copy(wav_path, debug_wav)
+            if debug:
+                debug_wav = get_debug_audio_spool().keep(wav_path, f"audio_converted_{int(time.time())}.wav")
                 logger.info(f"Converted WAV audio saved to: {debug_wav} (size: {os.path.getsize(wav_path)} bytes)")
-            except Exception as e:
-                logger.warning(f"Could not save debug WAV audio: {e}")
-                # Continue execution even if debug save fails
             
             # Remove the original temporary file
             os.unlink(original_path)
@@ -209,15 +247,26 @@ def is_valid_audio_file(file_path):
     logger.error(f"File is not a valid audio file: {file_path} (MIME type: {mime_type})")
     return False
 
-def translate_audio(audio_file_path):
+def is_english(language_code):
+    """Whether a language code such as 'en-IN' or 'en' is English."""
+    return bool(language_code) and language_code.lower().split("-")[0] == "en"
+
+def same_language(source_language_code, target_language_code):
+    """Whether translating between two language codes would be a no-op."""
+    if is_english(source_language_code) and is_english(target_language_code):
+        return True
+    return bool(source_language_code) and source_language_code == target_language_code
+
+def translate_audio(audio_file_path, language_hint=None):
     """
     Translate regional audio to English text using Sarvam AI.
     
     Args:
         audio_file_path: Path to the audio file
+        language_hint: Language the user spoke last time, if known (e.g., 'hi-IN')
         
     Returns:
-        str: Translated text
+        tuple: (translated_text, detected_language_code)
     """
     logger.info(f"Translating audio file at: {audio_file_path}")
     # Get file info for debugging
@@ -228,10 +277,14 @@ def translate_audio(audio_file_path):
         if (is_valid_audio_file(audio_file_path)):
             with open(audio_file_path, "rb") as audio_file:
                 logger.info(f"Sending audio file to Sarvam AI for translation")
-                response = sarvam_client.speech_to_text.translate(
-                    file=audio_file,
-                    model="saaras:v2"
-                )
+                # The translate endpoint takes no language code; context goes in the prompt
+                hint = {"prompt": f"The speaker usually speaks {language_hint}."} if language_hint else {}
+                with span("sarvam.speech_to_text", "sarvam", language_hint=language_hint):
+                    response = sarvam_client.speech_to_text.translate(
+                        file=audio_file,
+                        model="saaras:v2",
+                        **hint
+                    )
             logger.info(f"Translation response: {response}")
             return [
                 response.transcript,
@@ -241,13 +294,14 @@ def translate_audio(audio_file_path):
         logger.error(f"Error translating audio: {e}")
         return ["Sorry, I couldn't translate the audio."]
 
-def text_to_speech(text, language_code=None):
+def text_to_speech(text, language_code=None, filename=None):
     """
     Convert text to speech using Sarvam AI.
     
     Args:
         text: Text to convert
         language_code: Target language code (e.g., 'hi-IN')
+        filename: Name of the uploaded OGG file; defaults to a timestamped name
         
     Returns:
         str: Path to the generated audio file, or None if failed
@@ -257,10 +311,11 @@ def text_to_speech(text, language_code=None):
     try:
         # Call Sarvam AI TTS API
         logger.info(f"Calling text to speech sarvam API")
-        response = sarvam_client.text_to_speech.convert(
-            text=text,
-            target_language_code=language_code
-        )
+        with span("sarvam.text_to_speech", "sarvam"):
+            response = sarvam_client.text_to_speech.convert(
+                text=text,
+                target_language_code=language_code
+            )
         
         audio_base64 = response.audios[0]
 
@@ -268,25 +323,24 @@ def text_to_speech(text, language_code=None):
             # Decode base64 to bytes
             wav_bytes = base64.b64decode(audio_base64)
 
-            audio = AudioSegment.from_file(io.BytesIO(wav_bytes), format="wav")
-
             # Generate filename
-            filename = f"speech_{int(time.time())}_{language_code or 'en'}.ogg"
+            filename = filename or f"speech_{int(time.time())}_{language_code or 'en'}.ogg"
 
             bucket_name = os.environ.get("BUCKET_NAME")
             if not bucket_name:
                 raise ValueError("BUCKET_NAME is not set")
 
             # Export audio to OGG in memory
-            ogg_buffer = io.BytesIO()
-            audio.export(ogg_buffer, format="ogg", codec="libopus")
-            ogg_buffer.seek(0)
+            ogg_buffer = encode_ogg_opus(wav_bytes)
 
             # Upload to GCS
-            storage_client = storage.Client()
-            bucket = storage_client.bucket(bucket_name)
-            blob = bucket.blob(f"audio/{filename}")
-            blob.upload_from_file(ogg_buffer, content_type="audio/ogg")
+            from google.cloud import storage
+
+            with span("gcs.upload", "gcs"):
+                storage_client = storage.Client()
+                bucket = storage_client.bucket(bucket_name)
+                blob = bucket.blob(f"audio/{filename}")
+                blob.upload_from_file(ogg_buffer, content_type="audio/ogg")
 
             logger.info(f"Audio uploaded to GCS: {blob.public_url}")
             return blob.public_url
@@ -295,39 +349,60 @@ def text_to_speech(text, language_code=None):
         logger.error(f"Error generating speech: {e}")
         return None
 
-def translate_and_speak(text, source_language_code='auto', target_language_code='ta-IN'):
+def translate_text(text, source_language_code, target_language_code):
     """
-    Translate text and convert to speech.
-    
+    Translate text using Sarvam AI.
+
     Args:
-        text: Text to translate and convert
+        text: Text to translate
         source_language_code: Source language code
         target_language_code: Target language code
-        
+
     Returns:
-        tuple: (translated_text, audio_file_path)
+        str: Translated text
     """
-    try:
-        cleaned_text = re.sub(r'[^\w\s]', '', text)
-
-        # First translate the text
+    with span("sarvam.translate", "sarvam"):
         translation_response = sarvam_client.text.translate(
-            input=cleaned_text,
+            input=text,
             source_language_code=source_language_code,
             target_language_code=target_language_code
         )
+    logger.info(f"Translation response: {translation_response}")
+    return translation_response.translated_text
+
+def translate_and_speak(text, source_language_code='en-IN', target_language_code='ta-IN', speak=True):
+    """
+    Translate text and convert to speech.
 
-        logger.info(f"Translation response: {translation_response}")
+    Translation is skipped when the text is already in the target language,
+    e.g. an English reply to an English-speaking user.
+    
+    Args:
+        text: Text to translate and convert
+        source_language_code: Language of the text
+        target_language_code: Target language code
+        speak: Also synthesise the translated text
         
-        translated_text = translation_response.translated_text
+    Returns:
+        tuple: (translated_text, audio_file_path), with no audio when speak is False
+    """
+    try:
+        # First translate the text, unless it's already in the target language; punctuation
+        # is only stripped for the translation call, so prices such as ₹1,299.00 survive
+        if same_language(source_language_code, target_language_code):
+            logger.info(f"Text is already in {target_language_code}; skipping translation")
+            translations_skipped_counter.inc()
+            translated_text = text
+        else:
+            translated_text = translate_text(clean_for_translation(text), source_language_code, target_language_code)
         
         # Then convert to speech
-        audio_file_name = text_to_speech(translated_text, target_language_code)
+        audio_file_name = text_to_speech(translated_text, target_language_code) if speak else None
         
         return (translated_text, audio_file_name)
         
     except Exception as e:
         logger.error(f"Error translating and generating speech: {e}")
-        return (text, None, None)
+        return (text, None)
 
 
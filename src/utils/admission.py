@@ -0,0 +1,255 @@
+"""
+Admission control for webhook jobs.
+
+Every message that would run the agent graph first passes two checks:
+
+- A token bucket per sender allows RATE_LIMIT_BURST messages at once and
+  RATE_LIMIT_PER_MINUTE after that. A message that arrives slightly early
+  waits for its token, up to RATE_LIMIT_MAX_DELAY seconds; later ones are
+  rejected.
+- At most MAX_CONCURRENT_JOBS jobs run at once in each worker. A message
+  waits up to ADMISSION_MAX_WAIT seconds for a free slot before it is
+  rejected. Under gunicorn the default is a little below the worker's thread
+  count (see gunicorn.conf.py), so the cap is reached before every thread is
+  busy and a full worker can still answer "try later".
+
+Rejected senders get the canned "try_later" reply, which makes no upstream
+calls. Buckets are kept in memory by default (RATE_LIMIT_BACKEND=memory),
+which limits each worker separately. RATE_LIMIT_BACKEND=sqlite keeps them in
+a database file (RATE_LIMIT_DB_PATH) shared by every worker on the host.
+Setting RATE_LIMIT_PER_MINUTE or MAX_CONCURRENT_JOBS to 0 turns that check off.
+"""
+import os
+import time
+import sqlite3
+import logging
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Optional
+
+from src.utils import metrics
+
+RATE_LIMIT_BACKEND = os.environ.get("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_DB_PATH = os.environ.get("RATE_LIMIT_DB_PATH", "rate_limits.sqlite3")
+RATE_LIMIT_BURST = float(os.environ.get("RATE_LIMIT_BURST", "5"))
+RATE_LIMIT_PER_MINUTE = float(os.environ.get("RATE_LIMIT_PER_MINUTE", "10"))
+RATE_LIMIT_MAX_DELAY = float(os.environ.get("RATE_LIMIT_MAX_DELAY", "2"))
+MAX_CONCURRENT_JOBS = int(os.environ.get("MAX_CONCURRENT_JOBS", "16"))
+ADMISSION_MAX_WAIT = float(os.environ.get("ADMISSION_MAX_WAIT", "5"))
+# Senders whose buckets the memory backend keeps; the least recently seen are forgotten
+MAX_TRACKED_SENDERS = 100000
+
+logger = logging.getLogger(__name__)
+
+rejected_counter = metrics.counter("admission_rejected_total", "Messages answered with a try-later reply, by reason")
+delayed_counter = metrics.counter("admission_delayed_total", "Admitted messages that had to wait, by reason")
+admission_wait_histogram = metrics.histogram(
+    "admission_wait_seconds", "Time admitted messages waited for their token and a job slot"
+)
+active_jobs_gauge = metrics.gauge("admission_active_jobs", "Jobs holding an admission slot")
+
+
+class TokenBuckets(ABC):
+    """Token buckets keyed by sender."""
+
+    @abstractmethod
+    def reserve(self, key: str, capacity: float, rate: float, max_delay: float) -> Optional[float]:
+        """
+        Take a token from a bucket, borrowing one that refills within max_delay.
+
+        Args:
+            key: Bucket key, e.g. the sender's WhatsApp number
+            capacity: Maximum number of tokens, i.e. the burst size
+            rate: Tokens added per second
+            max_delay: Longest wait for a borrowed token, in seconds
+
+        Returns:
+            float: Seconds to wait before the token is available (0 if it is now),
+            or None if the bucket is empty for longer than max_delay
+        """
+
+
+def take_token(tokens: float, elapsed: float, capacity: float, rate: float, max_delay: float):
+    """
+    Refill a bucket for the elapsed time and try to take a token.
+
+    Returns:
+        tuple: (tokens left, seconds to wait) or (tokens left, None) if denied
+    """
+    tokens = min(capacity, tokens + max(0.0, elapsed) * rate)
+    if tokens - 1 < -rate * max_delay:
+        return tokens, None
+    tokens -= 1
+    return tokens, max(0.0, -tokens / rate)
+
+
+class MemoryTokenBuckets(TokenBuckets):
+    """Buckets in a bounded in-process map; each worker limits senders separately."""
+
+    def __init__(self, max_keys: int = MAX_TRACKED_SENDERS, clock=time.monotonic):
+        self.max_keys = max_keys
+        self.clock = clock
+        self._buckets: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def reserve(self, key: str, capacity: float, rate: float, max_delay: float) -> Optional[float]:
+        now = self.clock()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens, wait = take_token(tokens, now - updated, capacity, rate, max_delay)
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+
+class SQLiteTokenBuckets(TokenBuckets):
+    """Buckets in a SQLite file, shared by every worker process that opens it."""
+
+    def __init__(self, db_path: str = RATE_LIMIT_DB_PATH, clock=time.time):
+        self.db_path = db_path
+        self.clock = clock
+        self._local = threading.local()
+        self._connection().execute(
+            "CREATE TABLE IF NOT EXISTS token_buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+        )
+        self._connection().execute("CREATE INDEX IF NOT EXISTS token_buckets_updated ON token_buckets (updated)")
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return the connection for the current thread, opening it if needed."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn = conn
+        return conn
+
+    def reserve(self, key: str, capacity: float, rate: float, max_delay: float) -> Optional[float]:
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = self.clock()
+            row = conn.execute("SELECT tokens, updated FROM token_buckets WHERE key = ?", (key,)).fetchone()
+            tokens, updated = row if row else (capacity, now)
+            tokens, wait = take_token(tokens, now - updated, capacity, rate, max_delay)
+            conn.execute(
+                "INSERT INTO token_buckets (key, tokens, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+                (key, tokens, now),
+            )
+            # Buckets idle long enough to have refilled are the same as missing ones
+            conn.execute("DELETE FROM token_buckets WHERE updated < ?", (now - capacity / rate,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+
+
+def create_token_buckets(backend: str = None) -> TokenBuckets:
+    """
+    Create a token bucket backend by name.
+
+    Args:
+        backend: "memory" or "sqlite". Defaults to RATE_LIMIT_BACKEND.
+    """
+    backend = (backend or RATE_LIMIT_BACKEND).lower()
+    if backend == "memory":
+        return MemoryTokenBuckets()
+    if backend == "sqlite":
+        return SQLiteTokenBuckets()
+    raise ValueError(f"Unknown rate limit backend: {backend}")
+
+
+class AdmissionController:
+    """Per-sender rate limiting and a cap on concurrent jobs."""
+
+    def __init__(self, buckets: TokenBuckets = None, burst: float = RATE_LIMIT_BURST,
+                 per_minute: float = RATE_LIMIT_PER_MINUTE, max_delay: float = RATE_LIMIT_MAX_DELAY,
+                 max_concurrent: int = MAX_CONCURRENT_JOBS, max_wait: float = ADMISSION_MAX_WAIT):
+        self.buckets = buckets or create_token_buckets()
+        self.burst = burst
+        self.rate = per_minute / 60
+        self.max_delay = max_delay
+        self.max_concurrent = max_concurrent
+        self.max_wait = max_wait
+        self._slots = threading.BoundedSemaphore(max_concurrent) if max_concurrent > 0 else None
+        self._active = 0
+        self._active_lock = threading.Lock()
+
+    def _track_active(self, delta: int) -> None:
+        with self._active_lock:
+            self._active += delta
+            active_jobs_gauge.set(self._active)
+
+    def _wait_for_token(self, sender_id: str) -> bool:
+        if self.rate <= 0 or not sender_id:
+            return True
+        try:
+            wait = self.buckets.reserve(sender_id, self.burst, self.rate, self.max_delay)
+        except Exception as e:
+            # A broken shared store must not take the webhook down with it
+            logger.error(f"Rate limit check failed for {sender_id}, admitting: {e}")
+            return True
+        if wait is None:
+            rejected_counter.inc(reason="rate_limited")
+            logger.warning(f"Rate limited {sender_id}")
+            return False
+        if wait > 0:
+            delayed_counter.inc(reason="rate_limited")
+            time.sleep(wait)
+        return True
+
+    def _wait_for_slot(self) -> bool:
+        if self._slots is None:
+            return True
+        if self._slots.acquire(blocking=False):
+            return True
+        if self._slots.acquire(timeout=self.max_wait):
+            # Counted once admitted, so rejected messages aren't also counted as delayed
+            delayed_counter.inc(reason="overloaded")
+            return True
+        rejected_counter.inc(reason="overloaded")
+        logger.warning(f"No job slot free within {self.max_wait}s; rejecting message")
+        return False
+
+    @contextmanager
+    def admit(self, sender_id: str):
+        """
+        Hold an admission slot for the enclosed job.
+
+        Args:
+            sender_id: Sender whose rate limit applies
+
+        Yields:
+            bool: True if the job may run, False if the sender should be told to try later
+        """
+        start = time.perf_counter()
+        if not self._wait_for_token(sender_id) or not self._wait_for_slot():
+            yield False
+            return
+        admission_wait_histogram.observe(time.perf_counter() - start)
+        self._track_active(1)
+        try:
+            yield True
+        finally:
+            self._track_active(-1)
+            if self._slots is not None:
+                self._slots.release()
+
+
+admission_controller = None
+_admission_controller_lock = threading.Lock()
+
+def get_admission_controller() -> AdmissionController:
+    global admission_controller
+    if admission_controller is None:
+        with _admission_controller_lock:
+            if admission_controller is None:
+                logger.info(f"Initializing admission control with the '{RATE_LIMIT_BACKEND}' rate limit backend")
+                admission_controller = AdmissionController()
+    return admission_controller
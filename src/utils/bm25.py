@@ -0,0 +1,134 @@
+"""
+In-process BM25 retriever over product text and reciprocal-rank fusion.
+"""
+import re
+import math
+from collections import Counter, defaultdict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+# Fields indexed for lexical search, with the weight given to each field's terms
+INDEXED_FIELDS = {"name": 2, "description": 1, "category": 1}
+
+STOP_WORDS = {
+    "a", "an", "and", "any", "are", "buy", "can", "do", "for", "get", "give", "have", "i", "in", "is",
+    "looking", "me", "my", "need", "of", "on", "please", "show", "some", "the", "to", "want", "what",
+    "which", "with", "you",
+}
+
+_TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens, keeping alphanumeric tokens such as "64mp" intact."""
+    return _TOKEN_PATTERN.findall(text.casefold())
+
+
+class BM25Index:
+    """Inverted index scoring products with Okapi BM25."""
+
+    def __init__(self, products: Sequence[Dict[str, Any]], k1: float = 1.5, b: float = 0.75):
+        """
+        Build the index.
+
+        Args:
+            products: Product dictionaries with name, description and category fields.
+            k1: Term frequency saturation.
+            b: Document length normalisation.
+        """
+        self.products = list(products)
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[int, int]] = defaultdict(dict)
+        self.doc_lengths: List[int] = []
+
+        for doc_id, product in enumerate(self.products):
+            terms = Counter()
+            for field, weight in INDEXED_FIELDS.items():
+                for token in tokenize(str(product.get(field, ""))):
+                    terms[token] += weight
+            for term, frequency in terms.items():
+                self.postings[term][doc_id] = frequency
+            self.doc_lengths.append(sum(terms.values()))
+
+        count = len(self.products)
+        self.avg_doc_length = (sum(self.doc_lengths) / count) if count else 0.0
+        self.idf = {
+            term: math.log(1 + (count - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in self.postings.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self.products)
+
+    def query_terms(self, query: str) -> List[str]:
+        """Distinct query terms with stop words removed."""
+        return list(dict.fromkeys(t for t in tokenize(query) if t not in STOP_WORDS))
+
+    def search(self, query: str, limit: int = 10,
+               doc_filter: Optional[Callable[[int], bool]] = None) -> List[Tuple[int, float]]:
+        """
+        Score products against the query.
+
+        Args:
+            query: The text query.
+            limit: Maximum number of results.
+            doc_filter: Optional predicate on the product index; other products are skipped.
+
+        Returns:
+            (product index, score) tuples, best first.
+        """
+        scores: Dict[int, float] = defaultdict(float)
+        for term in self.query_terms(query):
+            docs = self.postings.get(term)
+            if not docs:
+                continue
+            idf = self.idf[term]
+            for doc_id, frequency in docs.items():
+                if doc_filter is not None and not doc_filter(doc_id):
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / self.avg_doc_length)
+                scores[doc_id] += idf * frequency * (self.k1 + 1) / (frequency + norm)
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:limit]
+
+    def is_confident(self, query: str, results: List[Tuple[int, float]], margin: float = 1.5) -> bool:
+        """
+        Decide whether lexical results are good enough to skip dense retrieval.
+
+        The top product must contain every query term and clearly outscore the
+        runner-up.
+
+        Args:
+            query: The text query.
+            results: Output of search for the same query.
+            margin: Minimum ratio between the top and second scores.
+        """
+        terms = self.query_terms(query)
+        if not terms or not results:
+            return False
+        top_doc, top_score = results[0]
+        if any(top_doc not in self.postings.get(term, {}) for term in terms):
+            return False
+        if len(results) > 1 and top_score < margin * results[1][1]:
+            return False
+        return True
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[Hashable]], k: int = 60) -> List[Hashable]:
+    """
+    Fuse several ranked lists of ids with reciprocal-rank fusion.
+
+    Args:
+        rankings: Ranked lists of ids, best first.
+        k: Damping constant; 60 is the value from the original RRF paper.
+
+    Returns:
+        Ids ordered by fused score, best first.
+    """
+    scores: Dict[Hashable, float] = defaultdict(float)
+    first_seen: Dict[Hashable, int] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking):
+            scores[item] += 1.0 / (k + rank + 1)
+            first_seen.setdefault(item, len(first_seen))
+    return sorted(scores, key=lambda item: (-scores[item], first_seen[item]))
@@ -0,0 +1,211 @@
+"""
+Query embedding cache for the vector store.
+
+Query embeddings are cached on (model, normalised text) in an in-memory LRU
+with an optional SQLite tier that survives restarts. Concurrent misses are
+collected into a single embedding request.
+"""
+import os
+import re
+import time
+import array
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+import logging
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+from src.utils import metrics
+from src.utils.tracing import span
+
+EMBEDDING_CACHE_SIZE = int(os.environ.get("EMBEDDING_CACHE_SIZE", "10000"))
+EMBEDDING_CACHE_PATH = os.environ.get("EMBEDDING_CACHE_PATH")
+# How long the first miss waits for concurrent misses to join its request
+EMBEDDING_BATCH_WINDOW = float(os.environ.get("EMBEDDING_BATCH_WINDOW", "0.005"))
+EMBEDDING_MAX_BATCH_SIZE = 256
+
+logger = logging.getLogger(__name__)
+
+cache_hits_counter = metrics.counter("embedding_cache_hits_total", "Query embeddings served from the cache")
+cache_misses_counter = metrics.counter("embedding_cache_misses_total", "Query embeddings that had to be computed")
+embedding_batch_histogram = metrics.histogram(
+    "embedding_batch_size", "Number of texts per embedding request", buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256)
+)
+
+
+def normalize_query(text: str) -> str:
+    """Normalise a query so trivially different spellings share a cache entry."""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return re.sub(r"\s+", " ", text).strip()
+
+
+class PersistentEmbeddingCache:
+    """SQLite backed key/vector store used as the second cache tier."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        if not keys:
+            return {}
+        placeholders = ",".join("?" * len(keys))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", keys
+            ).fetchall()
+        return {key: array.array("f", blob).tolist() for key, blob in rows}
+
+    def set_many(self, items: Dict[str, List[float]]) -> None:
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                [(key, array.array("f", vector).tobytes()) for key, vector in items.items()],
+            )
+
+
+class CachedEmbeddings(Embeddings):
+    """Wraps an Embeddings model and caches query embeddings."""
+
+    def __init__(self, embeddings: Embeddings, model: str = None, max_entries: int = EMBEDDING_CACHE_SIZE,
+                 persist_path: Optional[str] = EMBEDDING_CACHE_PATH, batch_window: float = EMBEDDING_BATCH_WINDOW):
+        """
+        Initialize the cache.
+
+        Args:
+            embeddings: The underlying embedding model.
+            model: Model id used in cache keys. Defaults to embeddings.model.
+            max_entries: Maximum number of query embeddings kept in memory.
+            persist_path: SQLite file for the persistent tier, or None to disable it.
+            batch_window: Seconds the first miss waits for concurrent misses.
+        """
+        self.embeddings = embeddings
+        self.model = model or getattr(embeddings, "model", type(embeddings).__name__)
+        self.max_entries = max_entries
+        self.batch_window = batch_window
+        self.persistent = PersistentEmbeddingCache(persist_path) if persist_path else None
+
+        self._entries: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, Future] = {}
+        self._queue: List[tuple] = []
+        self._leader_active = False
+
+    def _key(self, text: str) -> str:
+        digest = hashlib.sha256(normalize_query(text).encode("utf-8")).hexdigest()
+        return f"{self.model}:{digest}"
+
+    def _remember(self, items: Dict[str, List[float]]) -> None:
+        with self._lock:
+            for key, vector in items.items():
+                self._entries[key] = vector
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed documents without caching; catalog text is embedded once at ingestion."""
+        with span("openai.embed_documents", "openai", count=len(texts)):
+            return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a single query, using the cache when possible."""
+        return self.embed_queries([text])[0]
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed several queries, computing all cache misses in one request.
+
+        Args:
+            texts: Query texts.
+
+        Returns:
+            List of embeddings in the same order as texts.
+        """
+        keys = [self._key(text) for text in texts]
+        found: Dict[str, List[float]] = {}
+        with self._lock:
+            for key in keys:
+                vector = self._entries.get(key)
+                if vector is not None:
+                    self._entries.move_to_end(key)
+                    found[key] = vector
+        cache_hits_counter.inc(len(found), tier="memory")
+
+        missing = {key: text for key, text in zip(keys, texts) if key not in found}
+        if missing and self.persistent:
+            stored = self.persistent.get_many(list(missing))
+            if stored:
+                cache_hits_counter.inc(len(stored), tier="persistent")
+                self._remember(stored)
+                found.update(stored)
+                missing = {key: text for key, text in missing.items() if key not in stored}
+
+        if missing:
+            cache_misses_counter.inc(len(missing))
+            found.update(self._embed_misses(missing))
+
+        return [found[key] for key in keys]
+
+    def _embed_misses(self, missing: Dict[str, str]) -> Dict[str, List[float]]:
+        """Join (or start) the shared request that embeds concurrent misses."""
+        futures = {}
+        lead = False
+        with self._lock:
+            for key, text in missing.items():
+                future = self._in_flight.get(key)
+                if future is None:
+                    future = Future()
+                    self._in_flight[key] = future
+                    self._queue.append((key, text))
+                futures[key] = future
+            if not self._leader_active:
+                self._leader_active = True
+                lead = True
+
+        if lead:
+            self._drain_queue()
+        return {key: future.result() for key, future in futures.items()}
+
+    def _drain_queue(self) -> None:
+        if self.batch_window:
+            time.sleep(self.batch_window)
+        while True:
+            with self._lock:
+                batch = self._queue[:EMBEDDING_MAX_BATCH_SIZE]
+                del self._queue[:len(batch)]
+                if not batch:
+                    self._leader_active = False
+                    return
+
+            embedding_batch_histogram.observe(len(batch))
+            try:
+                with span("openai.embed_queries", "openai", count=len(batch)):
+                    vectors = self.embeddings.embed_documents([text for _, text in batch])
+            except Exception as e:
+                logger.error(f"Error embedding {len(batch)} queries: {e}")
+                with self._lock:
+                    futures = [self._in_flight.pop(key) for key, _ in batch]
+                for future in futures:
+                    future.set_exception(e)
+                continue
+
+            results = {key: vector for (key, _), vector in zip(batch, vectors)}
+            self._remember(results)
+            if self.persistent:
+                try:
+                    self.persistent.set_many(results)
+                except Exception as e:
+                    logger.warning(f"Could not persist query embeddings: {e}")
+            with self._lock:
+                futures = [(self._in_flight.pop(key), results[key]) for key, _ in batch]
+            for future, vector in futures:
+                future.set_result(vector)
@@ -0,0 +1,134 @@
+"""
+Paginated, precomputed JSON responses for catalog listings.
+
+Each page is serialised (and gzipped) once per catalog version and served with
+an ETag, so repeat requests carrying If-None-Match get a 304 without touching
+the catalog. Pages are addressed by an opaque cursor naming the last product
+of the previous page, and fields= selects which product fields are returned.
+"""
+import os
+import gzip
+import json
+import base64
+import hashlib
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from flask import Response
+
+from src.utils.result_cache import VersionedResultCache
+
+# Largest page a client may request
+MAX_PAGE_SIZE = int(os.environ.get("CATALOG_MAX_PAGE_SIZE", "100"))
+# Bodies smaller than this are not worth compressing
+GZIP_MIN_BYTES = 1024
+
+logger = logging.getLogger(__name__)
+
+
+def catalog_version(products: Sequence[Dict[str, Any]]) -> str:
+    """Content hash identifying a list of products."""
+    content = json.dumps(products, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(content).hexdigest()[:16]
+
+
+def encode_cursor(product_id: str) -> str:
+    return base64.urlsafe_b64encode(product_id.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> str:
+    """Return the product id a cursor points after. Raises ValueError for malformed cursors."""
+    try:
+        return base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def parse_fields(value: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """Parse a comma separated fields= parameter; None selects every field."""
+    if not value:
+        return None
+    return tuple(sorted({field.strip() for field in value.split(",") if field.strip()})) or None
+
+
+def select_page(products: Sequence[Dict[str, Any]], cursor: Optional[str] = None, limit: Optional[int] = None,
+                fields: Optional[Tuple[str, ...]] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Select a page of products.
+
+    Args:
+        products: Products in listing order, each with an id
+        cursor: Cursor returned with the previous page, or None for the first page
+        limit: Maximum number of products, or None for all remaining products
+        fields: Product fields to include, or None for all
+
+    Returns:
+        (products on the page, cursor for the next page or None on the last page)
+
+    Raises:
+        ValueError: If the cursor doesn't name a product in the catalog
+    """
+    start = 0
+    if cursor:
+        after = decode_cursor(cursor)
+        positions = {product["id"]: i for i, product in enumerate(products)}
+        if after not in positions:
+            raise ValueError(f"Invalid cursor: {cursor}")
+        start = positions[after] + 1
+
+    end = len(products) if limit is None else min(start + limit, len(products))
+    page = list(products[start:end])
+    next_cursor = encode_cursor(page[-1]["id"]) if page and end < len(products) else None
+    if fields:
+        page = [{field: product[field] for field in fields if field in product} for product in page]
+    return page, next_cursor
+
+
+class PrecomputedResponse:
+    """A JSON body serialised once, with its gzipped form and ETag."""
+
+    def __init__(self, payload: Any):
+        self.body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        self.etag = hashlib.sha256(self.body).hexdigest()[:32]
+        self.gzipped = gzip.compress(self.body) if len(self.body) >= GZIP_MIN_BYTES else None
+
+    def to_response(self, request) -> Response:
+        """
+        Build the HTTP response for a request.
+
+        Returns 304 when If-None-Match matches, and the gzipped body when the
+        client accepts it.
+        """
+        use_gzip = self.gzipped is not None and "gzip" in request.accept_encodings
+        # Each encoding of the body gets its own entity tag
+        etag = f"{self.etag}-gzip" if use_gzip else self.etag
+        headers = {"Vary": "Accept-Encoding", "Cache-Control": "no-cache"}
+
+        if request.if_none_match.contains(self.etag) or request.if_none_match.contains(f"{self.etag}-gzip"):
+            response = Response(status=304, headers=headers)
+            response.set_etag(etag)
+            return response
+
+        response = Response(self.gzipped if use_gzip else self.body, mimetype="application/json", headers=headers)
+        if use_gzip:
+            response.headers["Content-Encoding"] = "gzip"
+        response.set_etag(etag)
+        return response
+
+
+response_cache = None
+_response_cache_lock = threading.Lock()
+
+def get_response_cache() -> VersionedResultCache:
+    global response_cache
+    if response_cache is None:
+        with _response_cache_lock:
+            if response_cache is None:
+                response_cache = VersionedResultCache(name="responses")
+    return response_cache
+
+
+def cached_response(key: Any, version: str, build: Callable[[], Any]) -> PrecomputedResponse:
+    """Return the precomputed response for key at the given catalog version, building it once."""
+    return get_response_cache().get_or_compute(key, version, lambda: PrecomputedResponse(build()))
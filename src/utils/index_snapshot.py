@@ -0,0 +1,169 @@
+"""
+Portable, read-only snapshots of the product index.
+
+A snapshot is a directory holding the NumPy index files (vectors.npy and
+metadata.jsonl, optionally int8 codes and the related-products table) plus
+manifest.json, which records the
+format version, embedding model id, vector count and dimension, and a SHA-256
+hash of every file. Snapshots are built once, e.g. during the image build, and
+memory-mapped read-only by every instance at startup.
+"""
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+import numpy as np
+
+from src.utils.numpy_index import NumpyVectorIndex
+from src.utils.related_products import compute_related, write_related
+from src.data.catalog import prepare_product
+
+SNAPSHOT_FORMAT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+
+logger = logging.getLogger(__name__)
+
+Batch = Tuple[np.ndarray, List[Dict[str, Any]]]
+
+
+def file_sha256(path: str) -> str:
+    """SHA-256 of a file, read in 1 MB blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chroma_batches(persist_directory: str, collection_name: str = "products", batch_size: int = 1000) -> Iterator[Batch]:
+    """
+    Read stored embeddings and metadata from a Chroma persistence directory.
+
+    Reads the collection directly, so no embedding model or API key is needed.
+    """
+    import chromadb
+
+    collection = chromadb.PersistentClient(path=persist_directory).get_collection(collection_name)
+    for offset in range(0, collection.count(), batch_size):
+        page = collection.get(include=["embeddings", "metadatas"], limit=batch_size, offset=offset)
+        yield np.asarray(page["embeddings"], dtype=np.float32), list(page["metadatas"])
+
+
+def numpy_batches(directory: str, batch_size: int = 1000) -> Iterator[Batch]:
+    """Read stored vectors and metadata from a NumPy index directory."""
+    index = NumpyVectorIndex(directory).load()
+    for start in range(0, len(index), batch_size):
+        yield np.asarray(index.vectors[start:start + batch_size]), index.metadata[start:start + batch_size]
+
+
+def write_snapshot(directory: str, batches: Iterable[Batch], embedding_model: str,
+                   quantization: str = None, related_per_item: int = None) -> Dict[str, Any]:
+    """
+    Build a snapshot and atomically replace any snapshot at directory.
+
+    Args:
+        directory: Snapshot directory
+        batches: (vectors, metadatas) batches to store; metadata is normalised
+            with prepare_product so older stores gain numeric prices
+        embedding_model: Id of the model that produced the vectors
+        quantization: "int8" to include int8 codes for quantised search
+        related_per_item: If set, also precompute this many related products per
+            item in other categories, so the table is covered by the manifest
+
+    Returns:
+        dict: The manifest
+    """
+    temp_directory = directory.rstrip(os.sep) + ".tmp"
+    shutil.rmtree(temp_directory, ignore_errors=True)
+    index = NumpyVectorIndex(temp_directory, quantization=quantization)
+    os.makedirs(temp_directory)
+    for vectors, metadatas in batches:
+        index.append(vectors, [prepare_product(metadata) for metadata in metadatas])
+    if quantization:
+        index.quantized()
+    if related_per_item:
+        related = compute_related(index.vectors, [metadata["id"] for metadata in index.metadata],
+                                  [metadata.get("category") for metadata in index.metadata], k=related_per_item)
+        write_related(temp_directory, related, k=related_per_item, cross_category=True, source="snapshot")
+
+    files = {
+        name: file_sha256(os.path.join(temp_directory, name))
+        for name in sorted(os.listdir(temp_directory))
+    }
+    manifest = {
+        "format_version": SNAPSHOT_FORMAT_VERSION,
+        "embedding_model": embedding_model,
+        "count": len(index),
+        "dimension": index.dimension,
+        "quantization": quantization,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "files": files,
+    }
+    # One checksum over the model and every file identifies the snapshot
+    manifest["checksum"] = hashlib.sha256(
+        json.dumps({"embedding_model": embedding_model, "files": files}, sort_keys=True).encode("utf-8")
+    ).hexdigest()
+    with open(os.path.join(temp_directory, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    old_directory = directory.rstrip(os.sep) + ".old"
+    shutil.rmtree(old_directory, ignore_errors=True)
+    if os.path.exists(directory):
+        os.replace(directory, old_directory)
+    os.replace(temp_directory, directory)
+    shutil.rmtree(old_directory, ignore_errors=True)
+    logger.info(f"Wrote index snapshot with {manifest['count']} vectors to {directory} ({manifest['checksum'][:12]})")
+    return manifest
+
+
+def read_manifest(directory: str) -> Dict[str, Any]:
+    with open(os.path.join(directory, MANIFEST_FILE), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_snapshot(directory: str, embedding_model: str = None, verify: bool = True,
+                  quantization: str = None) -> Tuple[NumpyVectorIndex, Dict[str, Any]]:
+    """
+    Memory-map a snapshot after checking its manifest.
+
+    Args:
+        directory: Snapshot directory
+        embedding_model: Model used to embed queries; must match the snapshot's
+        verify: Check the SHA-256 of every file against the manifest
+        quantization: Search mode for the loaded index
+
+    Returns:
+        (index, manifest)
+
+    Raises:
+        ValueError: If the snapshot is from another format version or model, lacks
+            the codes for the quantization mode, or is corrupt
+    """
+    manifest = read_manifest(directory)
+    if manifest.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+        raise ValueError(f"Unsupported snapshot format {manifest.get('format_version')} in {directory}")
+    if embedding_model and manifest["embedding_model"] != embedding_model:
+        raise ValueError(
+            f"Snapshot in {directory} was embedded with {manifest['embedding_model']}, "
+            f"but queries are embedded with {embedding_model}"
+        )
+    if quantization and manifest.get("quantization") != quantization:
+        # Building the codes here would write into the read-only snapshot, from every worker at once
+        raise ValueError(
+            f"Snapshot in {directory} has no {quantization} codes; rebuild it with them "
+            f"(build_index_snapshot.py --int8) or serve it without quantization"
+        )
+    if verify:
+        for name, expected in manifest["files"].items():
+            if file_sha256(os.path.join(directory, name)) != expected:
+                raise ValueError(f"Checksum mismatch for {name} in snapshot {directory}")
+
+    index = NumpyVectorIndex(directory, quantization=quantization).load()
+    if len(index) != manifest["count"]:
+        raise ValueError(f"Snapshot in {directory} has {len(index)} vectors, manifest says {manifest['count']}")
+    logger.info(f"Loaded index snapshot {manifest['checksum'][:12]} with {len(index)} vectors from {directory}")
+    return index, manifest
@@ -0,0 +1,177 @@
+"""
+Incremental catalog ingestion into the vector store.
+
+The catalog is streamed in chunks, normalised (numeric prices, lowercase
+categories) and upserted by product id. Products whose
+name, description and category are unchanged are not re-embedded, products
+that only changed other fields get a metadata update, and products missing
+from the catalog are deleted.
+
+Stores written before products were normalised can be brought up to date in
+place with normalize_stored, which rewrites metadata without re-embedding.
+"""
+import json
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List
+
+from src.utils.vector_store import CONTENT_HASH_KEY, content_hash, product_text, public_product, stored_product
+from src.data.catalog import prepare_product
+
+INGEST_CHUNK_SIZE = 1000
+EMBED_BATCH_SIZE = 100
+EMBED_CONCURRENCY = 4
+
+logger = logging.getLogger(__name__)
+
+
+def chunked(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    """Yield lists of at most size items."""
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def read_catalog(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Stream products from a catalog file.
+
+    JSON Lines files (.jsonl) are read one product at a time; .json files must
+    contain a list of products and are loaded whole.
+
+    Args:
+        path: Path to the catalog file
+
+    Yields:
+        Product dictionaries
+    """
+    if path.endswith(".jsonl"):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    elif path.endswith(".json"):
+        with open(path, encoding="utf-8") as f:
+            yield from json.load(f)
+    else:
+        raise ValueError(f"Unsupported catalog format: {path}")
+
+
+class CatalogIngestion:
+    """Upserts a catalog into a vector store, embedding only what changed."""
+
+    def __init__(self, vector_store, embed_batch_size: int = EMBED_BATCH_SIZE,
+                 embed_concurrency: int = EMBED_CONCURRENCY, chunk_size: int = INGEST_CHUNK_SIZE):
+        """
+        Initialize the pipeline.
+
+        Args:
+            vector_store: An initialized VectorStore
+            embed_batch_size: Products per embedding request
+            embed_concurrency: Maximum embedding requests in flight
+            chunk_size: Products read from the catalog at a time
+        """
+        self.vector_store = vector_store
+        self.embed_batch_size = embed_batch_size
+        self.embed_concurrency = embed_concurrency
+        self.chunk_size = chunk_size
+
+    def _embed_and_upsert(self, products: List[Dict[str, Any]]) -> int:
+        vectors = self.vector_store.embeddings.embed_documents([product_text(p) for p in products])
+        self.vector_store.upsert_embeddings(products, vectors)
+        return len(products)
+
+    def normalize_stored(self) -> int:
+        """
+        Rewrite stored metadata through prepare_product, without embedding.
+
+        Adds numeric prices and content hashes to products stored before they
+        existed, so price filters match them and later runs don't re-embed them.
+        Documents stored under another key than their product id, as older
+        Chroma stores are, are moved to their product id with their embedding.
+
+        Returns:
+            int: Number of products whose metadata was rewritten
+        """
+        updated = 0
+        for keys in chunked(self.vector_store.product_ids(), self.chunk_size):
+            stored = self.vector_store.get_stored_metadata(keys)
+            misplaced = {key: metadata for key, metadata in stored.items() if metadata.get("id") != key}
+            outdated = [public_product(metadata) for key, metadata in stored.items()
+                        if key not in misplaced and stored_product(metadata) != metadata]
+            if outdated:
+                self.vector_store.update_metadata(outdated)
+            if misplaced:
+                present = self.vector_store.get_stored_metadata([m["id"] for m in misplaced.values()])
+                move = {key: metadata for key, metadata in misplaced.items() if metadata["id"] not in present}
+                vectors = self.vector_store.get_stored_vectors(list(move))
+                if move:
+                    self.vector_store.upsert_embeddings([public_product(m) for m in move.values()],
+                                                        [vectors[key] for key in move])
+                self.vector_store.delete_products(list(misplaced))
+            updated += len(outdated) + len(misplaced)
+        logger.info(f"Normalised stored metadata of {updated} products")
+        return updated
+
+    def run(self, products: Iterable[Dict[str, Any]], delete_missing: bool = True) -> Dict[str, Any]:
+        """
+        Ingest a catalog.
+
+        Args:
+            products: Iterable of product dictionaries, each with an id
+            delete_missing: Delete stored products that are not in the catalog
+
+        Returns:
+            dict: Counts of embedded, updated, unchanged and deleted products and throughput
+        """
+        start = time.perf_counter()
+        report = {"processed": 0, "embedded": 0, "metadata_updated": 0, "unchanged": 0, "deleted": 0}
+        seen_ids = set()
+
+        with ThreadPoolExecutor(max_workers=self.embed_concurrency) as executor:
+            for chunk in chunked(products, self.chunk_size):
+                # Later duplicates of an id within a chunk win
+                chunk = list({product["id"]: prepare_product(product) for product in chunk}.values())
+                seen_ids.update(product["id"] for product in chunk)
+                stored = self.vector_store.get_stored_metadata([product["id"] for product in chunk])
+
+                to_embed, to_update = [], []
+                for product in chunk:
+                    existing = stored.get(product["id"])
+                    if existing is None or existing.get(CONTENT_HASH_KEY) != content_hash(product):
+                        to_embed.append(product)
+                    elif public_product(existing) != product:
+                        to_update.append(product)
+                    else:
+                        report["unchanged"] += 1
+
+                if to_update:
+                    self.vector_store.update_metadata(to_update)
+                    report["metadata_updated"] += len(to_update)
+
+                # executor.map keeps at most embed_concurrency requests running
+                batches = list(chunked(to_embed, self.embed_batch_size))
+                report["embedded"] += sum(executor.map(self._embed_and_upsert, batches))
+                report["processed"] += len(chunk)
+                logger.info(f"Ingested {report['processed']} products ({report['embedded']} embedded)")
+
+        if delete_missing:
+            missing = [product_id for product_id in self.vector_store.product_ids() if product_id not in seen_ids]
+            self.vector_store.delete_products(missing)
+            report["deleted"] = len(missing)
+
+        report["seconds"] = time.perf_counter() - start
+        report["items_per_second"] = report["processed"] / report["seconds"] if report["seconds"] else 0.0
+        logger.info(
+            f"Catalog ingestion finished: {report['processed']} products in {report['seconds']:.2f}s "
+            f"({report['items_per_second']:.1f} items/s), {report['embedded']} embedded, "
+            f"{report['metadata_updated']} metadata updates, {report['unchanged']} unchanged, "
+            f"{report['deleted']} deleted"
+        )
+        return report
@@ -0,0 +1,465 @@
+"""
+Offline load testing of the voice pipeline.
+
+Twilio, Sarvam, OpenAI, Firestore and GCS are replaced by in-process fakes
+whose latency follows a log-normal distribution and which fail with a
+configurable probability. Synthetic voice-note webhooks, optionally mixed
+with typed messages, are then replayed against the Flask app at a fixed
+arrival rate, and the latency of every traced stage (the webhook, each graph
+node and each external call) is reported as p50/p95/p99, so regressions in
+webhook() and compiled_graph can be caught without network access or API keys.
+"""
+import io
+import os
+import time
+import wave
+import zlib
+import base64
+import random
+import logging
+import tempfile
+import threading
+from contextlib import ExitStack, contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from typing import Any, Dict, List
+from unittest import mock
+
+from src.db.storage import UserStore, apply_write
+from src.speech_processing.canned_responses import CANNED_MESSAGES
+from src.utils.tracing import add_span_listener, remove_span_listener
+
+logger = logging.getLogger(__name__)
+
+# Default (median ms, sigma, error rate) of every faked service
+DEFAULT_PROFILES = {
+    "twilio.media": (150.0, 0.4, 0.0),
+    "twilio.send": (120.0, 0.3, 0.0),
+    "sarvam.stt": (900.0, 0.35, 0.0),
+    "sarvam.chat": (1500.0, 0.4, 0.0),
+    "sarvam.translate": (300.0, 0.3, 0.0),
+    "sarvam.tts": (700.0, 0.35, 0.0),
+    "openai.embeddings": (120.0, 0.3, 0.0),
+    "firestore.read": (40.0, 0.5, 0.0),
+    "firestore.write": (60.0, 0.5, 0.0),
+    "gcs.upload": (150.0, 0.4, 0.0),
+}
+
+SYNTHETIC_QUERIES = [
+    ("Show me running shoes under 3000 rupees", "hi-IN"),
+    ("I want a cotton t-shirt", "ta-IN"),
+    ("Which smartphone has the best camera", "te-IN"),
+    ("Do you have blue denim jeans", "kn-IN"),
+    ("Suggest a gift for my mother", "bn-IN"),
+    ("I need a laptop for college", "mr-IN"),
+    ("Show me electronics under 15000", "hi-IN"),
+    ("Are there any wireless headphones", "en-IN"),
+]
+# Typed messages, in English and in Indic scripts
+SYNTHETIC_TEXT_MESSAGES = [
+    "Show me running shoes under 3000 rupees",
+    "Do you have blue denim jeans",
+    "मुझे सूती टी-शर्ट चाहिए",
+    "சிறந்த கேமரா உள்ள ஸ்மார்ட்போன் எது",
+]
+
+
+class FakeServiceError(Exception):
+    """Injected failure of a faked external service."""
+
+
+class ServiceProfile:
+    """Latency and error distribution of one faked service."""
+
+    def __init__(self, median_ms: float, sigma: float = 0.3, error_rate: float = 0.0, seed: int = None):
+        self.median_ms = median_ms
+        self.sigma = sigma
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def parse(cls, spec: str, seed: int = None) -> "ServiceProfile":
+        """Parse "median_ms[:sigma[:error_rate]]", e.g. "900:0.35:0.01"."""
+        parts = [float(part) for part in spec.split(":")]
+        if not 1 <= len(parts) <= 3:
+            raise ValueError(f"Invalid service profile: {spec}")
+        return cls(*parts, seed=seed)
+
+    def call(self, name: str) -> None:
+        """Sleep for a sampled latency, then fail with the configured probability."""
+        with self._lock:
+            delay = self._random.lognormvariate(0.0, self.sigma) * self.median_ms / 1000 if self.median_ms > 0 else 0.0
+            fail = self._random.random() < self.error_rate
+        time.sleep(delay)
+        if fail:
+            raise FakeServiceError(f"Injected {name} failure")
+
+
+def build_profiles(overrides: Dict[str, str] = None, latency_scale: float = 1.0,
+                   seed: int = None) -> Dict[str, ServiceProfile]:
+    """
+    Build the service profiles from the defaults.
+
+    Args:
+        overrides: Service name to "median_ms[:sigma[:error_rate]]"
+        latency_scale: Factor applied to every median latency
+        seed: Seed for reproducible latencies and failures
+    """
+    profiles = {}
+    for i, (name, (median_ms, sigma, error_rate)) in enumerate(DEFAULT_PROFILES.items()):
+        profile_seed = None if seed is None else seed + i
+        profile = ServiceProfile(median_ms, sigma, error_rate, seed=profile_seed)
+        if overrides and name in overrides:
+            profile = ServiceProfile.parse(overrides[name], seed=profile_seed)
+        profile.median_ms *= latency_scale
+        profiles[name] = profile
+    unknown = set(overrides or {}) - set(DEFAULT_PROFILES)
+    if unknown:
+        raise ValueError(f"Unknown services: {', '.join(sorted(unknown))}")
+    return profiles
+
+
+def wav_bytes(seconds: float = 1.0, sample_rate: int = 16000) -> bytes:
+    """A silent mono 16-bit WAV file."""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(b"\x00\x00" * int(seconds * sample_rate))
+    return buffer.getvalue()
+
+
+class FakeTwilioMedia:
+    """Stands in for the requests module used to download Twilio media."""
+
+    def __init__(self, profile: ServiceProfile, audio: bytes):
+        self.profile = profile
+        self.audio = audio
+
+    def get(self, url, auth=None, **kwargs):
+        try:
+            self.profile.call("twilio.media")
+        except FakeServiceError:
+            return SimpleNamespace(status_code=503, text="Service Unavailable", headers={}, content=b"")
+        return SimpleNamespace(status_code=200, text="", headers={"Content-Type": "audio/wav"}, content=self.audio)
+
+
+class FakeTwilioClient:
+    """Stands in for twilio.rest.Client; counts sent messages."""
+
+    def __init__(self, profile: ServiceProfile):
+        self.profile = profile
+        self.sent = 0
+        self._lock = threading.Lock()
+        self.messages = SimpleNamespace(create=self._create)
+
+    def _create(self, **kwargs):
+        self.profile.call("twilio.send")
+        with self._lock:
+            self.sent += 1
+        return SimpleNamespace(sid=f"SMfake{self.sent}")
+
+
+class FakeSarvamClient:
+    """Stands in for the SarvamAI client used for STT, chat, translation and TTS."""
+
+    def __init__(self, profiles: Dict[str, ServiceProfile], queries=SYNTHETIC_QUERIES, seed: int = None):
+        self.profiles = profiles
+        self.queries = queries
+        self.tts_audio = base64.b64encode(wav_bytes(0.5)).decode("ascii")
+        self._random = random.Random(seed)
+        self.speech_to_text = SimpleNamespace(translate=self._speech_to_text)
+        self.chat = SimpleNamespace(completions=self._chat_completion)
+        self.text = SimpleNamespace(translate=self._translate)
+        self.text_to_speech = SimpleNamespace(convert=self._text_to_speech)
+
+    def _speech_to_text(self, file=None, model=None, **kwargs):
+        self.profiles["sarvam.stt"].call("sarvam.stt")
+        transcript, language_code = self._random.choice(self.queries)
+        return SimpleNamespace(transcript=transcript, language_code=language_code)
+
+    def _chat_completion(self, messages=None, **kwargs):
+        self.profiles["sarvam.chat"].call("sarvam.chat")
+        content = "Here are a few products you might like. The first one is our most popular choice."
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+    def _translate(self, input=None, source_language_code=None, target_language_code=None, **kwargs):
+        self.profiles["sarvam.translate"].call("sarvam.translate")
+        return SimpleNamespace(translated_text=f"[{target_language_code}] {input}")
+
+    def _text_to_speech(self, text=None, target_language_code=None, **kwargs):
+        self.profiles["sarvam.tts"].call("sarvam.tts")
+        return SimpleNamespace(audios=[self.tts_audio])
+
+
+class FakeStorageClient:
+    """Stands in for google.cloud.storage.Client."""
+
+    def __init__(self, profile: ServiceProfile):
+        self.profile = profile
+
+    def bucket(self, name):
+        return SimpleNamespace(blob=lambda path: FakeBlob(self.profile, name, path))
+
+
+class FakeBlob:
+    def __init__(self, profile: ServiceProfile, bucket: str, path: str):
+        self.profile = profile
+        self.public_url = f"https://storage.googleapis.com/{bucket}/{path}"
+
+    def upload_from_file(self, file, content_type=None):
+        self.profile.call("gcs.upload")
+
+
+class FakeEmbeddings:
+    """Stands in for OpenAIEmbeddings with bag-of-words hashing vectors."""
+
+    model = "fake-embedding"
+
+    def __init__(self, profile: ServiceProfile, dimension: int = 64):
+        self.profile = profile
+        self.dimension = dimension
+
+    def embed_documents(self, texts):
+        self.profile.call("openai.embeddings")
+        vectors = []
+        for text in texts:
+            vector = [0.0] * self.dimension
+            for word in text.lower().split():
+                vector[zlib.crc32(word.encode('utf-8')) % self.dimension] += 1.0
+            vectors.append(vector)
+        return vectors
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+class FakeUserStore(UserStore):
+    """In-memory user store with Firestore-like latency."""
+
+    def __init__(self, read_profile: ServiceProfile, write_profile: ServiceProfile):
+        self.read_profile = read_profile
+        self.write_profile = write_profile
+        self.users: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def get_full_user_data(self, user_id: str) -> dict:
+        self.read_profile.call("firestore.read")
+        with self._lock:
+            return dict(self.users.get(user_id, {}))
+
+    def save_conversation(self, user_id: str, exchange: list[dict]) -> None:
+        self.apply_writes([(user_id, "conversation", exchange)])
+
+    def save_user_data(self, user_id: str, key: str, input_data: any) -> None:
+        self.apply_writes([(user_id, "user_data", (key, input_data))])
+
+    def delete_user(self, user_id: str) -> None:
+        self.write_profile.call("firestore.write")
+        with self._lock:
+            self.users.pop(user_id, None)
+
+    def apply_writes(self, writes: list[tuple]) -> None:
+        self.write_profile.call("firestore.write")
+        with self._lock:
+            for user_id, kind, payload in writes:
+                self.users[user_id] = apply_write(self.users.get(user_id, {}), kind, payload)
+
+
+def build_vector_store(directory: str, profile: ServiceProfile):
+    """A NumPy vector store of the sample products embedded with FakeEmbeddings."""
+    from src.utils.vector_store import NumpyVectorStore
+    from src.utils.embedding_cache import CachedEmbeddings
+    from src.data.sample_products import products
+
+    with mock.patch.dict(os.environ, {"OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY", "load-test")}):
+        store = NumpyVectorStore(persist_directory=directory)
+    store.embeddings = CachedEmbeddings(FakeEmbeddings(profile), persist_path=None)
+    store.initialize_collection()
+    store.add_products(products)
+    return store
+
+
+@contextmanager
+def fake_services(profiles: Dict[str, ServiceProfile], seed: int = None):
+    """
+    Replace every external service used by the webhook with a fake.
+
+    Yields:
+        SimpleNamespace with the fakes (twilio, sarvam, user_store, vector_store, audio_spool)
+    """
+    import src.db.storage as storage_module
+    import src.db.write_behind as write_behind_module
+    import src.llm.sarvam as sarvam_module
+    import src.utils.admission as admission_module
+    import src.utils.spool as spool_module
+    import src.speech_processing.processor as processor
+    import src.utils.vector_store as vector_store_module
+    import src.whatsapp.webhook as webhook_module
+
+    twilio = FakeTwilioClient(profiles["twilio.send"])
+    sarvam = FakeSarvamClient(profiles, seed=seed)
+    user_store = FakeUserStore(profiles["firestore.read"], profiles["firestore.write"])
+    storage_client = FakeStorageClient(profiles["gcs.upload"])
+
+    with ExitStack() as stack:
+        directory = stack.enter_context(tempfile.TemporaryDirectory(prefix="load-test-"))
+        vector_store = build_vector_store(directory, profiles["openai.embeddings"])
+        stack.enter_context(mock.patch.dict(os.environ, {
+            "TWILIO_WHATSAPP_NUMBER": os.environ.get("TWILIO_WHATSAPP_NUMBER", "+10000000000"),
+            "BUCKET_NAME": "load-test",
+        }))
+        stack.enter_context(mock.patch.object(webhook_module, "twilio_client", twilio))
+        stack.enter_context(mock.patch.object(processor, "requests", FakeTwilioMedia(profiles["twilio.media"], wav_bytes())))
+        stack.enter_context(mock.patch.object(processor, "sarvam_client", sarvam))
+        stack.enter_context(mock.patch("google.cloud.storage.Client", lambda: storage_client))
+        stack.enter_context(mock.patch.object(sarvam_module, "sarvam_client", sarvam))
+        stack.enter_context(mock.patch.object(storage_module, "user_store", user_store))
+        stack.enter_context(mock.patch.object(vector_store_module, "vector_store", vector_store))
+        # A fresh queue so writes go to the fake store; drained before the fakes are removed
+        stack.enter_context(mock.patch.object(write_behind_module, "write_behind_queue", None))
+        # Audio and debug captures go to throwaway spools
+        for attribute, name in (("audio_spool", "audio"), ("debug_audio_spool", "debug_audio")):
+            spool = spool_module.Spool(os.path.join(directory, name), spool_module.SPOOL_MAX_BYTES,
+                                       spool_module.SPOOL_MAX_AGE, name=name)
+            stack.enter_context(mock.patch.object(spool_module, attribute, spool))
+            stack.callback(spool.stop_collector)
+        # Rate limits as configured, but with buckets no earlier run has drained
+        stack.enter_context(mock.patch.object(
+            admission_module, "admission_controller",
+            admission_module.AdmissionController(admission_module.MemoryTokenBuckets()),
+        ))
+        try:
+            yield SimpleNamespace(twilio=twilio, sarvam=sarvam, user_store=user_store, vector_store=vector_store,
+                                  audio_spool=spool_module.audio_spool)
+        finally:
+            if write_behind_module.write_behind_queue is not None:
+                write_behind_module.write_behind_queue.shutdown()
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def voice_webhook(i: int, users: int) -> Dict[str, str]:
+    """Form fields of a synthetic Twilio voice-note webhook."""
+    return {
+        "MessageSid": f"SMload{i:08d}",
+        "From": f"whatsapp:+9190000{i % users:05d}",
+        "Body": "",
+        "NumMedia": "1",
+        "MediaUrl0": f"https://api.twilio.com/fake/Media/ME{i:08d}",
+        "MediaContentType0": "audio/wav",
+    }
+
+
+def text_webhook(i: int, users: int) -> Dict[str, str]:
+    """Form fields of a synthetic Twilio typed-message webhook."""
+    return {
+        "MessageSid": f"SMload{i:08d}",
+        "From": f"whatsapp:+9190000{i % users:05d}",
+        "Body": SYNTHETIC_TEXT_MESSAGES[i % len(SYNTHETIC_TEXT_MESSAGES)],
+        "NumMedia": "0",
+    }
+
+
+def run_load_test(app, rps: float, requests: int, users: int = 20, concurrency: int = 64,
+                  text_share: float = 0.0) -> Dict[str, Any]:
+    """
+    Replay synthetic voice-note webhooks against the app at a fixed arrival rate.
+
+    Requests are sent open loop: request i is due at i / rps seconds and its
+    latency is measured from that time, so queueing behind slow requests is
+    counted instead of hidden.
+
+    Args:
+        app: Flask app with the WhatsApp routes configured
+        rps: Target arrival rate in requests per second
+        requests: Number of webhooks to send
+        users: Number of distinct senders
+        concurrency: Maximum requests in flight
+        text_share: Fraction of webhooks that are typed messages instead of voice notes
+
+    Returns:
+        dict: throughput, error counts and per-stage latency samples in seconds
+    """
+    stages: Dict[str, List[float]] = {}
+    stage_errors: Dict[str, int] = {}
+    lock = threading.Lock()
+
+    def record_span(record):
+        with lock:
+            stages.setdefault(record["name"], []).append(record["duration_ms"] / 1000)
+            if record["error"]:
+                stage_errors[record["name"]] = stage_errors.get(record["name"], 0) + 1
+
+    def send(i: int, due: float):
+        client = app.test_client()
+        # Spread typed messages evenly over the run
+        is_text = int((i + 1) * text_share) > int(i * text_share)
+        response = client.post("/webhook", data=text_webhook(i, users) if is_text else voice_webhook(i, users))
+        latency = time.perf_counter() - due
+        body = response.get_data(as_text=True)
+        fallback = response.status_code != 200 or "Sorry" in body
+        with lock:
+            stages.setdefault("request", []).append(latency)
+            if CANNED_MESSAGES["try_later"] in body:
+                # Turned away by admission control
+                stages.setdefault("rejected", []).append(latency)
+            if fallback:
+                stage_errors["request"] = stage_errors.get("request", 0) + 1
+
+    add_span_listener(record_span)
+    try:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="load-test") as executor:
+            for i in range(requests):
+                due = start + i / rps
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                executor.submit(send, i, due)
+        elapsed = time.perf_counter() - start
+    finally:
+        remove_span_listener(record_span)
+
+    return {
+        "requests": requests,
+        "target_rps": rps,
+        "elapsed": elapsed,
+        "throughput": requests / elapsed if elapsed else 0.0,
+        "stages": stages,
+        "errors": stage_errors,
+    }
+
+
+def summarize(result: Dict[str, Any]) -> Dict[str, Dict[str, float]]:
+    """Count, error count and p50/p95/p99 in milliseconds of every stage."""
+    summary = {}
+    for name, samples in sorted(result["stages"].items()):
+        summary[name] = {
+            "count": len(samples),
+            "errors": result["errors"].get(name, 0),
+            "p50_ms": percentile(samples, 50) * 1000,
+            "p95_ms": percentile(samples, 95) * 1000,
+            "p99_ms": percentile(samples, 99) * 1000,
+        }
+    return summary
+
+
+def format_report(result: Dict[str, Any]) -> str:
+    lines = [
+        f"{result['requests']} requests at {result['target_rps']:.1f} rps target: "
+        f"{result['throughput']:.2f} rps achieved in {result['elapsed']:.1f}s",
+        f"{'stage':<28}{'count':>8}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}",
+    ]
+    for name, stats in summarize(result).items():
+        lines.append(
+            f"{name:<28}{stats['count']:>8}{stats['errors']:>8}"
+            f"{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}{stats['p99_ms']:>10.1f}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,408 @@
+"""
+Exact nearest-neighbour index on a memory-mapped NumPy matrix.
+
+Vectors are stored L2-normalised as a contiguous float32 matrix in
+vectors.npy, so cosine similarity is a single matrix product. Product
+metadata is stored in metadata.jsonl, one line per row of the matrix, and
+rows are identified by the metadata "id" field.
+
+With quantization="int8" the search scans int8 codes (codes.npy, one scale
+per row in scales.npy) instead of the float32 matrix, and only the best
+candidates are rescored on the full-precision vectors. The scan touches a
+quarter of the memory; the float32 pages are read only for candidates.
+"""
+import os
+import io
+import json
+import threading
+import logging
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+VECTORS_FILE = "vectors.npy"
+METADATA_FILE = "metadata.jsonl"
+CODES_FILE = "codes.npy"
+SCALES_FILE = "scales.npy"
+# Candidates per requested result that are rescored on full precision
+RESCORE_FACTOR = 4
+# Bytes of float32 rows dequantised at a time while scanning int8 codes
+SCAN_CHUNK_BYTES = 8 * 1024 * 1024
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """Return float32 rows scaled to unit length."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[np.newaxis, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def quantize_int8(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Quantise rows to int8 with one symmetric scale per row.
+
+    Returns:
+        (codes, scales) where codes * scales[:, None] approximates vectors.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(vectors / scales[:, np.newaxis]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def top_k(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Select the k best scores along the last axis.
+
+    Uses argpartition so the cost is linear in the number of rows, then sorts
+    only the k selected entries.
+
+    Returns:
+        (indices, scores) arrays with shape (..., k), best first.
+    """
+    k = min(k, scores.shape[-1])
+    if k <= 0:
+        empty = np.empty(scores.shape[:-1] + (0,))
+        return empty.astype(np.int64), empty
+    if k < scores.shape[-1]:
+        candidates = np.argpartition(-scores, k - 1, axis=-1)[..., :k]
+    else:
+        candidates = np.broadcast_to(np.arange(scores.shape[-1]), scores.shape).copy()
+    candidate_scores = np.take_along_axis(scores, candidates, axis=-1)
+    order = np.argsort(-candidate_scores, axis=-1, kind="stable")
+    return np.take_along_axis(candidates, order, axis=-1), np.take_along_axis(candidate_scores, order, axis=-1)
+
+
+def _append_npy_rows(path: str, rows: np.ndarray) -> None:
+    """
+    Append rows to a 2-D .npy file in place.
+
+    NumPy pads .npy headers so the first dimension can grow, which lets us
+    rewrite the header and append the raw rows without copying the file. If
+    the new header doesn't fit, the file is rewritten.
+    """
+    with open(path, "r+b") as f:
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+        header_length = f.tell()
+
+        if fortran_order or dtype != rows.dtype or shape[1:] != rows.shape[1:]:
+            raise ValueError(f"Cannot append rows of shape {rows.shape} to {path} with shape {shape}")
+
+        header = io.BytesIO()
+        header_fields = {
+            "descr": np.lib.format.dtype_to_descr(dtype),
+            "fortran_order": False,
+            "shape": (shape[0] + rows.shape[0],) + tuple(shape[1:]),
+        }
+        if version == (1, 0):
+            np.lib.format.write_array_header_1_0(header, header_fields)
+        else:
+            np.lib.format.write_array_header_2_0(header, header_fields)
+
+        if len(header.getvalue()) == header_length:
+            f.seek(0, os.SEEK_END)
+            f.write(np.ascontiguousarray(rows).tobytes())
+            f.seek(0)
+            f.write(header.getvalue())
+            return
+
+    existing = np.load(path)
+    np.save(path, np.concatenate([existing, rows]))
+
+
+class NumpyVectorIndex:
+    """Exact cosine-similarity index backed by a memory-mapped .npy file."""
+
+    def __init__(self, directory: str, id_key: str = "id", quantization: str = None,
+                 rescore_factor: int = RESCORE_FACTOR):
+        """
+        Initialize the index.
+
+        Args:
+            directory: Directory holding vectors.npy and metadata.jsonl.
+            id_key: Metadata field identifying each row.
+            quantization: None for exact float32 search or "int8" to scan quantised codes.
+            rescore_factor: Candidates per result rescored on full precision in int8 mode.
+        """
+        if quantization not in (None, "int8"):
+            raise ValueError(f"Unsupported quantization: {quantization}")
+        self.directory = directory
+        self.id_key = id_key
+        self.quantization = quantization
+        self.rescore_factor = rescore_factor
+        self.vectors_path = os.path.join(directory, VECTORS_FILE)
+        self.metadata_path = os.path.join(directory, METADATA_FILE)
+        self.codes_path = os.path.join(directory, CODES_FILE)
+        self.scales_path = os.path.join(directory, SCALES_FILE)
+        self.vectors = None
+        self._codes = None
+        self._scales = None
+        self.metadata: List[Dict[str, Any]] = []
+        self._columns: Dict[str, np.ndarray] = {}
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.metadata)
+
+    @property
+    def dimension(self) -> int:
+        return self.vectors.shape[1] if self.vectors is not None else 0
+
+    def load(self) -> "NumpyVectorIndex":
+        """Memory-map the vectors and load the metadata, if the index exists."""
+        with self._lock:
+            if os.path.exists(self.vectors_path):
+                self.vectors = np.load(self.vectors_path, mmap_mode="r")
+                self._codes = self._scales = None
+                with open(self.metadata_path, encoding="utf-8") as f:
+                    self.metadata = [json.loads(line) for line in f if line.strip()]
+                if len(self.metadata) != self.vectors.shape[0]:
+                    raise ValueError(
+                        f"Index at {self.directory} has {self.vectors.shape[0]} vectors "
+                        f"but {len(self.metadata)} metadata rows"
+                    )
+            else:
+                self.vectors = None
+                self._codes = self._scales = None
+                self.metadata = []
+            self._columns = {}
+            logger.info(f"Loaded NumPy index with {len(self.metadata)} vectors from {self.directory}")
+        return self
+
+    def append(self, vectors: Sequence[Sequence[float]], metadatas: Sequence[Dict[str, Any]]) -> None:
+        """
+        Append vectors and their metadata to the index files.
+
+        Args:
+            vectors: Embeddings, one per product.
+            metadatas: Product metadata, in the same order as vectors.
+        """
+        if len(vectors) != len(metadatas):
+            raise ValueError("vectors and metadatas must have the same length")
+        if not len(vectors):
+            return
+        rows = normalize_rows(vectors)
+
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            if os.path.exists(self.vectors_path):
+                _append_npy_rows(self.vectors_path, rows)
+            else:
+                np.save(self.vectors_path, rows)
+            with open(self.metadata_path, "a", encoding="utf-8") as f:
+                for metadata in metadatas:
+                    f.write(json.dumps(metadata, ensure_ascii=False) + "\n")
+            self.vectors = np.load(self.vectors_path, mmap_mode="r")
+            self._drop_quantized()
+            self.metadata.extend(metadatas)
+            self._columns = {}
+
+    def positions(self) -> Dict[Any, int]:
+        """Map of id to row index."""
+        with self._lock:
+            return {metadata[self.id_key]: row for row, metadata in enumerate(self.metadata)}
+
+    def column(self, field: str, numeric: bool = False) -> np.ndarray:
+        """
+        Values of a metadata field for every row, cached until the index changes.
+
+        Args:
+            field: Metadata field name
+            numeric: Return float64 values, with NaN where the field is missing
+        """
+        key = f"{field}:{numeric}"
+        with self._lock:
+            column = self._columns.get(key)
+            if column is None:
+                if numeric:
+                    column = np.array([m.get(field, np.nan) for m in self.metadata], dtype=np.float64)
+                else:
+                    column = np.array([m.get(field) for m in self.metadata], dtype=object)
+                self._columns[key] = column
+            return column
+
+    def _write_metadata(self) -> None:
+        self._columns = {}
+        temp_path = self.metadata_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            for metadata in self.metadata:
+                f.write(json.dumps(metadata, ensure_ascii=False) + "\n")
+        os.replace(temp_path, self.metadata_path)
+
+    def upsert(self, vectors: Sequence[Sequence[float]], metadatas: Sequence[Dict[str, Any]]) -> None:
+        """
+        Insert or replace vectors by id.
+
+        Existing rows are overwritten in place; new ids are appended.
+
+        Args:
+            vectors: Embeddings, one per product.
+            metadatas: Product metadata with an id field, in the same order as vectors.
+        """
+        if len(vectors) != len(metadatas):
+            raise ValueError("vectors and metadatas must have the same length")
+        if not len(vectors):
+            return
+        rows = normalize_rows(vectors)
+
+        with self._lock:
+            positions = self.positions()
+            updated = [(positions[m[self.id_key]], i) for i, m in enumerate(metadatas) if m[self.id_key] in positions]
+            added = [i for i, m in enumerate(metadatas) if m[self.id_key] not in positions]
+
+            if updated:
+                writable = np.load(self.vectors_path, mmap_mode="r+")
+                writable[[row for row, _ in updated]] = rows[[i for _, i in updated]]
+                writable.flush()
+                del writable
+                for row, i in updated:
+                    self.metadata[row] = metadatas[i]
+                self._write_metadata()
+            if added:
+                self.append(rows[added], [metadatas[i] for i in added])
+            elif updated:
+                self.vectors = np.load(self.vectors_path, mmap_mode="r")
+                self._drop_quantized()
+
+    def update_metadata(self, metadatas: Sequence[Dict[str, Any]]) -> None:
+        """Replace the metadata of existing rows without touching their vectors."""
+        with self._lock:
+            positions = self.positions()
+            for metadata in metadatas:
+                self.metadata[positions[metadata[self.id_key]]] = metadata
+            self._write_metadata()
+
+    def delete(self, ids: Sequence[Any]) -> None:
+        """Remove rows by id, rewriting the index files without them."""
+        ids = set(ids)
+        with self._lock:
+            keep = [row for row, metadata in enumerate(self.metadata) if metadata[self.id_key] not in ids]
+            if len(keep) == len(self.metadata):
+                return
+            temp_path = self.vectors_path + ".tmp.npy"
+            np.save(temp_path, np.asarray(self.vectors[keep], dtype=np.float32))
+            os.replace(temp_path, self.vectors_path)
+            self.metadata = [self.metadata[row] for row in keep]
+            self._write_metadata()
+            self.vectors = np.load(self.vectors_path, mmap_mode="r")
+            self._drop_quantized()
+
+    def _drop_quantized(self) -> None:
+        """Discard int8 codes after the vectors changed; they are rebuilt on the next search."""
+        self._codes = self._scales = None
+        for path in (self.codes_path, self.scales_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def quantized(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Int8 codes and row scales for the current vectors.
+
+        They are memory-mapped from codes.npy and scales.npy, which every write
+        removes, and rebuilt from the vectors when missing.
+        """
+        with self._lock:
+            if self._codes is None and self.vectors is not None:
+                if os.path.exists(self.codes_path) and os.path.exists(self.scales_path):
+                    codes = np.load(self.codes_path, mmap_mode="r")
+                    scales = np.load(self.scales_path, mmap_mode="r")
+                    if codes.shape == self.vectors.shape and scales.shape == (len(codes),):
+                        self._codes, self._scales = codes, scales
+                if self._codes is None:
+                    codes = np.empty(self.vectors.shape, dtype=np.int8)
+                    scales = np.empty(len(self.vectors), dtype=np.float32)
+                    chunk_rows = max(1, SCAN_CHUNK_BYTES // (4 * self.dimension))
+                    for start in range(0, len(self.vectors), chunk_rows):
+                        end = start + chunk_rows
+                        codes[start:end], scales[start:end] = quantize_int8(self.vectors[start:end])
+                    np.save(self.codes_path, codes)
+                    np.save(self.scales_path, scales)
+                    self._codes = np.load(self.codes_path, mmap_mode="r")
+                    self._scales = np.load(self.scales_path, mmap_mode="r")
+                    logger.info(f"Quantised {len(codes)} vectors to int8 in {self.directory}")
+            return self._codes, self._scales
+
+    def search(self, query_vector: Sequence[float], k: int = 3, mask: np.ndarray = None) -> List[Tuple[int, float]]:
+        """
+        Find the k most similar vectors.
+
+        Args:
+            query_vector: Query embedding.
+            k: Number of results.
+            mask: Optional boolean array selecting the rows that may be returned.
+
+        Returns:
+            (row index, cosine similarity) tuples, best first.
+        """
+        return self.search_batch([query_vector], k, mask=mask)[0]
+
+    def search_batch(self, query_vectors: Sequence[Sequence[float]], k: int = 3,
+                     mask: np.ndarray = None) -> List[List[Tuple[int, float]]]:
+        """
+        Find the k most similar vectors for each query with one matrix product.
+
+        Args:
+            query_vectors: Query embeddings.
+            k: Number of results per query.
+            mask: Optional boolean array selecting the rows that may be returned.
+
+        Returns:
+            One list of (row index, cosine similarity) tuples per query.
+        """
+        with self._lock:
+            vectors = self.vectors
+        if vectors is None or not len(query_vectors):
+            return [[] for _ in query_vectors]
+        queries = normalize_rows(query_vectors)
+
+        rows = None
+        if mask is not None:
+            rows = np.flatnonzero(mask)
+            if not len(rows):
+                return [[] for _ in query_vectors]
+
+        if self.quantization == "int8":
+            indices, top_scores = self._search_quantized(queries, k, rows, vectors)
+        else:
+            # Selective filters only score the matching rows
+            scores = queries @ (vectors[rows] if rows is not None else vectors).T
+            indices, top_scores = top_k(scores, k)
+            if rows is not None:
+                indices = rows[indices]
+        return [
+            [(int(i), float(score)) for i, score in zip(row_indices, row_scores)]
+            for row_indices, row_scores in zip(indices, top_scores)
+        ]
+
+    def _search_quantized(self, queries: np.ndarray, k: int, rows: np.ndarray,
+                          vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Approximate scan over int8 codes followed by exact rescoring of the best candidates."""
+        codes, scales = self.quantized()
+        count = len(rows) if rows is not None else len(codes)
+        scores = np.empty((len(queries), count), dtype=np.float32)
+        # Dequantise in chunks so the float32 temporaries stay small
+        chunk_rows = max(1, SCAN_CHUNK_BYTES // (4 * codes.shape[1]))
+        for start in range(0, count, chunk_rows):
+            end = min(start + chunk_rows, count)
+            chunk = slice(start, end) if rows is None else rows[start:end]
+            scores[:, start:end] = (queries @ codes[chunk].astype(np.float32).T) * scales[chunk]
+
+        if rows is None:
+            rows = np.arange(count)
+
+        candidates, _ = top_k(scores, k * self.rescore_factor)
+        candidate_rows = rows[candidates]
+        candidate_vectors = vectors[candidate_rows.ravel()].reshape(candidate_rows.shape + (-1,))
+        exact = np.einsum("qd,qcd->qc", queries, candidate_vectors)
+        order, top_scores = top_k(exact, k)
+        return np.take_along_axis(candidate_rows, order, axis=-1), top_scores
@@ -0,0 +1,217 @@
+"""
+On-demand profiling of live webhook jobs.
+
+Profiling is armed for the next N jobs through the admin endpoint, or for a
+single request carrying the X-Profile-Token header. A sampler thread records
+the stack of the request's thread at a fixed interval, so the request itself
+runs unmodified. The result is written as folded stacks (one
+"frame;frame;frame count" line per stack), which flamegraph.pl and speedscope
+read directly. Where sys._current_frames is unavailable, cProfile is used
+instead and a .prof file is written.
+
+Rate limits make leaving this enabled safe: at most one job is profiled at a
+time, profiled jobs are at least PROFILE_MIN_INTERVAL seconds apart, an arm
+covers at most PROFILE_MAX_JOBS jobs and only the newest PROFILE_MAX_FILES
+profiles are kept.
+"""
+import os
+import sys
+import time
+import hmac
+import logging
+import cProfile
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+from src.utils import metrics
+
+# Shared secret for the admin endpoint and header; profiling is disabled when unset
+PROFILING_TOKEN = os.environ.get("PROFILING_TOKEN")
+PROFILE_DIRECTORY = os.environ.get("PROFILE_DIRECTORY", "/tmp/profiles")
+PROFILE_SAMPLE_INTERVAL = max(0.001, float(os.environ.get("PROFILE_SAMPLE_INTERVAL", "0.005")))
+PROFILE_MIN_INTERVAL = float(os.environ.get("PROFILE_MIN_INTERVAL", "10"))
+PROFILE_MAX_JOBS = int(os.environ.get("PROFILE_MAX_JOBS", "20"))
+PROFILE_MAX_FILES = int(os.environ.get("PROFILE_MAX_FILES", "50"))
+# Frames deeper than this are dropped from the root end of a sampled stack
+MAX_STACK_DEPTH = 200
+
+logger = logging.getLogger(__name__)
+
+profiled_jobs_counter = metrics.counter("profiled_jobs_total", "Webhook jobs considered for profiling, by outcome")
+
+
+def sampling_available() -> bool:
+    return hasattr(sys, "_current_frames")
+
+
+def frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Samples the stack of one thread from a background thread."""
+
+    def __init__(self, thread_id: int, interval: float = PROFILE_SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._labels: Dict[Any, str] = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack: List[str] = []
+            while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                code = frame.f_code
+                label = self._labels.get(code)
+                if label is None:
+                    label = self._labels[code] = frame_label(code)
+                stack.append(label)
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self) -> "StackSampler":
+        self._thread.start()
+        return self
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+
+def write_folded(path: str, stacks: Counter) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        for stack, count in stacks.most_common():
+            f.write(f"{stack} {count}\n")
+
+
+class JobProfiler:
+    """Decides which webhook jobs are profiled and stores their profiles."""
+
+    def __init__(self, directory: str = PROFILE_DIRECTORY, token: Optional[str] = PROFILING_TOKEN,
+                 min_interval: float = PROFILE_MIN_INTERVAL, max_jobs: int = PROFILE_MAX_JOBS,
+                 max_files: int = PROFILE_MAX_FILES, sample_interval: float = PROFILE_SAMPLE_INTERVAL):
+        self.directory = directory
+        self.token = token
+        self.min_interval = min_interval
+        self.max_jobs = max_jobs
+        self.max_files = max_files
+        self.sample_interval = sample_interval
+        self.mode = "sampling" if sampling_available() else "cprofile"
+
+        self._lock = threading.Lock()
+        self._remaining = 0
+        self._active = False
+        self._last_started = float("-inf")
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.token)
+
+    def authorized(self, token: Optional[str]) -> bool:
+        return self.enabled and token is not None and hmac.compare_digest(token, self.token)
+
+    def arm(self, count: int) -> int:
+        """Profile the next count jobs, capped at max_jobs. Returns the number armed."""
+        with self._lock:
+            self._remaining = max(0, min(count, self.max_jobs))
+            logger.info(f"Profiling armed for the next {self._remaining} webhook jobs")
+            return self._remaining
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            remaining, active = self._remaining, self._active
+        return {"mode": self.mode, "remaining": remaining, "active": active, "profiles": self.list_profiles()}
+
+    def list_profiles(self) -> List[str]:
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(name for name in os.listdir(self.directory) if name.startswith("profile-"))
+
+    def _acquire(self, requested: bool) -> bool:
+        """Claim the profiling slot for a job if armed or requested and the rate limits allow it."""
+        with self._lock:
+            if not (requested or self._remaining):
+                return False
+            now = time.monotonic()
+            if self._active or now - self._last_started < self.min_interval:
+                profiled_jobs_counter.inc(outcome="rate_limited")
+                return False
+            if not requested:
+                self._remaining -= 1
+            self._active = True
+            self._last_started = now
+            return True
+
+    def _release(self) -> None:
+        with self._lock:
+            self._active = False
+
+    def _prune(self) -> None:
+        """Remove all but the newest max_files profiles."""
+        profiles = sorted(self.list_profiles(), key=lambda name: os.path.getmtime(os.path.join(self.directory, name)))
+        for name in profiles[:max(0, len(profiles) - self.max_files)]:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError as e:
+                logger.warning(f"Could not remove old profile {name}: {e}")
+
+    @contextmanager
+    def profile(self, job_id: str, requested: bool = False):
+        """
+        Profile the enclosed job if profiling is armed or requested.
+
+        Args:
+            job_id: Identifier used in the profile file name, e.g. the MessageSid
+            requested: The request asked to be profiled with a valid token
+
+        Yields:
+            str: Path the profile will be written to, or None if the job isn't profiled
+        """
+        if not self._acquire(requested):
+            yield None
+            return
+
+        os.makedirs(self.directory, exist_ok=True)
+        safe_id = "".join(c for c in (job_id or "job") if c.isalnum() or c in "-_")[:64]
+        extension = "folded" if self.mode == "sampling" else "prof"
+        path = os.path.join(self.directory, f"profile-{time.strftime('%Y%m%dT%H%M%S')}-{safe_id}.{extension}")
+        start = time.perf_counter()
+        try:
+            if self.mode == "sampling":
+                sampler = StackSampler(threading.get_ident(), self.sample_interval).start()
+                try:
+                    yield path
+                finally:
+                    write_folded(path, sampler.stop())
+            else:
+                profiler = cProfile.Profile()
+                profiler.enable()
+                try:
+                    yield path
+                finally:
+                    profiler.disable()
+                    profiler.dump_stats(path)
+            profiled_jobs_counter.inc(outcome=self.mode)
+            logger.info(f"Profiled job {job_id} in {(time.perf_counter() - start) * 1000:.0f}ms: {path}")
+            self._prune()
+        finally:
+            self._release()
+
+
+job_profiler = None
+_job_profiler_lock = threading.Lock()
+
+def get_job_profiler() -> JobProfiler:
+    global job_profiler
+    if job_profiler is None:
+        with _job_profiler_lock:
+            if job_profiler is None:
+                job_profiler = JobProfiler()
+    return job_profiler
@@ -0,0 +1,158 @@
+"""
+Precomputed "related products" table for upselling.
+
+An offline job (scripts/build_related_products.py) finds the nearest
+neighbours of every catalog item from the stored embeddings and writes them
+to related_products.json next to the index. By default only products in
+other categories count, so shoes are related to socks rather than to other
+shoes. The agent then attaches complementary items to its search results
+with a dictionary lookup instead of further searches.
+
+Similarities are computed a chunk of rows at a time (RELATED_CHUNK_BYTES of
+scores per chunk), so neither the full n x n matrix nor a normalised copy of
+the embeddings has to fit in memory; memory-mapped embeddings stay on disk.
+"""
+import os
+import json
+import time
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from src.utils.numpy_index import normalize_rows, top_k
+
+RELATED_PRODUCTS_FILE = "related_products.json"
+# Neighbours stored per product
+RELATED_PRODUCTS_PER_ITEM = int(os.environ.get("RELATED_PRODUCTS_PER_ITEM", "5"))
+# Bytes of float32 similarity scores computed at a time
+RELATED_CHUNK_BYTES = 64 * 1024 * 1024
+
+logger = logging.getLogger(__name__)
+
+
+def category_codes(categories: Sequence[Optional[str]]) -> np.ndarray:
+    """Integer code per category; products without one get a code of their own."""
+    codes = {}
+    result = np.empty(len(categories), dtype=np.int64)
+    for i, category in enumerate(categories):
+        result[i] = codes.setdefault(category, len(codes)) if category else -1 - i
+    return result
+
+
+def compute_related(vectors: np.ndarray, ids: Sequence[str], categories: Sequence[Optional[str]] = None,
+                    k: int = RELATED_PRODUCTS_PER_ITEM, chunk_bytes: int = RELATED_CHUNK_BYTES) -> Dict[str, List[str]]:
+    """
+    Find the k most similar other products of every product.
+
+    Args:
+        vectors: One embedding per product; may be a memory-mapped array
+        ids: Product id of each row
+        categories: Category of each row; if given, neighbours in the same category are skipped
+        k: Neighbours per product
+        chunk_bytes: Bytes of similarity scores computed at a time
+
+    Returns:
+        dict: Product id to related product ids, most similar first
+    """
+    count = len(ids)
+    if count == 0:
+        return {}
+    codes = category_codes(categories) if categories is not None else None
+    rows_per_chunk = max(1, chunk_bytes // (4 * count))
+    # Only row norms are kept in memory; a memory-mapped matrix is never copied whole
+    norms = np.concatenate([
+        np.linalg.norm(np.asarray(vectors[start:start + rows_per_chunk], dtype=np.float32), axis=1)
+        for start in range(0, count, rows_per_chunk)
+    ])
+    norms[norms == 0] = 1.0
+    related = {}
+    for start in range(0, count, rows_per_chunk):
+        end = min(count, start + rows_per_chunk)
+        scores = normalize_rows(vectors[start:end]) @ np.asarray(vectors, dtype=np.float32).T
+        scores /= norms[np.newaxis, :]
+        rows = np.arange(end - start)
+        # A product isn't related to itself, nor, for upselling, to products of its own category
+        scores[rows, rows + start] = -np.inf
+        if codes is not None:
+            scores[codes[start:end, np.newaxis] == codes[np.newaxis, :]] = -np.inf
+        indices, best = top_k(scores, k)
+        for row in rows:
+            related[ids[start + row]] = [ids[j] for j, score in zip(indices[row], best[row]) if np.isfinite(score)]
+    return related
+
+
+def write_related(directory: str, related: Dict[str, List[str]], **info: Any) -> str:
+    """
+    Atomically write the related-products table into an index directory.
+
+    Args:
+        directory: Index directory the table belongs to
+        related: Product id to related product ids
+        info: Extra fields recorded with the table, e.g. k and cross_category
+
+    Returns:
+        str: Path of the table
+    """
+    path = os.path.join(directory, RELATED_PRODUCTS_FILE)
+    table = {
+        "count": len(related),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        **info,
+        "related": related,
+    }
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(table, f, ensure_ascii=False)
+    os.replace(path + ".tmp", path)
+    logger.info(f"Wrote related products for {len(related)} products to {path}")
+    return path
+
+
+class RelatedProducts:
+    """The related-products table of an index directory, reloaded when the file changes."""
+
+    def __init__(self, directory: str):
+        self.path = os.path.join(directory, RELATED_PRODUCTS_FILE)
+        self._related: Dict[str, List[str]] = {}
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    def _refresh(self) -> None:
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            self._related, self._mtime = {}, None
+            return
+        if mtime == self._mtime:
+            return
+        with self._lock:
+            if mtime != self._mtime:
+                with open(self.path, encoding="utf-8") as f:
+                    self._related = json.load(f)["related"]
+                self._mtime = mtime
+                logger.info(f"Loaded related products for {len(self._related)} products from {self.path}")
+
+    def get(self, product_id: str) -> List[str]:
+        """Related product ids, most similar first; empty for unknown products or without a table."""
+        self._refresh()
+        return self._related.get(product_id, [])
+
+    def for_results(self, product_ids: Sequence[str], limit: int) -> List[str]:
+        """
+        Related products of several search results, excluding the results themselves.
+
+        Takes the closest neighbour of each result in turn, then the second
+        closest, and so on, so every result contributes.
+        """
+        self._refresh()
+        neighbours = [self._related.get(product_id, []) for product_id in product_ids]
+        selected, seen = [], set(product_ids)
+        for rank in range(max((len(n) for n in neighbours), default=0)):
+            for candidates in neighbours:
+                if rank < len(candidates) and candidates[rank] not in seen:
+                    seen.add(candidates[rank])
+                    selected.append(candidates[rank])
+                    if len(selected) == limit:
+                        return selected
+        return selected
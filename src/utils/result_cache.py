@@ -0,0 +1,150 @@
+"""
+Versioned LRU/TTL cache for search responses.
+
+Entries are tied to the catalog version they were computed for, so any catalog
+write invalidates them. Concurrent requests for the same key share a single
+computation.
+"""
+import os
+import time
+import threading
+import logging
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from src.utils import metrics
+
+SEARCH_CACHE_SIZE = int(os.environ.get("SEARCH_CACHE_SIZE", "1024"))
+SEARCH_CACHE_TTL = float(os.environ.get("SEARCH_CACHE_TTL", "300"))
+
+logger = logging.getLogger(__name__)
+
+cache_requests_counter = metrics.counter("search_cache_requests_total", "Search cache lookups by outcome")
+
+
+class VersionedResultCache:
+    """LRU cache with per-entry TTL whose entries are dropped when the version changes."""
+
+    def __init__(self, max_entries: int = SEARCH_CACHE_SIZE, ttl: float = SEARCH_CACHE_TTL, name: str = "search"):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries: Maximum number of cached results.
+            ttl: Seconds a result stays valid.
+            name: Label used for metrics.
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.name = name
+        self.version = None
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._in_flight: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def _check_version(self, version: Hashable) -> None:
+        """Drop every entry when the version moves on. Caller holds the lock."""
+        if version != self.version:
+            if self._entries:
+                logger.info(f"Catalog version changed to {version}, clearing {len(self._entries)} cached {self.name} results")
+            self._entries.clear()
+            self.version = version
+
+    def get(self, key: Hashable, version: Hashable, default: Any = None) -> Any:
+        """Return the cached result for key, or default if it's missing or expired."""
+        cache_key = (version, key)
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(cache_key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(cache_key)
+                cache_requests_counter.inc(cache=self.name, outcome="hit")
+                return entry[1]
+        cache_requests_counter.inc(cache=self.name, outcome="miss")
+        return default
+
+    def put(self, key: Hashable, version: Hashable, value: Any) -> None:
+        """Store a result computed for the given catalog version."""
+        with self._lock:
+            self._check_version(version)
+            self._store((version, key), value)
+
+    def _store(self, cache_key: tuple, value: Any) -> None:
+        """Insert an entry and evict the least recently used ones. Caller holds the lock."""
+        self._entries[cache_key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(cache_key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get_or_compute(self, key: Hashable, version: Hashable, compute: Callable[[], Any],
+                       should_cache: Optional[Callable[[Any], bool]] = None) -> Any:
+        """
+        Return the cached result for key, computing it at most once across threads.
+
+        Args:
+            key: Cache key, e.g. (normalised query, limit).
+            version: Catalog version the result depends on.
+            compute: Function producing the result on a miss.
+            should_cache: Optional predicate; results for which it is false are not stored.
+
+        Returns:
+            The cached or freshly computed result.
+        """
+        cache_key = (version, key)
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(cache_key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(cache_key)
+                    cache_requests_counter.inc(cache=self.name, outcome="hit")
+                    return value
+                del self._entries[cache_key]
+
+            future = self._in_flight.get(cache_key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._in_flight[cache_key] = future
+
+        if not leader:
+            cache_requests_counter.inc(cache=self.name, outcome="coalesced")
+            return future.result()
+
+        cache_requests_counter.inc(cache=self.name, outcome="miss")
+        try:
+            value = compute()
+        except Exception as e:
+            with self._lock:
+                self._in_flight.pop(cache_key, None)
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            self._in_flight.pop(cache_key, None)
+            if (should_cache is None or should_cache(value)) and version == self.version:
+                self._store(cache_key, value)
+        future.set_result(value)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+search_cache = None
+_search_cache_lock = threading.Lock()
+
+def get_search_cache() -> VersionedResultCache:
+    global search_cache
+    if search_cache is None:
+        with _search_cache_lock:
+            if search_cache is None:
+                search_cache = VersionedResultCache()
+    return search_cache
@@ -0,0 +1,221 @@
+"""
+Bounded spool directories for audio files.
+
+Every voice note is downloaded and transcoded inside a per-request scope, a
+subdirectory of the audio spool that is removed when the request finishes,
+however it finishes. A background collector additionally removes entries
+older than the spool's age limit, and the oldest entries while the spool is
+over its size limit, so files left behind by a crashed worker are reclaimed
+too. Scopes still in use are never collected. Workers share the spool and
+can't see each other's scopes, so nothing younger than SPOOL_MIN_AGE (longer
+than any request may run) is collected either.
+
+Debug captures of incoming audio (ENV=dev) go to a second spool with its own
+limits, so they no longer accumulate without bound.
+"""
+import os
+import time
+import shutil
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import List, Optional, Set, Tuple
+
+from src.utils import metrics
+
+SPOOL_DIRECTORY = os.environ.get("SPOOL_DIRECTORY", os.path.join(tempfile.gettempdir(), "indiccommerce-spool"))
+SPOOL_MAX_BYTES = int(os.environ.get("SPOOL_MAX_BYTES", str(512 * 1024 * 1024)))
+SPOOL_MAX_AGE = float(os.environ.get("SPOOL_MAX_AGE", "3600"))
+SPOOL_MIN_AGE = float(os.environ.get("SPOOL_MIN_AGE", "300"))
+DEBUG_AUDIO_DIRECTORY = os.environ.get("DEBUG_AUDIO_DIRECTORY", "/app/debug_audio")
+DEBUG_AUDIO_MAX_BYTES = int(os.environ.get("DEBUG_AUDIO_MAX_BYTES", str(100 * 1024 * 1024)))
+DEBUG_AUDIO_MAX_AGE = float(os.environ.get("DEBUG_AUDIO_MAX_AGE", str(24 * 3600)))
+SPOOL_GC_INTERVAL = float(os.environ.get("SPOOL_GC_INTERVAL", "60"))
+
+logger = logging.getLogger(__name__)
+
+spool_bytes_gauge = metrics.gauge("spool_bytes", "Bytes in spool entries not in use, as of the last collection")
+spool_entries_gauge = metrics.gauge("spool_entries", "Files and request scopes not in use, as of the last collection")
+spool_active_scopes_gauge = metrics.gauge("spool_active_scopes", "Request scopes currently in use")
+spool_evictions_counter = metrics.counter("spool_evictions_total", "Spool entries removed by the collector, by reason")
+
+
+def entry_size(path: str) -> int:
+    """Size of a file, or of every file below a directory."""
+    if not os.path.isdir(path):
+        return os.path.getsize(path)
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                continue
+    return total
+
+
+def remove_entry(path: str) -> None:
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        os.remove(path)
+
+
+class Spool:
+    """A directory whose entries are bounded in total size and age."""
+
+    def __init__(self, directory: str, max_bytes: int, max_age: float, min_age: float = SPOOL_MIN_AGE,
+                 name: str = "audio"):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.min_age = min_age
+        self.name = name
+        self._active: Set[str] = set()
+        self._lock = threading.Lock()
+        self._collector: Optional[threading.Thread] = None
+        self._collector_pid = None
+        self._stop = threading.Event()
+
+    @contextmanager
+    def scope(self):
+        """
+        A directory for the files of one request, removed when the block exits.
+
+        Yields:
+            str: Path of the scope directory
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        path = tempfile.mkdtemp(prefix="request-", dir=self.directory)
+        with self._lock:
+            self._active.add(path)
+            spool_active_scopes_gauge.set(len(self._active), spool=self.name)
+        try:
+            yield path
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+            with self._lock:
+                self._active.discard(path)
+                spool_active_scopes_gauge.set(len(self._active), spool=self.name)
+
+    def keep(self, source: str, filename: str) -> Optional[str]:
+        """
+        Copy a file into the spool, where it stays until the collector removes it.
+
+        Returns:
+            str: Path of the copy, or None if it could not be made
+        """
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, filename)
+            shutil.copy(source, path)
+            return path
+        except OSError as e:
+            logger.warning(f"Could not copy {source} to the {self.name} spool: {e}")
+            return None
+
+    def _entries(self) -> List[Tuple[float, int, str]]:
+        """(mtime, size, path) of every entry not in use, oldest first."""
+        if not os.path.isdir(self.directory):
+            return []
+        with self._lock:
+            active = set(self._active)
+        entries = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if path in active:
+                continue
+            try:
+                entries.append((os.path.getmtime(path), entry_size(path), path))
+            except OSError:
+                # Removed by its request in the meantime
+                continue
+        return sorted(entries)
+
+    def collect(self, now: float = None) -> int:
+        """
+        Remove entries over the age limit, then the oldest while over the size limit.
+
+        Returns:
+            int: Number of entries removed
+        """
+        now = time.time() if now is None else now
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for mtime, size, path in entries:
+            if now - mtime < self.min_age:
+                # Possibly in use by another worker; entries are oldest first
+                break
+            if now - mtime > self.max_age:
+                reason = "age"
+            elif total > self.max_bytes:
+                reason = "size"
+            else:
+                continue
+            try:
+                remove_entry(path)
+            except OSError as e:
+                logger.warning(f"Could not remove {path} from the {self.name} spool: {e}")
+                continue
+            total -= size
+            removed += 1
+            spool_evictions_counter.inc(spool=self.name, reason=reason)
+        spool_bytes_gauge.set(total, spool=self.name)
+        spool_entries_gauge.set(len(entries) - removed, spool=self.name)
+        if removed:
+            logger.info(f"Removed {removed} entries from the {self.name} spool; {total} bytes left")
+        return removed
+
+    def _run_collector(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            try:
+                self.collect()
+            except Exception as e:
+                logger.error(f"Collecting the {self.name} spool failed: {e}")
+
+    def start_collector(self, interval: float = SPOOL_GC_INTERVAL) -> None:
+        """Collect in a background thread; started again in a forked worker, where the thread is gone."""
+        with self._lock:
+            if self._collector is not None and self._collector_pid == os.getpid():
+                return
+            self._stop.clear()
+            self._collector = threading.Thread(
+                target=self._run_collector, args=(interval,), name=f"{self.name}-spool-gc", daemon=True
+            )
+            self._collector_pid = os.getpid()
+            self._collector.start()
+
+    def stop_collector(self) -> None:
+        self._stop.set()
+        if self._collector is not None and self._collector_pid == os.getpid():
+            self._collector.join()
+        self._collector = None
+
+
+audio_spool = None
+debug_audio_spool = None
+_spool_lock = threading.Lock()
+
+def get_audio_spool() -> Spool:
+    global audio_spool
+    if audio_spool is None:
+        with _spool_lock:
+            if audio_spool is None:
+                audio_spool = Spool(SPOOL_DIRECTORY, SPOOL_MAX_BYTES, SPOOL_MAX_AGE, name="audio")
+                # Reclaim what a previous process left behind
+                audio_spool.collect()
+    audio_spool.start_collector()
+    return audio_spool
+
+def get_debug_audio_spool() -> Spool:
+    global debug_audio_spool
+    if debug_audio_spool is None:
+        with _spool_lock:
+            if debug_audio_spool is None:
+                debug_audio_spool = Spool(
+                    DEBUG_AUDIO_DIRECTORY, DEBUG_AUDIO_MAX_BYTES, DEBUG_AUDIO_MAX_AGE, min_age=0, name="debug_audio"
+                )
+    debug_audio_spool.start_collector()
+    return debug_audio_spool
@@ -0,0 +1,116 @@
+"""
+Request tracing with spans for graph nodes and external calls.
+
+Each webhook request runs inside request_context(MessageSid). Spans opened
+within it are timed into the span_duration_seconds histogram (labelled by span
+name and kind), failures are counted in span_errors_total, and when the request
+finishes one log line lists every span with its duration, so a slow request can
+be traced back to the call that made it slow.
+"""
+import time
+import uuid
+import logging
+import functools
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+from src.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+SPAN_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+span_histogram = metrics.histogram(
+    "span_duration_seconds", "Duration of traced operations by span name and kind", buckets=SPAN_BUCKETS
+)
+span_errors_counter = metrics.counter("span_errors_total", "Traced operations that raised, by span name and kind")
+
+_request_id: contextvars.ContextVar = contextvars.ContextVar("request_id", default=None)
+_spans: contextvars.ContextVar = contextvars.ContextVar("spans", default=None)
+_parent: contextvars.ContextVar = contextvars.ContextVar("parent_span", default=None)
+
+# Callables receiving every finished span record, e.g. the load-test harness
+_span_listeners: List[Callable[[Dict[str, Any]], None]] = []
+
+
+def current_request_id() -> Optional[str]:
+    """Request id of the current trace, or None outside a request."""
+    return _request_id.get()
+
+
+def add_span_listener(listener: Callable[[Dict[str, Any]], None]) -> None:
+    """Call listener with the record of every span that finishes from now on."""
+    _span_listeners.append(listener)
+
+
+def remove_span_listener(listener: Callable[[Dict[str, Any]], None]) -> None:
+    if listener in _span_listeners:
+        _span_listeners.remove(listener)
+
+
+@contextmanager
+def request_context(request_id: Optional[str] = None):
+    """
+    Trace a request: spans opened inside are collected and logged on exit.
+
+    Args:
+        request_id: Correlation id, e.g. the Twilio MessageSid; generated if missing
+    """
+    request_id = request_id or uuid.uuid4().hex
+    tokens = (_request_id.set(request_id), _spans.set([]), _parent.set(None))
+    start = time.perf_counter()
+    try:
+        yield request_id
+    finally:
+        spans = _spans.get()
+        total_ms = (time.perf_counter() - start) * 1000
+        summary = ", ".join(
+            f"{s['name']}={s['duration_ms']:.0f}ms{'!' if s['error'] else ''}" for s in spans
+        )
+        logger.info(f"trace request_id={request_id} total={total_ms:.0f}ms spans=[{summary}]")
+        for var, token in zip((_request_id, _spans, _parent), tokens):
+            var.reset(token)
+
+
+@contextmanager
+def span(name: str, kind: str = "internal", **attributes: Any):
+    """
+    Time a block as a span of the current request.
+
+    Args:
+        name: Span name, e.g. "sarvam.chat_completion"
+        kind: Span kind used as a metric label, e.g. "node", "sarvam", "openai", "firestore", "gcs"
+        attributes: Extra fields recorded with the span
+    """
+    record: Dict[str, Any] = {"name": name, "kind": kind, "parent": _parent.get(), "error": None, **attributes}
+    token = _parent.set(name)
+    start = time.perf_counter()
+    try:
+        yield record
+    except Exception as e:
+        record["error"] = type(e).__name__
+        span_errors_counter.inc(name=name, kind=kind)
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        _parent.reset(token)
+        record["duration_ms"] = duration * 1000
+        span_histogram.observe(duration, name=name, kind=kind)
+        spans: List[Dict[str, Any]] = _spans.get()
+        if spans is not None:
+            spans.append(record)
+        for listener in list(_span_listeners):
+            listener(record)
+        logger.debug(f"span request_id={_request_id.get()} {record}")
+
+
+def traced(name: str, kind: str = "internal"):
+    """Decorator recording every call of the function as a span."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name, kind):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
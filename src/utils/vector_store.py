@@ -1,36 +1,137 @@
 """
 Vector store utilities using LangChain-Chroma with OpenAI embeddings.
+
+Set VECTOR_STORE_BACKEND=numpy to use the in-process NumPy exact-search index
+instead of Chroma, or VECTOR_STORE_BACKEND=snapshot to serve a read-only index
+snapshot (see src/utils/index_snapshot.py).
 """
 import os
+import time
 import logging
+import hashlib
+import tempfile
+import threading
 from typing import List, Dict, Any
 
-from langchain_core.documents import Document
-from langchain_chroma import Chroma
-from langchain_openai import OpenAIEmbeddings
-from src.utils.ngrok import get_ngrok_url_with_retry
+import numpy as np
+
+from src.utils.embedding_cache import CachedEmbeddings
+from src.utils.bm25 import BM25Index, reciprocal_rank_fusion
+from src.utils.numpy_index import NumpyVectorIndex
+from src.utils.index_snapshot import load_snapshot
+from src.utils.related_products import RelatedProducts
+from src.utils import metrics
+from src.utils.tracing import traced
 from src.data.sample_products import products as sample_products
+from src.data.catalog import PRICE_FIELD, prepare_product, normalize_filters, matches_filters, chroma_where
 
 PERSIST_DIRECTORY = '../../chroma_db'
+NUMPY_PERSIST_DIRECTORY = '../../numpy_index'
+SNAPSHOT_DIRECTORY = '../../index_snapshot'
+# File in the persistence directory whose content changes on every catalog write
+CATALOG_VERSION_FILE = 'catalog_version'
+# "chroma", "numpy" or "snapshot"
+VECTOR_STORE_BACKEND = os.environ.get("VECTOR_STORE_BACKEND", "chroma")
+# "hybrid" fuses BM25 and dense results, "dense" uses embeddings only
+SEARCH_MODE = os.environ.get("VECTOR_SEARCH_MODE", "hybrid")
+# Answer from BM25 alone, without an embedding call, when the lexical match is confident
+LEXICAL_FAST_PATH = os.environ.get("LEXICAL_FAST_PATH", "true").lower() == "true"
+# "int8" scans quantised vectors in the NumPy backend and rescores candidates on full precision
+VECTOR_QUANTIZATION = os.environ.get("VECTOR_QUANTIZATION", "none")
+# OpenAI model embedding products and queries; snapshots record it
+EMBEDDING_MODEL = os.environ.get("EMBEDDING_MODEL", "text-embedding-ada-002")
+# Verify snapshot file checksums when loading
+SNAPSHOT_VERIFY = os.environ.get("SNAPSHOT_VERIFY", "true").lower() == "true"
+# Query run end to end during warm-up; empty skips the embedding call
+WARMUP_QUERY = os.environ.get("VECTOR_STORE_WARMUP_QUERY", "shoes")
 
 logger = logging.getLogger(__name__)
 
+search_counter = metrics.counter("vector_search_total", "Product searches by retrieval path")
+
+# Metadata field holding the hash of the product fields that determine its embedding
+CONTENT_HASH_KEY = "content_hash"
+
+def product_text(product: Dict[str, Any]) -> str:
+    """Text that is embedded for a product."""
+    return f"{product['name']}: {product['description']}"
+
+def content_hash(product: Dict[str, Any]) -> str:
+    """Hash of the fields whose changes require re-embedding the product."""
+    content = "\x1f".join(str(product.get(field, "")) for field in ("name", "description", "category"))
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+def stored_product(product: Dict[str, Any]) -> Dict[str, Any]:
+    """Metadata stored for a product: the normalised product plus its content hash."""
+    product = prepare_product(product)
+    return {**product, CONTENT_HASH_KEY: content_hash(product)}
+
+def public_product(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """Product information from stored metadata, without internal fields."""
+    return {key: value for key, value in metadata.items() if key != CONTENT_HASH_KEY}
+
 class VectorStore:
     """Vector store for product search using LangChain-Chroma."""
 
-    def __init__(self, persist_directory: str):
+    def __init__(self, persist_directory: str, search_mode: str = SEARCH_MODE):
         """Initialize the in-memory Chroma vector store."""
-        self.embeddings = OpenAIEmbeddings()
+        # Repeated queries are served from the cache instead of calling OpenAI
+        # langchain_openai and langchain_chroma take seconds to import; load them on first use
+        from langchain_openai import OpenAIEmbeddings
+
+        self.embeddings = CachedEmbeddings(OpenAIEmbeddings(model=EMBEDDING_MODEL))
         self.vector_store = None
+        self.search_mode = search_mode
+        self.lexical_index = None
+        self._lexical_lock = threading.Lock()
+        self.related = None
 
         # Get the directory of the current script
         script_dir = os.path.dirname(os.path.abspath(__file__))
         # Construct the persistence directory path relative to the script's location
         persist_directory = os.path.join(script_dir, persist_directory)
         self.persist_directory = persist_directory
+        self._catalog_version = None
+        self._catalog_version_mtime = None
         
         self.initialized = False
     
+    @property
+    def catalog_version(self) -> str:
+        """
+        Identifier of the current catalog contents.
+
+        It changes whenever products are written, including by ingestion running
+        in another process, so it can key caches of search results.
+        """
+        path = os.path.join(self.persist_directory, CATALOG_VERSION_FILE)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return "0"
+        if mtime != self._catalog_version_mtime:
+            with open(path, encoding="utf-8") as f:
+                self._catalog_version = f.read().strip()
+            self._catalog_version_mtime = mtime
+        return self._catalog_version
+
+    def bump_catalog_version(self) -> str:
+        """Record that the catalog changed and return the new version."""
+        version = f"{time.time_ns():x}"
+        os.makedirs(self.persist_directory, exist_ok=True)
+        path = os.path.join(self.persist_directory, CATALOG_VERSION_FILE)
+        # A temporary file of its own, as ingestion bumps from several threads at once
+        fd, tmp_path = tempfile.mkstemp(prefix=CATALOG_VERSION_FILE + ".", dir=self.persist_directory)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(version)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return version
+
     def add_test_products(self):
         """TODO: Replace. Add test products to the vector store."""
         # Add demo products to the store - embeddings will be generated by SimpleEmbeddings
@@ -40,6 +141,7 @@ class VectorStore:
         """Initialize or get the collection."""
         try:
             logger.info(f"Initializing Chroma collection '{collection_name}' with persistence directory '{self.persist_directory}'...")
+            from langchain_chroma import Chroma
             
             self.vector_store = Chroma(
                 collection_name=collection_name,
@@ -56,7 +158,7 @@ class VectorStore:
     
     def add_products(self, products: List[Dict[str, Any]]):
         """
-        Add products to the vector store.
+        Add products to the vector store, replacing any stored product with the same id.
         
         Args:
             products: List of product dictionaries
@@ -66,58 +168,445 @@ class VectorStore:
             return False
         
         try:
+            from langchain_core.documents import Document
+
             # Convert products to LangChain documents
             documents = []
             for i, product in enumerate(products):
                 # Create a document from the product
                 doc = Document(
-                    page_content=f"{product['name']}: {product['description']}",
-                    metadata=product
+                    page_content=product_text(product),
+                    metadata=stored_product(product)
                 )
                 documents.append(doc)
             
-            # Add documents to the vector store
-            self.vector_store.add_documents(documents)
+            # Add documents to the vector store, keyed by product id so re-runs upsert
+            self.vector_store.add_documents(documents, ids=[product["id"] for product in products])
+            self.lexical_index = None
+            self.bump_catalog_version()
             logger.info(f"Added {len(products)} products to the vector store.")
             return True
         except Exception as e:
             logger.error(f"Error adding products to vector store: {e}")
             return False
     
-    def search(self, query: str, limit: int = 3) -> List[Dict[str, Any]]:
+    def search(self, query: str, limit: int = 3, filters: Dict[str, Any] = None) -> List[Dict[str, Any]]:
         """
         Search for products using a text query.
         
         Args:
             query: The text query to search with
             limit: Maximum number of results to return
+            filters: Optional category and price range constraints, applied inside the index
+                (see src/data/catalog.py)
             
         Returns:
             List of matching products
         """
+        return self.search_many([query], limit=limit, filters=filters)[0]
+
+    @traced("vector_store.search", "search")
+    def search_many(self, queries: List[str], limit: int = 3,
+                    filters: Dict[str, Any] = None) -> List[List[Dict[str, Any]]]:
+        """
+        Search for several queries at once.
+
+        Queries that need embeddings are embedded in one request and looked up
+        with one batched nearest-neighbour query.
+
+        Args:
+            queries: Text queries
+            limit: Maximum number of results per query
+            filters: Optional category and price range constraints applied to every query
+
+        Returns:
+            One list of matching products per query, in the order of queries
+        """
         if not self.initialized:
             logger.error("Vector store not initialized. Call initialize_collection first.")
-            return []
-        
+            return [[] for _ in queries]
+
         try:
-            # Query the vector store
-            results = self.vector_store.similarity_search(query, k=limit)
-            
-            # Extract and return the metadata (product information)
-            if results:
-                return [doc.metadata for doc in results]
-            return []
+            filters = normalize_filters(filters)
+            unique_queries = list(dict.fromkeys(queries))
+            if self.search_mode == "dense":
+                search_counter.inc(len(unique_queries), path="dense")
+                results = dict(zip(unique_queries, self._dense_search_many(unique_queries, limit, filters)))
+                return [results[query] for query in queries]
+
+            # Fetch more candidates than needed so fusion has something to re-rank
+            candidates = max(limit * 4, 20)
+            lexical_index = self.get_lexical_index()
+            doc_filter = (lambda i: matches_filters(lexical_index.products[i], filters)) if filters else None
+
+            results, lexical_results, pending = {}, {}, []
+            for query in unique_queries:
+                lexical_results[query] = lexical_index.search(query, limit=candidates, doc_filter=doc_filter)
+                if LEXICAL_FAST_PATH and lexical_index.is_confident(query, lexical_results[query]):
+                    search_counter.inc(path="lexical")
+                    results[query] = [lexical_index.products[i] for i, _ in lexical_results[query][:limit]]
+                else:
+                    pending.append(query)
+
+            if pending:
+                search_counter.inc(len(pending), path="hybrid")
+                for query, dense_results in zip(pending, self._dense_search_many(pending, candidates, filters)):
+                    lexical_products = [lexical_index.products[i] for i, _ in lexical_results[query]]
+                    products = {}
+                    for product in lexical_products + dense_results:
+                        products.setdefault(product["id"], product)
+                    fused_ids = reciprocal_rank_fusion([
+                        [product["id"] for product in lexical_products],
+                        [product["id"] for product in dense_results],
+                    ])
+                    results[query] = [products[product_id] for product_id in fused_ids[:limit]]
+            return [results[query] for query in queries]
         except Exception as e:
             logger.error(f"Error searching vector store: {e}")
+            return [[] for _ in queries]
+
+    def _dense_search_many(self, queries: List[str], limit: int,
+                           filters: Dict[str, Any] = None) -> List[List[Dict[str, Any]]]:
+        """Nearest-neighbour search for several queries in one Chroma query, filtered by a where clause."""
+        query_vectors = self.embeddings.embed_queries(queries)
+        results = self.vector_store._collection.query(
+            query_embeddings=query_vectors,
+            n_results=limit,
+            where=chroma_where(filters or {}),
+            include=["metadatas"],
+        )
+        return [[public_product(metadata) for metadata in metadatas] for metadatas in results["metadatas"]]
+
+    @property
+    def index_directory(self) -> str:
+        """Directory holding the stored vectors, where the related-products table is kept."""
+        return self.persist_directory
+
+    def related_products(self, ids: List[str], limit: int = 2) -> List[Dict[str, Any]]:
+        """
+        Complementary products for search results from the precomputed related-products table.
+
+        Args:
+            ids: Product ids of the search results
+            limit: Maximum number of related products
+
+        Returns:
+            Related products, excluding the results themselves; empty without a table
+        """
+        if self.related is None:
+            self.related = RelatedProducts(self.index_directory)
+        related_ids = self.related.for_results(ids, limit)
+        if not related_ids:
             return []
+        # Products deleted since the table was built are skipped
+        stored = self.get_stored_metadata(related_ids)
+        return [public_product(stored[i]) for i in related_ids if i in stored]
+
+    def categories(self) -> List[str]:
+        """Return the distinct categories of the stored products."""
+        return sorted({product.get("category") for product in self.get_lexical_index().products} - {None})
+
+    def list_products(self) -> List[Dict[str, Any]]:
+        """Return every product stored in the collection, one entry per product id."""
+        stored = self.vector_store.get(include=["metadatas"])
+        products = {}
+        for metadata in stored.get("metadatas") or []:
+            products[metadata["id"]] = public_product(metadata)
+        return list(products.values())
+
+    def product_ids(self) -> List[str]:
+        """Return the ids of every stored document."""
+        return self.vector_store.get(include=[])["ids"]
+
+    def get_stored_metadata(self, ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Look up stored metadata, including content hashes, by product id.
+
+        Args:
+            ids: Product ids
+
+        Returns:
+            Map of id to stored metadata for the ids that exist
+        """
+        stored = self.vector_store.get(ids=ids, include=["metadatas"])
+        return dict(zip(stored["ids"], stored["metadatas"]))
+
+    def get_stored_vectors(self, ids: List[str]) -> Dict[str, List[float]]:
+        """Look up stored embeddings by document id."""
+        stored = self.vector_store.get(ids=ids, include=["embeddings"])
+        return {i: list(vector) for i, vector in zip(stored["ids"], stored["embeddings"])}
+
+    def upsert_embeddings(self, products: List[Dict[str, Any]], vectors: List[List[float]]):
+        """
+        Insert or replace products with precomputed embeddings.
+
+        Args:
+            products: List of product dictionaries
+            vectors: Embeddings of product_text for each product
+        """
+        # LangChain's Chroma wrapper always embeds itself, so write to the collection directly
+        self.vector_store._collection.upsert(
+            ids=[product["id"] for product in products],
+            embeddings=vectors,
+            metadatas=[stored_product(product) for product in products],
+            documents=[product_text(product) for product in products],
+        )
+        self.lexical_index = None
+        self.bump_catalog_version()
+
+    def update_metadata(self, products: List[Dict[str, Any]]):
+        """Replace stored product metadata without re-embedding."""
+        self.vector_store._collection.update(
+            ids=[product["id"] for product in products],
+            metadatas=[stored_product(product) for product in products],
+        )
+        self.lexical_index = None
+        self.bump_catalog_version()
+
+    def delete_products(self, ids: List[str]):
+        """Delete products by id."""
+        if ids:
+            self.vector_store.delete(ids=ids)
+            self.lexical_index = None
+            self.bump_catalog_version()
+
+    def _warm_index(self) -> None:
+        """Load the HNSW index and its pages by running a nearest-neighbour query with a stored vector."""
+        collection = self.vector_store._collection
+        stored = collection.get(limit=1, include=["embeddings"])
+        if len(stored["ids"]):
+            collection.query(query_embeddings=[stored["embeddings"][0]], n_results=1)
+
+    def warm_up(self, query: str = WARMUP_QUERY) -> None:
+        """
+        Load everything the first search needs: the index pages, the BM25 index
+        and, if query is given, the embedding client via an end-to-end search.
+
+        Args:
+            query: Search to run once the index is loaded
+        """
+        start = time.perf_counter()
+        self._warm_index()
+        self.get_lexical_index()
+        if query:
+            try:
+                self.search(query, limit=1)
+            except Exception as e:
+                # The index is loaded; a failing embedding call shouldn't keep the instance unready
+                logger.warning(f"Warm-up query failed: {e}")
+        logger.info(f"Vector store warmed up in {time.perf_counter() - start:.2f}s")
+
+    def get_lexical_index(self) -> BM25Index:
+        """Return the BM25 index over the stored products, building it on first use."""
+        if self.lexical_index is None:
+            with self._lexical_lock:
+                if self.lexical_index is None:
+                    products = self.list_products()
+                    self.lexical_index = BM25Index(products)
+                    logger.info(f"Built BM25 index over {len(products)} products.")
+        return self.lexical_index
+
+
+class NumpyVectorStore(VectorStore):
+    """Vector store for product search using an in-process NumPy exact-search index."""
+
+    def __init__(self, persist_directory: str, search_mode: str = SEARCH_MODE):
+        super().__init__(persist_directory, search_mode=search_mode)
+        self.index = None
+
+    def initialize_collection(self, collection_name: str = "products"):
+        """Memory-map the index for the collection, creating it if it doesn't exist."""
+        try:
+            directory = os.path.join(self.persist_directory, collection_name)
+            logger.info(f"Initializing NumPy index '{collection_name}' in '{directory}'...")
+            quantization = None if VECTOR_QUANTIZATION == "none" else VECTOR_QUANTIZATION
+            self.index = NumpyVectorIndex(directory, quantization=quantization).load()
+            self.initialized = True
+            logger.info(f"NumPy index '{collection_name}' initialized with {len(self.index)} vectors.")
+            return True
+        except Exception as e:
+            logger.error(f"Error initializing NumPy index: {e}")
+            self.initialized = False
+            return False
+
+    def add_products(self, products: List[Dict[str, Any]]):
+        """
+        Embed products and append them to the index.
+
+        Args:
+            products: List of product dictionaries
+        """
+        if not self.initialized:
+            logger.error("Vector store not initialized. Call initialize_collection first.")
+            return False
+
+        try:
+            vectors = self.embeddings.embed_documents([product_text(product) for product in products])
+            self.upsert_embeddings(products, vectors)
+            logger.info(f"Added {len(products)} products to the NumPy index.")
+            return True
+        except Exception as e:
+            logger.error(f"Error adding products to NumPy index: {e}")
+            return False
+
+    @property
+    def index_directory(self) -> str:
+        return self.index.directory
+
+    def _warm_index(self) -> None:
+        """Fault in the scanned vectors (or int8 codes) with a full search and build the filter columns."""
+        if len(self.index):
+            self.index.search(self.index.vectors[0], 1)
+            self.index.column("category")
+            self.index.column(PRICE_FIELD, numeric=True)
+
+    def _dense_search_many(self, queries: List[str], limit: int,
+                           filters: Dict[str, Any] = None) -> List[List[Dict[str, Any]]]:
+        """Exact cosine-similarity search for several queries with one matrix product over the rows matching filters."""
+        mask = self._filter_mask(filters) if filters else None
+        if mask is not None and not mask.any():
+            return [[] for _ in queries]
+        query_vectors = self.embeddings.embed_queries(queries)
+        return [
+            [public_product(self.index.metadata[i]) for i, _ in hits]
+            for hits in self.index.search_batch(query_vectors, limit, mask=mask)
+        ]
+
+    def _filter_mask(self, filters: Dict[str, Any]):
+        """Boolean row mask for normalised filters, evaluated on cached metadata columns."""
+        mask = np.ones(len(self.index), dtype=bool)
+        if "category" in filters:
+            mask &= np.isin(self.index.column("category"), filters["category"])
+        if "min_price" in filters or "max_price" in filters:
+            prices = self.index.column(PRICE_FIELD, numeric=True)
+            # Rows without a price are NaN and never match
+            mask &= prices >= filters.get("min_price", -np.inf)
+            mask &= prices <= filters.get("max_price", np.inf)
+        return mask
+
+    def list_products(self) -> List[Dict[str, Any]]:
+        """Return every product stored in the index, one entry per product id."""
+        products = {}
+        for metadata in self.index.metadata:
+            products[metadata["id"]] = public_product(metadata)
+        return list(products.values())
+
+    def product_ids(self) -> List[str]:
+        return list(self.index.positions())
+
+    def get_stored_metadata(self, ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        positions = self.index.positions()
+        return {i: self.index.metadata[positions[i]] for i in ids if i in positions}
+
+    def get_stored_vectors(self, ids: List[str]) -> Dict[str, List[float]]:
+        positions = self.index.positions()
+        return {i: self.index.vectors[positions[i]].tolist() for i in ids if i in positions}
+
+    def upsert_embeddings(self, products: List[Dict[str, Any]], vectors: List[List[float]]):
+        self.index.upsert(vectors, [stored_product(product) for product in products])
+        self.lexical_index = None
+        self.bump_catalog_version()
+
+    def update_metadata(self, products: List[Dict[str, Any]]):
+        self.index.update_metadata([stored_product(product) for product in products])
+        self.lexical_index = None
+        self.bump_catalog_version()
+
+    def delete_products(self, ids: List[str]):
+        if ids:
+            self.index.delete(ids)
+            self.lexical_index = None
+            self.bump_catalog_version()
+
+
+class SnapshotVectorStore(NumpyVectorStore):
+    """Read-only vector store serving a memory-mapped index snapshot."""
+
+    def __init__(self, persist_directory: str, search_mode: str = SEARCH_MODE):
+        super().__init__(persist_directory, search_mode=search_mode)
+        self.manifest = None
+
+    def initialize_collection(self, collection_name: str = "products"):
+        """Check the snapshot manifest and memory-map the snapshot read-only."""
+        try:
+            logger.info(f"Loading index snapshot from '{self.persist_directory}'...")
+            quantization = None if VECTOR_QUANTIZATION == "none" else VECTOR_QUANTIZATION
+            self.index, self.manifest = load_snapshot(
+                self.persist_directory,
+                embedding_model=self.embeddings.model,
+                verify=SNAPSHOT_VERIFY,
+                quantization=quantization,
+            )
+            self.initialized = True
+            return True
+        except Exception as e:
+            logger.error(f"Error loading index snapshot: {e}")
+            self.initialized = False
+            return False
+
+    @property
+    def catalog_version(self) -> str:
+        return self.manifest["checksum"] if self.manifest else "0"
+
+    def add_products(self, products: List[Dict[str, Any]]):
+        logger.error("Index snapshots are read-only; rebuild the snapshot to change products.")
+        return False
+
+    def upsert_embeddings(self, products: List[Dict[str, Any]], vectors: List[List[float]]):
+        raise RuntimeError("Index snapshots are read-only")
+
+    def update_metadata(self, products: List[Dict[str, Any]]):
+        raise RuntimeError("Index snapshots are read-only")
+
+    def delete_products(self, ids: List[str]):
+        raise RuntimeError("Index snapshots are read-only")
 
 
 vector_store = None
+_vector_store_lock = threading.Lock()
+_warmed_up = threading.Event()
+_warm_up_lock = threading.Lock()
 
-def get_vector_store(persist_directory: str = PERSIST_DIRECTORY):
-    logger.info("Getting vector store instance...")
+def get_vector_store(persist_directory: str = None):
     global vector_store
     if vector_store is None:
-        vector_store = VectorStore(persist_directory=persist_directory)
-        vector_store.initialize_collection()
+        with _vector_store_lock:
+            if vector_store is None:
+                logger.info("Creating vector store instance...")
+                if VECTOR_STORE_BACKEND == "numpy":
+                    store = NumpyVectorStore(persist_directory=persist_directory or NUMPY_PERSIST_DIRECTORY)
+                elif VECTOR_STORE_BACKEND == "snapshot":
+                    store = SnapshotVectorStore(persist_directory=persist_directory or SNAPSHOT_DIRECTORY)
+                else:
+                    store = VectorStore(persist_directory=persist_directory or PERSIST_DIRECTORY)
+                store.initialize_collection()
+                # Publish only once initialised so other threads never see a half-built store
+                vector_store = store
     return vector_store
+
+def warm_up_vector_store() -> bool:
+    """
+    Create and warm up the vector store singleton. Safe to call from several
+    threads; the warm-up runs once.
+
+    Returns:
+        bool: True if the vector store is ready to serve searches
+    """
+    if _warmed_up.is_set():
+        return True
+    with _warm_up_lock:
+        if not _warmed_up.is_set():
+            try:
+                store = get_vector_store()
+                if not store.initialized:
+                    return False
+                store.warm_up()
+                _warmed_up.set()
+            except Exception as e:
+                logger.error(f"Error warming up vector store: {e}")
+                return False
+    return True
+
+def is_vector_store_ready() -> bool:
+    """Check whether warm_up_vector_store has completed."""
+    return _warmed_up.is_set()
@@ -5,11 +5,16 @@ WhatsApp webhook handler for receiving and processing messages.
 from flask import Blueprint, request
 import os
 import logging
-from twilio.rest import Client
+import threading
 from twilio.twiml.messaging_response import MessagingResponse
 
 from src.speech_processing.processor import download_audio_for_sarvam
-from src.agents.ecom_agent import compiled_graph
+from src.speech_processing.canned_responses import get_canned_response_bank, remembered_language
+from src.utils import metrics
+from src.utils.tracing import request_context, span
+from src.utils.profiling import get_job_profiler
+from src.utils.admission import get_admission_controller
+from src.utils.spool import get_audio_spool
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -18,16 +23,56 @@ logger = logging.getLogger(__name__)
 # Twilio credentials
 account_sid = os.environ.get('TWILIO_ACCOUNT_SID')
 auth_token = os.environ.get('TWILIO_AUTH_TOKEN')
+# Whether replies to typed messages also get a voice note
+TEXT_REPLY_VOICE = os.environ.get('TEXT_REPLY_VOICE', 'false').lower() == 'true'
 twilio_client = None
-
-try:
-    if account_sid and auth_token:
-        twilio_client = Client(account_sid, auth_token)
-except Exception as e:
-    logger.error(f"Failed to initialize Twilio client: {e}")
+_twilio_client_lock = threading.Lock()
+
+def get_twilio_client():
+    """Create the Twilio REST client on first use; twilio.rest is slow to import."""
+    global twilio_client
+    if twilio_client is None:
+        with _twilio_client_lock:
+            if twilio_client is None and account_sid and auth_token:
+                try:
+                    from twilio.rest import Client
+                    twilio_client = Client(account_sid, auth_token)
+                except Exception as e:
+                    logger.error(f"Failed to initialize Twilio client: {e}")
+    return twilio_client
 
 whatsapp_blueprint = Blueprint('whatsapp', __name__)
 
+in_flight_gauge = metrics.gauge("webhook_in_flight", "Webhook requests currently being processed")
+_in_flight = 0
+_in_flight_condition = threading.Condition()
+
+def wait_for_in_flight(timeout: float) -> bool:
+    """
+    Wait for webhook jobs in progress to finish, e.g. during shutdown.
+
+    Returns:
+        bool: True if none are left, False if the timeout expired first
+    """
+    with _in_flight_condition:
+        return _in_flight_condition.wait_for(lambda: _in_flight == 0, timeout=timeout)
+
+def _track_in_flight(delta: int) -> None:
+    global _in_flight
+    with _in_flight_condition:
+        _in_flight += delta
+        in_flight_gauge.set(_in_flight)
+        if _in_flight == 0:
+            _in_flight_condition.notify_all()
+
+def add_canned_reply(response, key, sender_id):
+    """Add a pre-built reply in the sender's last known language; calls no upstream service."""
+    canned = get_canned_response_bank().get(key, remembered_language(sender_id))
+    message = response.message(canned["text"])
+    if canned["voice_url"]:
+        message.media(canned["voice_url"])
+    return response
+
 def configure_whatsapp_routes(app):
     """Configure WhatsApp webhook routes."""
     app.register_blueprint(whatsapp_blueprint)
@@ -43,31 +88,57 @@ def send_whatsapp_messages(to_number, agent_response):
     logger.info(f"Creating WhatsApp response: {agent_response}")
     
     from_whatsapp_number = 'whatsapp:' + os.environ.get('TWILIO_WHATSAPP_NUMBER')
-
-    if 'text' in agent_response:
-        twilio_client.messages.create(
-            from_=from_whatsapp_number,
-            to=to_number,
-            body=agent_response['text']
-        )
-
-    if 'image_url' in agent_response:
-        twilio_client.messages.create(
-            from_=from_whatsapp_number,
-            to=to_number,
-            media_url=[agent_response['image_url']]
-        )
-
-    if 'voice_url' in agent_response:
-        twilio_client.messages.create(
-            from_=from_whatsapp_number,
-            to=to_number,
-            media_url=[agent_response['voice_url']]
-        )
+    twilio_client = get_twilio_client()
+
+    if agent_response.get('text'):
+        with span("twilio.send_text", "twilio"):
+            twilio_client.messages.create(
+                from_=from_whatsapp_number,
+                to=to_number,
+                body=agent_response['text']
+            )
+
+    if agent_response.get('image_url'):
+        with span("twilio.send_image", "twilio"):
+            twilio_client.messages.create(
+                from_=from_whatsapp_number,
+                to=to_number,
+                media_url=[agent_response['image_url']]
+            )
+
+    if agent_response.get('voice_url'):
+        with span("twilio.send_voice", "twilio"):
+            twilio_client.messages.create(
+                from_=from_whatsapp_number,
+                to=to_number,
+                media_url=[agent_response['voice_url']]
+            )
 
 @whatsapp_blueprint.route('/webhook', methods=['POST'])
-def webhook(): 
-    """Handle incoming WhatsApp messages."""
+def webhook():
+    """Handle incoming WhatsApp messages, traced under the Twilio MessageSid."""
+    message_sid = request.values.get('MessageSid')
+    profiler = get_job_profiler()
+    # Replayed requests can ask to be profiled with the profiling token
+    profile_requested = profiler.authorized(request.headers.get('X-Profile-Token'))
+    _track_in_flight(1)
+    try:
+        with request_context(message_sid), span("webhook", "http"), \
+                profiler.profile(message_sid, requested=profile_requested):
+            return handle_webhook()
+    finally:
+        _track_in_flight(-1)
+
+def run_agent(sender_id, inputs):
+    """Run the agent graph for one message and send its reply through the Twilio API."""
+    # The agent pulls in langgraph and the LLM clients; import it on first use
+    from src.agents.ecom_agent import get_compiled_graph
+
+    agent_response = get_compiled_graph().invoke({"user_id": sender_id, **inputs})
+    send_whatsapp_messages(sender_id, agent_response["response"])
+
+def handle_webhook():
+    """Process a WhatsApp message and return the TwiML reply."""
     logger.info(f"Received a new WhatsApp message {request.values}")
     
     # Log all incoming data for debugging
@@ -82,26 +153,40 @@ def webhook():
     
     logger.info(f"Received message from {sender_id}: {incoming_msg[:20]}...")
     
-    # Initialize response
+    # Agent replies are sent through the Twilio API, so the TwiML answer stays empty for them
     response = MessagingResponse()
     
     if media_url and 'audio' in media_type:
-        try:
-            logger.info(f"Processing voice message from {sender_id}")
-            logger.info(f"Media URL: {media_url}")
-            logger.info(f"Media type: {media_type}")
-            
-            audio_file = download_audio_for_sarvam(media_url)
-
-            agent_response = compiled_graph.invoke({
-                "user_id": sender_id, 
-                "regional_audio_path": audio_file
-            })
-            response = send_whatsapp_messages(sender_id, agent_response["response"])
-
-        except Exception as e:
-            logger.error(f"Error processing voice message: {e}", exc_info=True)                    
-            response.message("Sorry, I had trouble processing your voice message. Could you please try again or send a text message instead?")
+        with get_admission_controller().admit(sender_id) as admitted:
+            if not admitted:
+                # Over the sender's rate limit or no capacity left: answer cheaply
+                return str(add_canned_reply(response, "try_later", sender_id))
+            try:
+                logger.info(f"Processing voice message from {sender_id}")
+                logger.info(f"Media URL: {media_url}")
+                logger.info(f"Media type: {media_type}")
+
+                # The downloaded and converted audio is removed once the reply is sent
+                with get_audio_spool().scope() as spool_directory:
+                    audio_file = download_audio_for_sarvam(media_url, spool_directory)
+                    run_agent(sender_id, {"regional_audio_path": audio_file})
+
+            except Exception as e:
+                logger.error(f"Error processing voice message: {e}", exc_info=True)
+                add_canned_reply(response, "voice_processing_failed", sender_id)
+
+    elif incoming_msg.strip():
+        with get_admission_controller().admit(sender_id) as admitted:
+            if not admitted:
+                return str(add_canned_reply(response, "try_later", sender_id))
+            try:
+                # Typed messages skip speech to text, and by default text to speech
+                logger.info(f"Processing text message from {sender_id}")
+                run_agent(sender_id, {"text_query": incoming_msg, "reply_with_voice": TEXT_REPLY_VOICE})
+
+            except Exception as e:
+                logger.error(f"Error processing text message: {e}", exc_info=True)
+                add_canned_reply(response, "error", sender_id)
     
     return str(response)
 
@@ -0,0 +1,12 @@
+"""
+Shared test configuration.
+"""
+
+import os
+from dotenv import load_dotenv
+
+# Modules read their settings at import time; load .env as app.py does, whichever test imports them first
+load_dotenv()
+
+# Tests build their own vector stores; don't warm up the persisted one in app initialisation
+os.environ.setdefault("VECTOR_STORE_WARMUP", "false")
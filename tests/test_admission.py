@@ -0,0 +1,100 @@
+"""
+Tests for per-sender rate limiting and concurrency admission.
+"""
+
+import threading
+import time
+import pytest
+from src.utils.admission import (
+    AdmissionController, MemoryTokenBuckets, SQLiteTokenBuckets, delayed_counter, rejected_counter,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def buckets_and_clock(request, tmp_path):
+    clock = FakeClock()
+    if request.param == "memory":
+        return MemoryTokenBuckets(clock=clock), clock
+    return SQLiteTokenBuckets(str(tmp_path / "rate_limits.sqlite3"), clock=clock), clock
+
+
+def test_token_bucket(buckets_and_clock):
+    """Test burst, refill and borrowing a token that refills shortly."""
+    buckets, clock = buckets_and_clock
+    # Burst of 2, one token every 10 seconds, borrow up to 5 seconds ahead
+    assert buckets.reserve("a", 2, 0.1, 0) == 0
+    assert buckets.reserve("a", 2, 0.1, 0) == 0
+    assert buckets.reserve("a", 2, 0.1, 0) is None
+    assert buckets.reserve("b", 2, 0.1, 0) == 0
+
+    clock.now += 5
+    assert buckets.reserve("a", 2, 0.1, 5) == pytest.approx(5)
+    assert buckets.reserve("a", 2, 0.1, 5) is None
+
+    clock.now += 100
+    assert buckets.reserve("a", 2, 0.1, 0) == 0
+
+
+def test_memory_buckets_forget_oldest_senders():
+    """Test that the memory backend stays bounded."""
+    buckets = MemoryTokenBuckets(max_keys=2)
+    for sender in ("a", "b", "c"):
+        buckets.reserve(sender, 1, 0.01, 0)
+    # "a" was forgotten, so its bucket is full again
+    assert buckets.reserve("a", 1, 0.01, 0) == 0
+    assert buckets.reserve("c", 1, 0.01, 0) is None
+
+
+def test_rate_limited_sender_is_rejected():
+    """Test that a sender over the limit is rejected without affecting others."""
+    controller = AdmissionController(MemoryTokenBuckets(), burst=1, per_minute=1, max_delay=0, max_concurrent=0)
+    before = rejected_counter.value(reason="rate_limited")
+
+    with controller.admit("whatsapp:+911") as admitted:
+        assert admitted
+    with controller.admit("whatsapp:+911") as admitted:
+        assert not admitted
+    with controller.admit("whatsapp:+912") as admitted:
+        assert admitted
+    assert rejected_counter.value(reason="rate_limited") == before + 1
+
+
+def test_concurrency_limit():
+    """Test that jobs beyond the limit wait for a slot, and are rejected, not delayed, when none frees up."""
+    controller = AdmissionController(MemoryTokenBuckets(), per_minute=0, max_concurrent=1, max_wait=0.05)
+    delayed = delayed_counter.value(reason="overloaded")
+    rejected = rejected_counter.value(reason="overloaded")
+    results = []
+
+    with controller.admit("a") as admitted:
+        assert admitted
+        thread = threading.Thread(target=lambda: results.append(controller.admit("b").__enter__()))
+        thread.start()
+        thread.join()
+    assert results == [False]
+
+    # The slot was released, so the next job runs straight away
+    with controller.admit("c") as admitted:
+        assert admitted
+    assert delayed_counter.value(reason="overloaded") == delayed
+    assert rejected_counter.value(reason="overloaded") == rejected + 1
+
+    # A job that gets a slot after waiting is counted as delayed only
+    controller.max_wait = 5
+    with controller.admit("d") as admitted:
+        assert admitted
+        thread = threading.Thread(target=lambda: results.append(controller.admit("e").__enter__()))
+        thread.start()
+        time.sleep(0.05)
+    thread.join()
+    assert results == [False, True]
+    assert delayed_counter.value(reason="overloaded") == delayed + 1
+    assert rejected_counter.value(reason="overloaded") == rejected + 1
@@ -0,0 +1,47 @@
+"""
+Tests for BM25 lexical retrieval and reciprocal-rank fusion.
+"""
+
+import pytest
+from src.data.sample_products import products
+from src.utils.bm25 import BM25Index, reciprocal_rank_fusion, tokenize
+
+@pytest.fixture
+def index():
+    return BM25Index(products)
+
+def test_tokenize_keeps_alphanumeric_tokens():
+    """Test that tokens like 64MP survive tokenisation."""
+    assert tokenize("Phone with 64MP camera!") == ["phone", "with", "64mp", "camera"]
+
+def test_exact_token_query_is_confident(index):
+    """Test that an exact spec token finds the product without dense search."""
+    results = index.search("64MP", limit=5)
+
+    assert index.products[results[0][0]]["id"] == "prod3"
+    assert index.is_confident("64MP", results)
+
+def test_product_name_query_ranks_product_first(index):
+    """Test that a product name ranks that product first."""
+    results = index.search("denim jeans", limit=5)
+
+    assert index.products[results[0][0]]["name"] == "Denim Jeans"
+
+def test_vague_query_is_not_confident(index):
+    """Test that queries with unmatched terms fall back to hybrid search."""
+    query = "something comfortable for my sister"
+    assert not index.is_confident(query, index.search(query))
+
+def test_unknown_terms_return_no_results(index):
+    """Test that a query with no indexed terms returns nothing."""
+    assert index.search("xyzzy") == []
+
+def test_reciprocal_rank_fusion():
+    """Test that items ranked well by both lists come first."""
+    fused = reciprocal_rank_fusion([
+        ["a", "b", "c"],
+        ["b", "d", "a"],
+    ])
+
+    assert fused[:2] == ["b", "a"]
+    assert set(fused) == {"a", "b", "c", "d"}
@@ -0,0 +1,85 @@
+"""
+Tests for the pre-built multilingual canned responses.
+"""
+
+import os
+import threading
+import pytest
+from src.speech_processing.canned_responses import CannedResponseBank, remember_language, remembered_language
+
+MESSAGES = {"error": "Sorry, something went wrong."}
+
+def fake_translate(text, language):
+    return f"[{language}] {text}"
+
+def fake_synthesize(text, language, filename):
+    return f"https://storage.example.com/audio/{filename}"
+
+@pytest.fixture
+def bank(tmp_path):
+    return CannedResponseBank(str(tmp_path / "bank.json"), messages=MESSAGES)
+
+def test_falls_back_to_english_text_without_a_bank(bank):
+    """Test that an empty bank still answers, in English and without audio."""
+    assert bank.get("error", "hi-IN") == {"text": "Sorry, something went wrong.", "voice_url": None}
+
+def test_build_and_lookup(bank, tmp_path):
+    """Test that built entries are persisted and served per language."""
+    calls = []
+    built = bank.build(["en-IN", "hi-IN"], translate=lambda t, l: calls.append(l) or fake_translate(t, l),
+                       synthesize=fake_synthesize)
+
+    assert built == 2
+    assert calls == ["hi-IN"]  # English is synthesised but not translated
+    reply = bank.get("error", "hi-IN")
+    assert reply["text"] == "[hi-IN] Sorry, something went wrong."
+    assert reply["voice_url"].endswith(".ogg") and "error_hi-IN" in reply["voice_url"]
+    # Unbuilt languages get the English entry, with its audio
+    assert bank.get("error", "ta-IN")["voice_url"] == bank.get("error")["voice_url"]
+
+    reloaded = CannedResponseBank(str(tmp_path / "bank.json"), messages=MESSAGES)
+    assert reloaded.get("error", "hi-IN") == reply
+    assert reloaded.build(["en-IN", "hi-IN"], translate=fake_translate, synthesize=fake_synthesize) == 0
+
+def test_edited_messages_and_failures_are_rebuilt(bank, tmp_path):
+    """Test that entries built from outdated text or without audio are rebuilt."""
+    bank.build(["hi-IN"], translate=fake_translate, synthesize=lambda *args: None)
+    assert bank.missing(["hi-IN"]) == [("error", "hi-IN")]
+
+    bank.build(["hi-IN"], translate=fake_translate, synthesize=fake_synthesize)
+    assert bank.missing(["hi-IN"]) == []
+
+    edited = CannedResponseBank(str(tmp_path / "bank.json"), messages={"error": "Sorry, please try again."})
+    assert edited.get("error", "hi-IN") == {"text": "Sorry, please try again.", "voice_url": None}
+    assert edited.missing(["hi-IN"]) == [("error", "hi-IN")]
+
+def test_remembered_language():
+    """Test that the last known language of a sender is kept."""
+    remember_language("whatsapp:+911", "ta-IN")
+    remember_language("whatsapp:+911", "hi-IN")
+    remember_language(None, "te-IN")
+    assert remembered_language("whatsapp:+911") == "hi-IN"
+    assert remembered_language("whatsapp:+912") is None
+
+def test_concurrent_saves_do_not_collide(tmp_path):
+    """Test that workers saving the same bank at once leave one valid file."""
+    path = str(tmp_path / "bank.json")
+    banks = [CannedResponseBank(path, messages=MESSAGES) for _ in range(4)]
+    errors = []
+
+    def build_and_save(bank):
+        try:
+            bank.build(["en-IN", "hi-IN"], translate=fake_translate, synthesize=fake_synthesize)
+            for _ in range(50):
+                bank.save()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=build_and_save, args=(bank,)) for bank in banks]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert os.listdir(tmp_path) == ["bank.json"]
+    assert CannedResponseBank(path, messages=MESSAGES).missing(["en-IN", "hi-IN"]) == []
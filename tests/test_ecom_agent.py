@@ -0,0 +1,154 @@
+"""
+Tests for the agent's language handling.
+"""
+
+import pytest
+from src.agents import ecom_agent
+from src.speech_processing import processor
+
+
+class RecordingQueue:
+    def __init__(self, pending=None):
+        self.user_data = []
+        self.pending = pending or {}
+
+    def enqueue_user_data(self, user_id, key, value):
+        self.user_data.append((user_id, key, value))
+
+    def apply_pending(self, user_id, user_data):
+        return {**user_data, **self.pending}
+
+
+class FakeUserStore:
+    def __init__(self, user_data):
+        self.user_data = user_data
+
+    def get_full_user_data(self, user_id):
+        return dict(self.user_data)
+
+
+@pytest.fixture
+def queue(monkeypatch):
+    queue = RecordingQueue()
+    monkeypatch.setattr(ecom_agent, "get_write_behind_queue", lambda: queue)
+    return queue
+
+
+def test_same_language():
+    """Test which language pairs need no translation."""
+    assert processor.is_english("en-IN") and processor.is_english("EN")
+    assert not processor.is_english(None) and not processor.is_english("bn-IN")
+    assert processor.same_language("en-IN", "en-US")
+    assert processor.same_language("hi-IN", "hi-IN")
+    assert not processor.same_language("en-IN", "hi-IN")
+    assert not processor.same_language(None, None)
+
+
+def test_translate_and_speak_skips_translation_for_english(monkeypatch):
+    """Test that an English reply to an English speaker is only synthesised, punctuation intact."""
+    translations = []
+    monkeypatch.setattr(processor, "translate_text", lambda text, source, target: translations.append(target) or text)
+    monkeypatch.setattr(processor, "text_to_speech", lambda text, language: f"https://audio/{language}.ogg")
+
+    reply = "The shoes cost ₹1,299.00. Want them?"
+    assert processor.translate_and_speak(reply, "en-IN", "en-IN") == (reply, "https://audio/en-IN.ogg")
+    assert translations == []
+
+    processor.translate_and_speak("Hello!", "en-IN", "ta-IN")
+    assert translations == ["ta-IN"]
+
+
+def test_user_info_reaches_the_state(monkeypatch, queue):
+    """Test that the stored language, history and cart are returned as state updates."""
+    queue.pending = {"cart": ["p1"]}
+    monkeypatch.setattr(ecom_agent, "get_user_store", lambda: FakeUserStore({
+        "preferred-language": "kn-IN",
+        "history": [{"role": "user", "content": "hi"}],
+    }))
+
+    update = ecom_agent.get_user_info_node({"user_id": "whatsapp:+911"})
+    assert update == {"user_language": "kn-IN", "history": [{"role": "user", "content": "hi"}], "cart": ["p1"]}
+
+
+def test_speech_to_text_uses_and_stores_the_language(monkeypatch, queue):
+    """Test that the stored language is a hint and only a changed detection is persisted."""
+    hints = []
+    detected = {"language": "hi-IN"}
+
+    def fake_translate_audio(path, language_hint=None):
+        hints.append(language_hint)
+        return "Show me shoes", detected["language"]
+
+    monkeypatch.setattr(ecom_agent, "translate_audio", fake_translate_audio)
+    state = {"user_id": "whatsapp:+911", "regional_audio_path": "/tmp/a.wav", "user_language": "hi-IN"}
+
+    assert ecom_agent.convert_speech_to_text_node(state)["user_language"] == "hi-IN"
+    assert queue.user_data == []
+
+    detected["language"] = "ta-IN"
+    assert ecom_agent.convert_speech_to_text_node(state)["user_language"] == "ta-IN"
+    assert queue.user_data == [("whatsapp:+911", "preferred-language", "ta-IN")]
+
+    # An undetected language keeps the stored preference
+    detected["language"] = None
+    assert ecom_agent.convert_speech_to_text_node(state)["user_language"] == "hi-IN"
+    assert hints == ["hi-IN", "hi-IN", "hi-IN"]
+
+
+def test_text_messages_skip_speech_to_text():
+    """Test that typed messages are routed to the text node."""
+    assert ecom_agent.decide_next_step({"text_query": "shoes"}) == "text_to_english"
+    assert ecom_agent.decide_next_step({"regional_audio_path": "/tmp/a.wav"}) == "speech_to_text"
+
+
+def test_text_is_translated_only_when_not_english(monkeypatch, queue):
+    """Test that English text is used as is and Indic text is translated from its language."""
+    translations = []
+    monkeypatch.setattr(ecom_agent, "translate_text",
+                        lambda text, source, target: translations.append((source, target)) or "I want shoes")
+    state = {"user_id": "whatsapp:+911", "user_language": "en-IN"}
+
+    update = ecom_agent.convert_text_to_english_node({**state, "text_query": " Show me shoes "})
+    assert update == {"english_query": "Show me shoes", "user_language": "en-IN"}
+    assert translations == [] and queue.user_data == []
+
+    update = ecom_agent.convert_text_to_english_node({**state, "text_query": "எனக்கு காலணிகள் வேண்டும்"})
+    assert update == {"english_query": "I want shoes", "user_language": "ta-IN"}
+    assert translations == [("ta-IN", "en-IN")]
+    assert queue.user_data == [("whatsapp:+911", "preferred-language", "ta-IN")]
+
+
+def test_latin_text_keeps_the_stored_language(monkeypatch, queue):
+    """Test that "ok" or a model name from an Indic speaker neither switches nor stores English."""
+    monkeypatch.setattr(ecom_agent, "translate_text", lambda text, source, target: pytest.fail("translated"))
+
+    update = ecom_agent.convert_text_to_english_node(
+        {"user_id": "whatsapp:+911", "user_language": "hi-IN", "text_query": "iPhone 15"}
+    )
+    assert update == {"english_query": "iPhone 15", "user_language": "hi-IN"}
+
+    update = ecom_agent.convert_text_to_english_node({"user_id": "whatsapp:+912", "text_query": "ok"})
+    assert update == {"english_query": "ok", "user_language": "en-IN"}
+    assert queue.user_data == []
+
+
+def test_search_results_come_with_related_products(monkeypatch):
+    """Test that complementary products are looked up for the results and reach the prompt."""
+    class FakeStore:
+        def categories(self):
+            return ["Footwear"]
+
+        def search(self, query, limit=3, filters=None):
+            return [{"id": "prod1", "name": "Running Shoes"}]
+
+        def related_products(self, ids, limit=2):
+            assert ids == ["prod1"]
+            return [{"id": "prod9", "name": "Sports Socks"}][:limit]
+
+    monkeypatch.setattr(ecom_agent, "get_vector_store", lambda: FakeStore())
+    update = ecom_agent.query_vector_db_node({"english_query": "running shoes"})
+    assert update["related_products"] == [{"id": "prod9", "name": "Sports Socks"}]
+
+    prompt = ecom_agent.get_prompt(history=[], products=update["products"], query="running shoes",
+                                   related=update["related_products"])
+    assert "Sports Socks" in prompt and "complementary" in prompt
@@ -0,0 +1,81 @@
+"""
+Tests for the query embedding cache.
+"""
+
+import threading
+import time
+from src.utils.embedding_cache import CachedEmbeddings, normalize_query
+
+class FakeEmbeddings:
+    """Deterministic embedding model that records each request."""
+
+    model = "fake-embedding"
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.requests = []
+
+    def embed_documents(self, texts):
+        self.requests.append(list(texts))
+        time.sleep(self.delay)
+        return [[float(len(text)), float(sum(map(ord, text)) % 97)] for text in texts]
+
+def test_normalize_query():
+    """Test that case and whitespace differences are normalised away."""
+    assert normalize_query("  Running   SHOES\n") == "running shoes"
+
+def test_repeated_queries_hit_memory_cache():
+    """Test that a repeated query doesn't call the embedding model again."""
+    model = FakeEmbeddings()
+    cache = CachedEmbeddings(model, batch_window=0, persist_path=None)
+
+    first = cache.embed_query("running shoes")
+    second = cache.embed_query("Running  Shoes")
+
+    assert first == second
+    assert model.requests == [["running shoes"]]
+
+def test_lru_evicts_oldest_entry():
+    """Test that the least recently used query is evicted first."""
+    model = FakeEmbeddings()
+    cache = CachedEmbeddings(model, max_entries=2, batch_window=0, persist_path=None)
+
+    cache.embed_query("a")
+    cache.embed_query("b")
+    cache.embed_query("a")
+    cache.embed_query("c")
+    cache.embed_query("a")
+    cache.embed_query("b")
+
+    assert model.requests == [["a"], ["b"], ["c"], ["b"]]
+
+def test_persistent_tier_survives_new_instance(tmp_path):
+    """Test that embeddings are reloaded from the persistent tier."""
+    path = str(tmp_path / "embeddings.sqlite3")
+    CachedEmbeddings(FakeEmbeddings(), batch_window=0, persist_path=path).embed_query("jeans")
+
+    model = FakeEmbeddings()
+    vector = CachedEmbeddings(model, batch_window=0, persist_path=path).embed_query("jeans")
+
+    assert vector == [5.0, float(sum(map(ord, "jeans")) % 97)]
+    assert model.requests == []
+
+def test_concurrent_misses_share_one_request():
+    """Test that concurrent misses are embedded in a single request."""
+    model = FakeEmbeddings(delay=0.05)
+    cache = CachedEmbeddings(model, batch_window=0.05, persist_path=None)
+    queries = ["shoes", "jeans", "phone", "shoes"]
+    results = {}
+
+    def search(index, query):
+        results[index] = cache.embed_query(query)
+
+    threads = [threading.Thread(target=search, args=(i, q)) for i, q in enumerate(queries)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(model.requests) == 1
+    assert sorted(model.requests[0]) == ["jeans", "phone", "shoes"]
+    assert results[0] == results[3]
@@ -0,0 +1,45 @@
+"""
+Tests for paginated, precomputed catalog responses.
+"""
+
+import gzip
+import json
+import pytest
+from flask import Flask, request
+from src.data.sample_products import products as sample_products
+from src.utils.http_cache import PrecomputedResponse, parse_fields, select_page
+
+def test_cursor_pages_cover_the_catalog_once():
+    """Test that following next cursors returns every product exactly once."""
+    seen, cursor = [], None
+    while True:
+        page, cursor = select_page(sample_products, cursor=cursor, limit=5)
+        seen.extend(product["id"] for product in page)
+        if cursor is None:
+            break
+
+    assert seen == [product["id"] for product in sample_products]
+
+def test_fields_projection_and_invalid_cursor():
+    """Test that fields= selects product fields and unknown cursors are rejected."""
+    page, _ = select_page(sample_products, limit=2, fields=parse_fields("name, id,,"))
+
+    assert page == [{"id": p["id"], "name": p["name"]} for p in sample_products[:2]]
+    assert parse_fields("") is None
+    with pytest.raises(ValueError):
+        select_page(sample_products, cursor="bm90LWEtcHJvZHVjdA")
+
+def test_precomputed_response_gzip_and_not_modified():
+    """Test that responses are gzipped on request and 304 when the ETag matches."""
+    app = Flask(__name__)
+    precomputed = PrecomputedResponse({"products": sample_products})
+
+    with app.test_request_context(headers={"Accept-Encoding": "gzip"}):
+        response = precomputed.to_response(request)
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert json.loads(gzip.decompress(response.get_data()))["products"] == sample_products
+
+    with app.test_request_context(headers={"If-None-Match": response.headers["ETag"]}):
+        not_modified = precomputed.to_response(request)
+    assert not_modified.status_code == 304
+    assert not_modified.get_data() == b""
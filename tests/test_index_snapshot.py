@@ -0,0 +1,84 @@
+"""
+Tests for read-only index snapshots.
+"""
+
+import json
+import os
+import numpy as np
+import pytest
+from src.utils.index_snapshot import MANIFEST_FILE, load_snapshot, numpy_batches, write_snapshot
+from src.utils.numpy_index import NumpyVectorIndex
+from src.utils.related_products import RELATED_PRODUCTS_FILE, write_related
+
+@pytest.fixture
+def source(tmp_path):
+    vectors = np.random.default_rng(0).standard_normal((50, 8)).astype(np.float32)
+    index = NumpyVectorIndex(str(tmp_path / "source"))
+    index.append(vectors, [{"id": f"prod{i}", "price": f"₹{100 + i}"} for i in range(50)])
+    return str(tmp_path / "source"), vectors
+
+def test_snapshot_round_trip(tmp_path, source):
+    """Test that a snapshot reproduces the source index and records its manifest."""
+    directory, vectors = source
+    snapshot = str(tmp_path / "snapshot")
+    manifest = write_snapshot(snapshot, numpy_batches(directory, batch_size=16), "test-model", quantization="int8")
+
+    index, loaded = load_snapshot(snapshot, embedding_model="test-model", quantization="int8")
+
+    assert loaded == manifest
+    assert manifest["count"] == 50 and manifest["dimension"] == 8
+    assert {"vectors.npy", "metadata.jsonl", "codes.npy", "scales.npy"} <= set(manifest["files"])
+    assert index.metadata[3]["price_value"] == 103.0
+    assert index.search(vectors[7], k=1)[0][0] == 7
+
+def test_related_products_are_covered_by_the_manifest(tmp_path, source):
+    """Test that the related-products table is built into the snapshot and verified on load."""
+    directory, _ = source
+    snapshot = str(tmp_path / "snapshot")
+    manifest = write_snapshot(snapshot, numpy_batches(directory), "test-model", related_per_item=3)
+
+    assert RELATED_PRODUCTS_FILE in manifest["files"]
+    with open(os.path.join(snapshot, RELATED_PRODUCTS_FILE), encoding="utf-8") as f:
+        assert len(json.load(f)["related"]["prod0"]) == 3
+    load_snapshot(snapshot)
+
+    write_related(snapshot, {"prod0": ["prod1"]})
+    with pytest.raises(ValueError, match="Checksum mismatch"):
+        load_snapshot(snapshot)
+
+def test_rebuilding_replaces_the_snapshot(tmp_path, source):
+    """Test that writing a snapshot again swaps it in place without leftovers."""
+    directory, _ = source
+    snapshot = str(tmp_path / "snapshot")
+    write_snapshot(snapshot, numpy_batches(directory), "test-model")
+    write_snapshot(snapshot, numpy_batches(directory), "test-model")
+
+    assert sorted(os.listdir(tmp_path)) == ["snapshot", "source"]
+
+def test_corrupt_or_mismatched_snapshots_are_rejected(tmp_path, source):
+    """Test that checksum, model, quantization and format mismatches fail to load."""
+    directory, _ = source
+    snapshot = str(tmp_path / "snapshot")
+    write_snapshot(snapshot, numpy_batches(directory), "test-model")
+
+    with pytest.raises(ValueError, match="embedded with test-model"):
+        load_snapshot(snapshot, embedding_model="other-model")
+
+    # Quantising on load would write codes into the snapshot
+    with pytest.raises(ValueError, match="no int8 codes"):
+        load_snapshot(snapshot, quantization="int8")
+    assert "codes.npy" not in os.listdir(snapshot)
+
+    with open(os.path.join(snapshot, "metadata.jsonl"), "a", encoding="utf-8") as f:
+        f.write("\n")
+    with pytest.raises(ValueError, match="Checksum mismatch"):
+        load_snapshot(snapshot)
+
+    manifest_path = os.path.join(snapshot, MANIFEST_FILE)
+    with open(manifest_path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    manifest["format_version"] = 99
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    with pytest.raises(ValueError, match="Unsupported snapshot format"):
+        load_snapshot(snapshot, verify=False)
@@ -0,0 +1,225 @@
+"""
+Tests for incremental catalog ingestion.
+"""
+
+import os
+import hashlib
+import threading
+import pytest
+from src.data.sample_products import products as sample_products
+from src.utils.ingestion import CatalogIngestion
+from src.utils.embedding_cache import CachedEmbeddings
+
+class FakeEmbeddings:
+    """Bag-of-words hashing embeddings that count embedded texts."""
+
+    model = "fake-embedding"
+
+    def __init__(self):
+        self.embedded = 0
+
+    def embed_documents(self, texts):
+        self.embedded += len(texts)
+        vectors = []
+        for text in texts:
+            vector = [0.0] * 32
+            for word in text.lower().split():
+                vector[int(hashlib.md5(word.encode()).hexdigest(), 16) % 32] += 1.0
+            vectors.append(vector)
+        return vectors
+
+@pytest.fixture(params=["chroma", "numpy"])
+def store(request, tmp_path, monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    from src.utils.vector_store import VectorStore, NumpyVectorStore
+
+    cls = NumpyVectorStore if request.param == "numpy" else VectorStore
+    store = cls(persist_directory=str(tmp_path / request.param))
+    store.embeddings.embeddings = FakeEmbeddings()
+    assert store.initialize_collection()
+    return store
+
+def test_rerun_skips_unchanged_products(store):
+    """Test that re-ingesting the same catalog embeds nothing."""
+    ingestion = CatalogIngestion(store, embed_batch_size=5, embed_concurrency=2, chunk_size=7)
+
+    first = ingestion.run(sample_products)
+    second = ingestion.run(sample_products)
+
+    assert first["embedded"] == len(sample_products)
+    assert second["embedded"] == 0
+    assert second["unchanged"] == len(sample_products)
+    assert len(store.product_ids()) == len(sample_products)
+
+def test_changes_and_deletions(store):
+    """Test that only changed products are re-embedded and missing ones are deleted."""
+    ingestion = CatalogIngestion(store)
+    ingestion.run(sample_products)
+
+    catalog = [dict(product) for product in sample_products[1:]]
+    catalog[0]["description"] = "Slim fit black denim jeans"
+    catalog[1]["price"] = "₹11999"
+    report = ingestion.run(catalog)
+
+    assert report["embedded"] == 1
+    assert report["metadata_updated"] == 1
+    assert report["deleted"] == 1
+    assert sample_products[0]["id"] not in store.product_ids()
+    stored = {product["id"]: product for product in store.list_products()}
+    assert stored[catalog[1]["id"]]["price"] == "₹11999"
+    assert "content_hash" not in stored[catalog[1]["id"]]
+
+def test_ingested_prices_and_categories_are_filterable(store):
+    """Test that parsed prices and categories can be filtered inside the index."""
+    catalog = [dict(product) for product in sample_products]
+    catalog[3]["category"] = " Footwear "
+    CatalogIngestion(store).run(catalog)
+
+    results = store.search("comfortable shoes", limit=5, filters={"category": "footwear", "max_price": 2000})
+
+    assert [product["id"] for product in results] == ["prod13"]
+    assert results[0]["price_value"] == 1499.0
+    assert store.search("comfortable shoes", limit=5, filters={"max_price": 100}) == []
+
+def test_normalize_stored_metadata(store):
+    """Test that products stored without a numeric price become filterable without re-embedding."""
+    product = sample_products[0]
+    if hasattr(store, "index"):
+        store.index.upsert([[1.0] * 32], [dict(product)])
+    else:
+        # Older Chroma stores keep products under generated document ids
+        store.vector_store._collection.upsert(ids=["5c0e4f1a"], embeddings=[[1.0] * 32], metadatas=[dict(product)])
+    ingestion = CatalogIngestion(store)
+
+    assert ingestion.normalize_stored() == 1
+    assert ingestion.normalize_stored() == 0
+    assert store.product_ids() == [product["id"]]
+    assert store.get_stored_metadata([product["id"]])[product["id"]]["price_value"] == 499.0
+    embedded = store.embeddings.embeddings.embedded
+    assert ingestion.run([product])["unchanged"] == 1
+    assert store.embeddings.embeddings.embedded == embedded
+
+def test_catalog_version_changes_only_on_writes(store):
+    """Test that ingestion bumps the catalog version and a no-op rerun does not."""
+    assert store.catalog_version == "0"
+    ingestion = CatalogIngestion(store)
+    ingestion.run(sample_products)
+    version = store.catalog_version
+
+    ingestion.run(sample_products)
+    assert store.catalog_version == version
+
+    catalog = [dict(product) for product in sample_products]
+    catalog[0]["price"] = "₹1"
+    ingestion.run(catalog)
+    assert store.catalog_version != version
+
+def test_concurrent_catalog_version_bumps(store):
+    """Test that bumps from several threads, as in parallel ingestion batches, don't collide."""
+    errors = []
+
+    def bump():
+        try:
+            for _ in range(200):
+                store.bump_catalog_version()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=bump) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert store.catalog_version != "0"
+    assert os.listdir(store.persist_directory).count("catalog_version") == 1
+    assert not [name for name in os.listdir(store.persist_directory) if name.startswith("catalog_version.")]
+
+def test_warm_up_loads_indexes(store):
+    """Test that warm-up builds the lexical index and works on empty and populated stores."""
+    store.warm_up(query="")
+    CatalogIngestion(store).run(sample_products)
+
+    store.warm_up(query="running shoes")
+
+    assert store.lexical_index is not None
+    assert len(store.lexical_index.products) == len(sample_products)
+
+def test_concurrent_first_calls_create_one_store(monkeypatch):
+    """Test that racing first calls to get_vector_store build a single instance."""
+    import threading
+    import time
+    from src.utils import vector_store as vector_store_module
+
+    created = []
+
+    class SlowStore:
+        def __init__(self, persist_directory):
+            created.append(self)
+            time.sleep(0.05)
+
+        def initialize_collection(self):
+            self.initialized = True
+
+        def warm_up(self):
+            pass
+
+    monkeypatch.setattr(vector_store_module, "vector_store", None)
+    monkeypatch.setattr(vector_store_module, "_warmed_up", threading.Event())
+    monkeypatch.setattr(vector_store_module, "VectorStore", SlowStore)
+    monkeypatch.setattr(vector_store_module, "VECTOR_STORE_BACKEND", "chroma")
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(vector_store_module.get_vector_store()))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(created) == 1
+    assert all(result is created[0] for result in results)
+    assert not vector_store_module.is_vector_store_ready()
+    assert vector_store_module.warm_up_vector_store()
+    assert vector_store_module.is_vector_store_ready()
+
+@pytest.mark.parametrize("search_mode", ["hybrid", "dense"])
+def test_search_many_matches_search(store, search_mode, monkeypatch):
+    """Test that batched searches return the same results as single searches with one embedding request."""
+    CatalogIngestion(store).run(sample_products)
+    store.search_mode = search_mode
+    queries = ["comfortable shoes", "wireless earbuds", "comfortable shoes", "something for my living room"]
+    expected = [store.search(query, limit=3) for query in queries]
+
+    requests = []
+    embeddings = FakeEmbeddings()
+    monkeypatch.setattr(embeddings, "embed_documents",
+                        lambda texts: requests.append(texts) or FakeEmbeddings().embed_documents(texts))
+    store.embeddings = CachedEmbeddings(embeddings)
+
+    assert store.search_many(queries, limit=3) == expected
+    # Confident lexical matches skip embedding; everything else shares one request
+    assert len(requests) == 1 if search_mode == "dense" else len(requests) <= 1
+    assert store.search_many([], limit=3) == []
+
+def test_snapshot_store_serves_ingested_catalog(tmp_path, monkeypatch):
+    """Test that a snapshot of an ingested store serves the same searches and rejects writes."""
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    from src.utils.vector_store import NumpyVectorStore, SnapshotVectorStore
+    from src.utils.index_snapshot import numpy_batches, write_snapshot
+
+    source = NumpyVectorStore(persist_directory=str(tmp_path / "numpy"))
+    source.embeddings.embeddings = FakeEmbeddings()
+    source.initialize_collection()
+    CatalogIngestion(source).run(sample_products)
+    manifest = write_snapshot(str(tmp_path / "snapshot"), numpy_batches(source.index.directory), "fake-embedding")
+
+    store = SnapshotVectorStore(persist_directory=str(tmp_path / "snapshot"))
+    store.embeddings = CachedEmbeddings(FakeEmbeddings())
+    assert store.initialize_collection()
+
+    query = "comfortable shoes under 2000"
+    assert store.search(query, limit=3) == source.search(query, limit=3)
+    assert store.catalog_version == manifest["checksum"]
+    with pytest.raises(RuntimeError):
+        store.delete_products([sample_products[0]["id"]])
@@ -0,0 +1,24 @@
+"""
+Tests for script-based language detection of typed messages.
+"""
+
+from src.speech_processing.language_detection import detect_language, detect_script
+
+def test_detect_script():
+    """Test that the majority script wins, ignoring digits and punctuation."""
+    assert detect_script("Show me shoes under 3000!") == "Latin"
+    assert detect_script("மொபைல் phone காட்டு") == "Tamil"
+    assert detect_script("1234 ?!") is None
+
+def test_detect_language():
+    """Test language codes per script, and that Latin text is English."""
+    assert detect_language("I want a cotton t-shirt") == "en-IN"
+    assert detect_language("মাকে উপহার দিতে চাই") == "bn-IN"
+    assert detect_language("ಕಪ್ಪು ಜೀನ್ಸ್ ಬೇಕು") == "kn-IN"
+    assert detect_language("मुझे जूते चाहिए") == "hi-IN"
+
+def test_ambiguous_script_keeps_stored_language():
+    """Test that Devanagari text from a Marathi speaker stays Marathi."""
+    assert detect_language("मला बूट हवे आहेत", preferred_language="mr-IN") == "mr-IN"
+    assert detect_language("मला बूट हवे आहेत", preferred_language="ta-IN") == "hi-IN"
+    assert detect_language("👍", preferred_language="ta-IN") == "ta-IN"
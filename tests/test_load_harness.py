@@ -0,0 +1,79 @@
+"""
+Tests for the offline load-test harness.
+"""
+
+import os
+import pytest
+from flask import Flask
+from src.utils.load_harness import ServiceProfile, build_profiles, fake_services, run_load_test, summarize
+
+@pytest.fixture
+def app():
+    from src.whatsapp.webhook import configure_whatsapp_routes
+
+    app = Flask(__name__)
+    configure_whatsapp_routes(app)
+    return app
+
+def test_service_profile_parse():
+    """Test parsing median, sigma and error rate overrides."""
+    profile = ServiceProfile.parse("900:0.5:0.02")
+    assert (profile.median_ms, profile.sigma, profile.error_rate) == (900.0, 0.5, 0.02)
+
+    with pytest.raises(ValueError):
+        build_profiles({"sarvam.unknown": "10"})
+
+def test_load_test_reports_every_stage(app):
+    """Test that the voice pipeline runs end to end against the fakes."""
+    profiles = build_profiles(latency_scale=0, seed=1)
+    with fake_services(profiles, seed=1) as fakes:
+        result = run_load_test(app, rps=100, requests=10, users=3)
+        # Every request removed its downloaded audio
+        assert os.listdir(fakes.audio_spool.directory) == []
+
+    summary = summarize(result)
+    assert summary["request"]["count"] == 10
+    assert summary["request"]["errors"] == 0
+    for stage in ("webhook", "get_user_info", "speech_to_text", "query_vector_db", "call_llm",
+                  "generate_response", "sarvam.chat_completion", "twilio.download_media"):
+        assert summary[stage]["count"] == 10
+    assert summary["request"]["p50_ms"] <= summary["request"]["p99_ms"]
+    assert fakes.twilio.sent >= 10
+    # Conversations were written through the write-behind queue to the fake store
+    assert len(fakes.user_store.users) == 3
+
+def test_injected_failures_reach_the_fallback_reply(app):
+    """Test that failing media downloads are counted as failed requests."""
+    profiles = build_profiles({"twilio.media": "0:0:1"}, seed=1)
+    with fake_services(profiles):
+        result = run_load_test(app, rps=100, requests=5)
+
+    assert result["errors"]["request"] == 5
+    assert "speech_to_text" not in result["stages"]
+
+def test_senders_over_their_rate_limit_get_a_try_later_reply(app, monkeypatch):
+    """Test that admission control turns senders away before any service is called."""
+    import src.utils.admission as admission
+
+    profiles = build_profiles(latency_scale=0, seed=1)
+    with fake_services(profiles, seed=1) as fakes:
+        monkeypatch.setattr(admission, "admission_controller", admission.AdmissionController(
+            admission.MemoryTokenBuckets(), burst=2, per_minute=1, max_delay=0,
+        ))
+        result = run_load_test(app, rps=100, requests=6, users=1)
+
+    assert len(result["stages"]["rejected"]) == 4
+    assert len(result["stages"]["speech_to_text"]) == 2
+    assert fakes.twilio.sent == 4
+
+def test_text_messages_skip_speech_and_voice_replies(app):
+    """Test that typed messages run the graph without STT or TTS."""
+    profiles = build_profiles(latency_scale=0, seed=1)
+    with fake_services(profiles, seed=1):
+        result = run_load_test(app, rps=100, requests=4, users=4, text_share=1.0)
+
+    assert len(result["stages"]["text_to_english"]) == 4
+    assert len(result["stages"]["call_llm"]) == 4
+    assert "speech_to_text" not in result["stages"]
+    assert "sarvam.text_to_speech" not in result["stages"]
+    assert result["errors"].get("request", 0) == 0
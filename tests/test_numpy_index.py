@@ -0,0 +1,94 @@
+"""
+Tests for the NumPy exact-search index.
+"""
+
+import os
+import numpy as np
+import pytest
+from src.utils.numpy_index import NumpyVectorIndex, top_k
+
+@pytest.fixture
+def vectors():
+    return np.random.default_rng(0).standard_normal((200, 16)).astype(np.float32)
+
+def test_top_k_is_sorted_best_first():
+    """Test that top_k returns the best scores in descending order."""
+    indices, scores = top_k(np.array([[0.1, 0.9, 0.5, 0.7]]), 3)
+
+    assert indices.tolist() == [[1, 3, 2]]
+    assert scores.tolist() == [[0.9, 0.7, 0.5]]
+
+def test_search_finds_exact_match(tmp_path, vectors):
+    """Test that a stored vector is its own nearest neighbour."""
+    index = NumpyVectorIndex(str(tmp_path)).load()
+    index.append(vectors, [{"id": f"prod{i}"} for i in range(len(vectors))])
+
+    results = index.search(vectors[42], k=5)
+
+    assert results[0][0] == 42
+    assert results[0][1] == pytest.approx(1.0, abs=1e-5)
+    assert len(results) == 5
+
+def test_append_grows_file_in_place(tmp_path, vectors):
+    """Test that appends extend the .npy file and survive reloading."""
+    index = NumpyVectorIndex(str(tmp_path)).load()
+    index.append(vectors[:150], [{"id": f"prod{i}"} for i in range(150)])
+    index.append(vectors[150:], [{"id": f"prod{i}"} for i in range(150, 200)])
+
+    reloaded = NumpyVectorIndex(str(tmp_path)).load()
+
+    assert reloaded.vectors.shape == (200, 16)
+    assert reloaded.metadata[199] == {"id": "prod199"}
+    assert reloaded.search(vectors[180], k=1)[0][0] == 180
+    header_size = os.path.getsize(reloaded.vectors_path) - 200 * 16 * 4
+    assert header_size in (128, 192)
+
+def test_search_batch_matches_single_queries(tmp_path, vectors):
+    """Test that batched queries return the same results as single queries."""
+    index = NumpyVectorIndex(str(tmp_path)).load()
+    index.append(vectors, [{"id": f"prod{i}"} for i in range(len(vectors))])
+
+    batch = index.search_batch(vectors[:10], k=3)
+
+    assert [[i for i, _ in hits] for hits in batch] == [
+        [i for i, _ in index.search(vectors[q], k=3)] for q in range(10)
+    ]
+
+def test_empty_index_returns_no_results(tmp_path, vectors):
+    """Test that searching an empty index returns nothing."""
+    index = NumpyVectorIndex(str(tmp_path)).load()
+
+    assert index.search(vectors[0], k=3) == []
+
+def test_int8_search_matches_exact_search(tmp_path, vectors):
+    """Test that int8 search with rescoring returns the exact top results and scores."""
+    metadatas = [{"id": f"prod{i}"} for i in range(len(vectors))]
+    exact = NumpyVectorIndex(str(tmp_path / "exact")).load()
+    exact.append(vectors, metadatas)
+    quantized = NumpyVectorIndex(str(tmp_path / "int8"), quantization="int8").load()
+    quantized.append(vectors, metadatas)
+    queries = np.random.default_rng(1).standard_normal((20, 16)).astype(np.float32)
+    mask = np.arange(len(vectors)) % 3 == 0
+
+    for row_mask in (None, mask):
+        expected_batch = exact.search_batch(queries, k=5, mask=row_mask)
+        actual_batch = quantized.search_batch(queries, k=5, mask=row_mask)
+        for expected, actual in zip(expected_batch, actual_batch):
+            assert [i for i, _ in actual] == [i for i, _ in expected]
+            assert [score for _, score in actual] == pytest.approx([score for _, score in expected], abs=1e-5)
+
+def test_int8_codes_are_rebuilt_after_writes(tmp_path, vectors):
+    """Test that codes are persisted, reused on load and rebuilt after vectors change."""
+    index = NumpyVectorIndex(str(tmp_path), quantization="int8").load()
+    index.append(vectors[:100], [{"id": f"prod{i}"} for i in range(100)])
+    index.search(vectors[0], k=1)
+    assert os.path.exists(index.codes_path)
+
+    index.upsert([vectors[150]], [{"id": "prod7"}])
+    assert not os.path.exists(index.codes_path)
+    assert index.search(vectors[150], k=1)[0][0] == 7
+
+    reloaded = NumpyVectorIndex(str(tmp_path), quantization="int8").load()
+    codes, _ = reloaded.quantized()
+    assert codes.dtype == np.int8 and codes.shape == (100, 16)
+    assert reloaded.search(vectors[150], k=1)[0][0] == 7
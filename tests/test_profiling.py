@@ -0,0 +1,75 @@
+"""
+Tests for on-demand profiling of webhook jobs.
+"""
+
+import os
+import time
+import pstats
+import pytest
+from src.utils.profiling import JobProfiler
+
+def busy_loop(seconds):
+    end = time.perf_counter() + seconds
+    total = 0
+    while time.perf_counter() < end:
+        total += sum(range(100))
+    return total
+
+@pytest.fixture
+def profiler(tmp_path):
+    return JobProfiler(directory=str(tmp_path), token="secret", min_interval=0, max_jobs=3,
+                       max_files=2, sample_interval=0.001)
+
+def test_armed_jobs_write_folded_stacks(profiler):
+    """Test that armed jobs are sampled into folded stacks and the arm runs out."""
+    assert profiler.arm(100) == 3
+
+    with profiler.profile("SM1") as path:
+        busy_loop(0.1)
+
+    with open(path) as f:
+        lines = f.read().splitlines()
+    assert any("busy_loop (test_profiling.py" in line for line in lines)
+    stack, count = lines[0].rsplit(" ", 1)
+    assert int(count) > 0 and ";" in stack
+    assert profiler.status()["remaining"] == 2
+
+def test_unarmed_jobs_are_not_profiled(profiler):
+    """Test that jobs run unprofiled unless armed or requested with the token."""
+    with profiler.profile("SM1") as path:
+        pass
+    assert path is None
+
+    assert not profiler.authorized("wrong")
+    assert profiler.authorized("secret")
+    with profiler.profile("SM2", requested=True) as path:
+        pass
+    assert path is not None and os.path.exists(path)
+
+def test_rate_limits(profiler):
+    """Test that profiled jobs are spaced out and never overlap."""
+    profiler.min_interval = 60
+    profiler.arm(3)
+
+    with profiler.profile("SM1") as first:
+        with profiler.profile("SM2") as nested:
+            pass
+    with profiler.profile("SM3") as later:
+        pass
+
+    assert first is not None
+    assert nested is None and later is None
+    assert profiler.status()["remaining"] == 2
+
+def test_cprofile_fallback_and_pruning(profiler):
+    """Test the cProfile fallback and that only the newest profiles are kept."""
+    profiler.mode = "cprofile"
+    paths = []
+    for sid in ("SMc", "SMb", "SMa"):
+        with profiler.profile(sid, requested=True) as path:
+            busy_loop(0.01)
+        paths.append(path)
+
+    assert paths[0].endswith(".prof")
+    assert "busy_loop" in str(pstats.Stats(paths[-1]).stats)
+    assert sorted(os.path.basename(p) for p in paths[1:]) == profiler.list_profiles()
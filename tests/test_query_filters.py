@@ -0,0 +1,56 @@
+"""
+Tests for catalog normalisation and query constraint extraction.
+"""
+
+import pytest
+from src.agents.query_filters import extract_filters
+from src.data.catalog import parse_price, prepare_product, matches_filters, normalize_filters
+
+CATEGORIES = ["apparel", "electronics", "footwear", "accessories", "furniture"]
+
+@pytest.mark.parametrize("price,expected", [
+    ("₹1299", 1299.0),
+    ("Rs. 1,299.50", 1299.5),
+    (499, 499.0),
+    ("free", None),
+])
+def test_parse_price(price, expected):
+    """Test that display prices are parsed into numbers."""
+    assert parse_price(price) == expected
+
+def test_prepare_product_normalises_fields():
+    """Test that products get a numeric price and a normalised category."""
+    product = prepare_product({"id": "p1", "price": "₹2,499", "category": "Home_Decor "})
+
+    assert product["price_value"] == 2499.0
+    assert product["category"] == "home decor"
+
+@pytest.mark.parametrize("query,expected", [
+    ("Show me running shoes under 2000 rupees", {"category": ["footwear"], "max_price": 2000.0}),
+    ("I want a phone between 10k and 15,000", {"category": ["electronics"], "min_price": 10000.0, "max_price": 15000.0}),
+    ("something above ₹1000 for my office", {"min_price": 1000.0}),
+    ("shoes and shirts under 1500", {"max_price": 1500.0}),
+    ("shoes under 2000", {"category": ["footwear"], "max_price": 2000.0}),
+    ("phones between 10000 and 20000", {"category": ["electronics"], "min_price": 10000.0, "max_price": 20000.0}),
+    ("shoes I can get within 2 days", {"category": ["footwear"]}),
+    ("within 2 days budget 3000 shoes", {"category": ["footwear"], "max_price": 3000.0}),
+    ("a phone with over 8 GB RAM under 20000", {"category": ["electronics"], "max_price": 20000.0}),
+    ("a desk under 2 km from me, over 5 kg", {"category": ["furniture"]}),
+    ("a backpack between 20 and 30 litres", {"category": ["accessories"]}),
+    ("what do you recommend", {}),
+])
+def test_extract_filters(query, expected):
+    """Test that price ranges and unambiguous categories are extracted."""
+    assert extract_filters(query, CATEGORIES) == expected
+
+def test_categories_not_in_catalog_are_ignored():
+    """Test that a category is only used when the catalog has it."""
+    assert extract_filters("shoes under 500", ["apparel"]) == {"max_price": 500.0}
+
+def test_matches_filters():
+    """Test that products without a price never match a price filter."""
+    filters = normalize_filters({"category": "Footwear", "max_price": 2000})
+
+    assert matches_filters({"category": "footwear", "price_value": 1499.0}, filters)
+    assert not matches_filters({"category": "footwear", "price_value": 2499.0}, filters)
+    assert not matches_filters({"category": "footwear"}, filters)
@@ -0,0 +1,72 @@
+"""
+Tests for the precomputed related-products table.
+"""
+
+import os
+import numpy as np
+from src.utils.related_products import RelatedProducts, compute_related, write_related
+from src.utils.load_harness import build_profiles, build_vector_store
+
+def random_catalog(count, dimension=16, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(count, dimension)).astype(np.float32)
+    ids = [f"p{i}" for i in range(count)]
+    categories = [["shoes", "socks", "bags", None][i % 4] for i in range(count)]
+    return vectors, ids, categories
+
+def brute_force(vectors, ids, categories, k):
+    normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    scores = normalized @ normalized.T
+    related = {}
+    for i, product_id in enumerate(ids):
+        candidates = [j for j in np.argsort(-scores[i], kind="stable")
+                      if j != i and (categories[i] is None or categories[j] != categories[i])]
+        related[product_id] = [ids[j] for j in candidates[:k]]
+    return related
+
+def test_chunked_computation_matches_brute_force():
+    """Test that chunking changes nothing and same-category products are skipped."""
+    vectors, ids, categories = random_catalog(50)
+    expected = brute_force(vectors, ids, categories, k=4)
+    # 3 rows of scores per chunk
+    assert compute_related(vectors, ids, categories, k=4, chunk_bytes=3 * 4 * len(ids)) == expected
+    assert compute_related(vectors, ids, categories, k=4) == expected
+
+    for product_id, related in compute_related(vectors, ids, categories, k=4).items():
+        category = categories[ids.index(product_id)]
+        assert product_id not in related
+        assert category is None or all(categories[ids.index(other)] != category for other in related)
+
+def test_same_category_neighbours_when_categories_are_not_given():
+    """Test that without categories, the nearest products are related whatever their category."""
+    vectors = np.array([[1, 0], [0.9, 0.1], [0, 1]], dtype=np.float32)
+    assert compute_related(vectors, ["a", "b", "c"], k=1) == {"a": ["b"], "b": ["a"], "c": ["b"]}
+    assert compute_related(np.empty((0, 2)), [], k=1) == {}
+
+def test_lookup_across_results(tmp_path):
+    """Test that every result contributes, results themselves are excluded and rewrites are picked up."""
+    write_related(str(tmp_path), {"a": ["b", "x", "y"], "b": ["a", "z"]}, k=3)
+    table = RelatedProducts(str(tmp_path))
+    assert table.get("a") == ["b", "x", "y"]
+    assert table.get("missing") == []
+    assert table.for_results(["a", "b"], limit=2) == ["x", "z"]
+    assert table.for_results(["a", "b"], limit=5) == ["x", "z", "y"]
+
+    write_related(str(tmp_path), {"a": ["q"]})
+    os.utime(table.path, ns=(0, 1))
+    assert table.for_results(["a"], limit=2) == ["q"]
+
+def test_vector_store_attaches_related_products(tmp_path):
+    """Test that the NumPy store reads the table next to its index."""
+    store = build_vector_store(str(tmp_path), build_profiles(latency_scale=0)["openai.embeddings"])
+    assert store.related_products(["prod1"]) == []
+
+    ids = [metadata["id"] for metadata in store.index.metadata]
+    categories = [metadata.get("category") for metadata in store.index.metadata]
+    write_related(store.index_directory, compute_related(store.index.vectors, ids, categories, k=3))
+    store.related = None
+
+    related = store.related_products(["prod1"], limit=2)
+    assert len(related) == 2
+    category = store.get_stored_metadata(["prod1"])["prod1"]["category"]
+    assert all(product["category"] != category and "content_hash" not in product for product in related)
@@ -0,0 +1,89 @@
+"""
+Tests for the versioned search result cache.
+"""
+
+import threading
+import time
+import pytest
+from src.utils.result_cache import VersionedResultCache
+
+def test_hit_and_version_invalidation():
+    """Test that results are reused until the catalog version changes."""
+    cache = VersionedResultCache(max_entries=10, ttl=60)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return ["result"]
+
+    assert cache.get_or_compute("q", "v1", compute) == ["result"]
+    assert cache.get_or_compute("q", "v1", compute) == ["result"]
+    assert len(calls) == 1
+
+    cache.get_or_compute("q", "v2", compute)
+    assert len(calls) == 2
+    assert len(cache) == 1
+
+def test_lru_and_ttl_eviction():
+    """Test that the least recently used and expired entries are evicted."""
+    cache = VersionedResultCache(max_entries=2, ttl=0.05)
+    cache.get_or_compute("a", 1, lambda: "a")
+    cache.get_or_compute("b", 1, lambda: "b")
+    cache.get_or_compute("a", 1, lambda: "stale")
+    cache.get_or_compute("c", 1, lambda: "c")
+
+    assert cache.get_or_compute("a", 1, lambda: "new") == "a"
+    assert cache.get_or_compute("b", 1, lambda: "new") == "new"
+
+    time.sleep(0.06)
+    assert cache.get_or_compute("a", 1, lambda: "fresh") == "fresh"
+
+def test_empty_results_and_errors_are_not_cached():
+    """Test that should_cache and exceptions keep results out of the cache."""
+    cache = VersionedResultCache()
+    cache.get_or_compute("q", 1, lambda: [], should_cache=bool)
+
+    def fail():
+        raise RuntimeError("search failed")
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_compute("e", 1, fail)
+    assert len(cache) == 0
+
+def test_concurrent_misses_share_one_computation():
+    """Test that simultaneous requests for a key run compute once."""
+    cache = VersionedResultCache()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "value"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(cache.get_or_compute("q", 1, compute)))
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(cache.get_or_compute("q", 1, compute)))
+                 for _ in range(4)]
+    for thread in followers:
+        thread.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in [leader] + followers:
+        thread.join()
+
+    assert results == ["value"] * 5
+    assert len(calls) == 1
+
+def test_get_and_put_follow_the_version():
+    """Test that put results are returned by get for the same version only."""
+    cache = VersionedResultCache()
+    assert cache.get("q", 1) is None
+    cache.put("q", 1, ["result"])
+
+    assert cache.get("q", 1) == ["result"]
+    assert cache.get("q", 2, default=[]) == []
@@ -0,0 +1,76 @@
+"""
+Tests for the production serving configuration and graceful shutdown.
+"""
+
+import os
+import threading
+import time
+import importlib.util
+import pytest
+
+@pytest.fixture
+def gunicorn_conf(monkeypatch):
+    # The config sets defaults for the app in the environment; keep them out of other tests
+    monkeypatch.setattr(os, "environ", dict(os.environ))
+    monkeypatch.setenv("GUNICORN_WORKERS", "3")
+    path = os.path.join(os.path.dirname(__file__), "..", "gunicorn.conf.py")
+    spec = importlib.util.spec_from_file_location("gunicorn_conf", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def test_worker_and_thread_counts(gunicorn_conf):
+    """Test that threads follow the I/O wait ratio and settings can be overridden."""
+    assert gunicorn_conf.threads_per_worker(0.0) == 1
+    assert gunicorn_conf.threads_per_worker(0.5) == 2
+    assert gunicorn_conf.threads_per_worker(0.9) == 10
+    assert gunicorn_conf.threads_per_worker(1.0) == 32
+    assert gunicorn_conf.available_cpus() >= 1
+    assert gunicorn_conf.workers == 3
+    assert gunicorn_conf.worker_class == "gthread"
+
+def test_concurrency_cap_is_below_the_thread_count(gunicorn_conf):
+    """Test that admission control caps jobs below the threads a worker has."""
+    assert int(os.environ["MAX_CONCURRENT_JOBS"]) == max(1, gunicorn_conf.threads - 2)
+
+def test_wait_for_in_flight():
+    """Test that shutdown waits for webhook jobs in progress."""
+    from src.whatsapp import webhook
+
+    webhook._track_in_flight(1)
+    finisher = threading.Timer(0.1, webhook._track_in_flight, args=(-1,))
+    finisher.start()
+
+    assert not webhook.wait_for_in_flight(timeout=0.01)
+    start = time.monotonic()
+    assert webhook.wait_for_in_flight(timeout=5)
+    assert time.monotonic() - start < 1
+    assert webhook.in_flight_gauge.value() == 0
+
+def test_worker_exit_keeps_within_graceful_timeout(gunicorn_conf, monkeypatch):
+    """Test that draining and flushing on exit share the graceful timeout counted from SIGTERM."""
+    from src.whatsapp import webhook
+    from src.db import write_behind
+
+    flushes = []
+
+    class FakeQueue:
+        def shutdown(self, timeout):
+            flushes.append(timeout)
+
+    class FakeWorker:
+        pid = 1
+        # SIGTERM arrived graceful_timeout - 3 seconds ago; 3 seconds are left
+        shutdown_started = time.monotonic() - gunicorn_conf.graceful_timeout + 3
+
+    monkeypatch.setattr(gunicorn_conf, "SHUTDOWN_FLUSH_SECONDS", 2.5)
+    monkeypatch.setattr(write_behind, "write_behind_queue", FakeQueue())
+    webhook._track_in_flight(1)
+    try:
+        start = time.monotonic()
+        gunicorn_conf.worker_exit(None, FakeWorker())
+        # In-flight jobs got what was left before the flush's share, not another graceful_timeout
+        assert time.monotonic() - start < 1.5
+    finally:
+        webhook._track_in_flight(-1)
+    assert len(flushes) == 1 and 1.5 < flushes[0] <= 2.5
@@ -0,0 +1,62 @@
+"""
+Tests for the bounded audio spool.
+"""
+
+import os
+import time
+import pytest
+from src.utils.spool import Spool, spool_evictions_counter
+
+def write(path, size, age=0):
+    with open(path, "wb") as f:
+        f.write(b"\0" * size)
+    mtime = time.time() - age
+    os.utime(path, (mtime, mtime))
+    return path
+
+@pytest.fixture
+def spool(tmp_path):
+    return Spool(str(tmp_path / "spool"), max_bytes=1000, max_age=3600, min_age=60, name="test")
+
+def test_scope_is_removed_however_the_request_ends(spool):
+    """Test that a request's files are deleted on success and on error."""
+    with spool.scope() as directory:
+        path = write(os.path.join(directory, "voice.wav"), 10)
+        assert os.path.exists(path)
+    assert not os.path.exists(directory)
+
+    with pytest.raises(RuntimeError):
+        with spool.scope() as directory:
+            write(os.path.join(directory, "voice.ogg"), 10)
+            raise RuntimeError("STT failed")
+    assert os.listdir(spool.directory) == []
+
+def test_collect_enforces_age_and_size(spool):
+    """Test that old entries go first, then the oldest until the spool fits."""
+    os.makedirs(spool.directory)
+    expired = write(os.path.join(spool.directory, "expired.wav"), 100, age=7200)
+    oldest = write(os.path.join(spool.directory, "oldest.wav"), 600, age=600)
+    older = write(os.path.join(spool.directory, "older.wav"), 600, age=300)
+    recent = write(os.path.join(spool.directory, "recent.wav"), 600, age=10)
+    by_size = spool_evictions_counter.value(spool="test", reason="size")
+
+    assert spool.collect() == 3
+    assert not any(os.path.exists(path) for path in (expired, oldest, older))
+    # Entries younger than min_age may belong to a request in another worker
+    assert os.path.exists(recent)
+    assert spool_evictions_counter.value(spool="test", reason="size") == by_size + 2
+
+def test_collect_skips_scopes_in_use(spool):
+    """Test that an old scope is kept while its request is still running."""
+    with spool.scope() as directory:
+        write(os.path.join(directory, "voice.wav"), 5000)
+        os.utime(directory, (time.time() - 7200,) * 2)
+        assert spool.collect() == 0
+        assert os.path.exists(directory)
+
+def test_keep_copies_into_the_spool(spool, tmp_path):
+    """Test that debug captures are copied and later collected."""
+    source = write(str(tmp_path / "capture.wav"), 10)
+    path = spool.keep(source, "audio_original_1.wav")
+    assert os.path.exists(path)
+    assert spool.collect(now=time.time() + 7200) == 1
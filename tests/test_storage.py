@@ -0,0 +1,81 @@
+"""
+Contract tests shared by every user data storage backend.
+
+The Firestore backend only runs against the emulator (FIRESTORE_EMULATOR_HOST).
+"""
+
+import os
+import uuid
+import pytest
+from src.db.sqlite_store import SQLiteClient
+
+BACKENDS = ["sqlite", "firestore"]
+
+@pytest.fixture(params=BACKENDS)
+def store(request, tmp_path):
+    if request.param == "sqlite":
+        yield SQLiteClient(str(tmp_path / "users.sqlite3"))
+        return
+
+    if not os.environ.get("FIRESTORE_EMULATOR_HOST"):
+        pytest.skip("FIRESTORE_EMULATOR_HOST is not set")
+    from src.db.firestore import FirestoreClient
+    yield FirestoreClient(
+        database=os.environ.get("DB_NAME", "(default)"),
+        collection_name=f"contract-tests-{uuid.uuid4().hex[:8]}",
+    )
+
+@pytest.fixture
+def user_id(store):
+    user_id = f"whatsapp:+91{uuid.uuid4().int % 10**10:010d}"
+    yield user_id
+    store.delete_user(user_id)
+
+def test_unknown_user_returns_empty_dict(store, user_id):
+    """Test that a user without data loads as an empty dict."""
+    assert store.get_full_user_data(user_id) == {}
+
+def test_save_conversation_appends_history(store, user_id):
+    """Test that conversation exchanges are appended in order."""
+    store.save_conversation(user_id, [{"role": "user", "content": "hi"}])
+    store.save_conversation(user_id, [
+        {"role": "user", "content": "hi"},
+        {"role": "assistant", "content": "नमस्ते"},
+    ])
+
+    history = store.get_full_user_data(user_id)["history"]
+    assert [m["content"] for m in history] == ["hi", "hi", "नमस्ते"]
+
+def test_save_user_data_keeps_other_fields(store, user_id):
+    """Test that user data and history don't overwrite each other."""
+    store.save_user_data(user_id, "preferred-language", "ta-IN")
+    store.save_conversation(user_id, [{"role": "user", "content": "hello"}])
+    store.save_user_data(user_id, "cart", ["prod1", "prod3"])
+
+    user_data = store.get_full_user_data(user_id)
+    assert user_data["preferred-language"] == "ta-IN"
+    assert user_data["cart"] == ["prod1", "prod3"]
+    assert user_data["history"] == [{"role": "user", "content": "hello"}]
+
+def test_apply_writes_batches_many_users(store, user_id):
+    """Test that a batch of writes across users is applied in order."""
+    other_user_id = user_id + "-other"
+    store.apply_writes([
+        (user_id, "conversation", [{"role": "user", "content": "1"}]),
+        (other_user_id, "user_data", ("preferred-language", "hi-IN")),
+        (user_id, "conversation", [{"role": "user", "content": "2"}]),
+        (user_id, "user_data", ("preferred-language", "kn-IN")),
+    ])
+
+    user_data = store.get_full_user_data(user_id)
+    assert [m["content"] for m in user_data["history"]] == ["1", "2"]
+    assert user_data["preferred-language"] == "kn-IN"
+    assert store.get_full_user_data(other_user_id) == {"preferred-language": "hi-IN"}
+    store.delete_user(other_user_id)
+
+def test_delete_user(store, user_id):
+    """Test that deleting a user removes all their data."""
+    store.save_user_data(user_id, "cart", ["prod1"])
+    store.delete_user(user_id)
+
+    assert store.get_full_user_data(user_id) == {}
@@ -0,0 +1,47 @@
+"""
+Tests for request tracing and the Prometheus export.
+"""
+
+import logging
+import pytest
+from src.utils import metrics
+from src.utils.tracing import current_request_id, request_context, span, span_errors_counter, span_histogram, traced
+
+def test_spans_are_collected_per_request(caplog):
+    """Test that nested spans carry their parent and are logged with the request id."""
+    @traced("outer", "node")
+    def outer():
+        assert current_request_id() == "SM123"
+        with span("inner", "sarvam") as record:
+            assert record["parent"] == "outer"
+
+    caplog.set_level(logging.INFO, logger="src.utils.tracing")
+    with request_context("SM123"):
+        outer()
+
+    assert current_request_id() is None
+    trace_lines = [r.getMessage() for r in caplog.records if "trace request_id=SM123" in r.getMessage()]
+    assert len(trace_lines) == 1
+    assert "inner=" in trace_lines[0] and "outer=" in trace_lines[0]
+    assert span_histogram.count(name="inner", kind="sarvam") >= 1
+
+def test_failed_spans_are_counted_and_reraised():
+    """Test that an exception inside a span increments the error counter."""
+    before = span_errors_counter.value(name="failing", kind="gcs")
+
+    with pytest.raises(RuntimeError):
+        with span("failing", "gcs"):
+            raise RuntimeError("upload failed")
+
+    assert span_errors_counter.value(name="failing", kind="gcs") == before + 1
+
+def test_render_prometheus():
+    """Test the text exposition format for labelled samples."""
+    metrics.counter("test_render_total", "A test counter").inc(2, path='a"b')
+    metrics.gauge("test_render_depth").set(3)
+
+    text = metrics.render_prometheus()
+
+    assert "# HELP test_render_total A test counter\n# TYPE test_render_total counter\n" in text
+    assert 'test_render_total{path="a\\"b"} 2.0\n' in text
+    assert "test_render_depth 3.0\n" in text
@@ -6,6 +6,7 @@ import pytest
 import json
 from app import initialize_app
 from unittest.mock import patch, MagicMock
+from twilio.twiml.messaging_response import MessagingResponse
 
 @pytest.fixture
 def client():
@@ -16,12 +17,10 @@ def client():
         yield client
 
 def test_webhook_receives_text_message(client):
-    """Test that webhook properly handles a text message."""
-    
-    with patch('src.whatsapp.webhook.MessagingResponse') as mock_resp:
-        mock_msg = MagicMock()
-        mock_resp.return_value = mock_msg
-        
+    """Test that a typed message is answered by the agent, without speech to text."""
+    from src.whatsapp.webhook import TEXT_REPLY_VOICE
+
+    with patch('src.whatsapp.webhook.run_agent') as mock_run_agent:
         response = client.post('/webhook', data={
             'Body': 'Hello',
             'From': 'whatsapp:+1234567890',
@@ -32,10 +31,11 @@ def test_webhook_receives_text_message(client):
         # Check that we got a successful response
         assert response.status_code == 200
         
-        # Check that the response message contains the expected text
-        mock_msg.message.assert_called_once()
-        call_args = mock_msg.message.call_args[0][0]
-        assert "Please send a voice message" in call_args
+        # Check that the agent got the text, and the reply is sent by the agent rather than in the TwiML
+        mock_run_agent.assert_called_once_with(
+            'whatsapp:+1234567890', {"text_query": "Hello", "reply_with_voice": TEXT_REPLY_VOICE}
+        )
+        assert response.get_data(as_text=True) == str(MessagingResponse())
 
 def test_webhook_receives_voice_message(client):
     """Test that webhook properly handles a voice message."""
@@ -0,0 +1,115 @@
+"""
+Tests for the write-behind persistence queue.
+"""
+
+import time
+import pytest
+from src.db.storage import apply_write
+from src.db.write_behind import WriteBehindQueue
+
+class FakeClient:
+    """In-memory stand-in for UserStore.apply_writes."""
+
+    def __init__(self):
+        self.documents = {}
+        self.commits = []
+
+    def apply_writes(self, writes):
+        self.commits.append(len(writes))
+        for user_id, kind, payload in writes:
+            apply_write(self.documents.setdefault(user_id, {}), kind, payload)
+
+class FailingClient(FakeClient):
+    """FakeClient whose first `failures` commits raise."""
+
+    def __init__(self, failures):
+        super().__init__()
+        self.failures = failures
+        self.attempts = 0
+
+    def apply_writes(self, writes):
+        self.attempts += 1
+        if self.attempts <= self.failures:
+            raise ConnectionError("database unavailable")
+        super().apply_writes(writes)
+
+@pytest.fixture
+def client():
+    return FakeClient()
+
+def test_writes_are_batched_by_size(client):
+    """Test that reaching the batch size triggers a single commit."""
+    queue = WriteBehindQueue(lambda: client, max_batch_size=3, flush_interval=60)
+
+    queue.enqueue_conversation("user1", [{"role": "user", "content": "hi"}])
+    queue.enqueue_conversation("user2", [{"role": "user", "content": "hello"}])
+    queue.enqueue_user_data("user1", "preferred-language", "hi-IN")
+
+    deadline = time.time() + 2
+    while queue.depth() and time.time() < deadline:
+        time.sleep(0.01)
+
+    assert client.commits == [3]
+    assert client.documents["user1"] == {
+        "history": [{"role": "user", "content": "hi"}],
+        "preferred-language": "hi-IN",
+    }
+    queue.shutdown()
+
+def test_pending_writes_are_visible_before_flush(client):
+    """Test that reads see writes that are still queued."""
+    queue = WriteBehindQueue(lambda: client, max_batch_size=100, flush_interval=60)
+
+    queue.enqueue_conversation("user1", [{"role": "assistant", "content": "new"}])
+    user_data = queue.apply_pending("user1", {"history": [{"role": "user", "content": "old"}]})
+
+    assert [m["content"] for m in user_data["history"]] == ["old", "new"]
+    assert client.commits == []
+    queue.shutdown()
+
+def test_shutdown_drains_queue(client):
+    """Test that shutdown commits everything that was queued."""
+    queue = WriteBehindQueue(lambda: client, max_batch_size=100, flush_interval=60)
+
+    for i in range(5):
+        queue.enqueue_conversation("user1", [{"role": "user", "content": str(i)}])
+    queue.shutdown()
+
+    assert queue.depth() == 0
+    assert len(client.documents["user1"]["history"]) == 5
+    with pytest.raises(RuntimeError):
+        queue.enqueue_conversation("user1", [])
+
+def test_failed_commit_backs_off():
+    """Test that a failed commit is not retried until the backoff has passed."""
+    client = FailingClient(failures=1)
+    queue = WriteBehindQueue(lambda: client, max_batch_size=1, flush_interval=0.01, retry_backoff=60)
+
+    queue.enqueue_conversation("user1", [{"role": "user", "content": "hi"}])
+    deadline = time.time() + 2
+    while not client.attempts and time.time() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.2)
+
+    assert client.attempts == 1
+    assert queue.depth() == 1
+    # Shutdown retries regardless of the backoff
+    queue.shutdown()
+    assert queue.depth() == 0
+    assert client.commits == [1]
+
+def test_writes_are_dropped_after_max_retries():
+    """Test that writes are dropped once their commits have failed max_retries times."""
+    client = FailingClient(failures=3)
+    queue = WriteBehindQueue(lambda: client, max_batch_size=100, flush_interval=60, max_retries=3)
+
+    queue.enqueue_conversation("user1", [{"role": "user", "content": "lost"}])
+    queue.flush()
+    queue.flush()
+    assert queue.depth() == 1
+    queue.flush()
+    assert queue.depth() == 0
+
+    queue.enqueue_conversation("user1", [{"role": "user", "content": "kept"}])
+    queue.shutdown()
+    assert client.documents["user1"]["history"] == [{"role": "user", "content": "kept"}]